@@ -0,0 +1,4 @@
+from src.analysis import main
+
+if __name__ == "__main__":
+    main()
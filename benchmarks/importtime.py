@@ -0,0 +1,89 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What a headless engine worker, CLI tool or test imports
+HEADLESS_MODULES = [
+    "src.models.board",
+    "src.ai.evaluation",
+    "src.ai.minimax",
+    "src.ai.mcts",
+    "src.ai.engines",
+    "src.protocol",
+]
+
+# Modules the headless path must never load
+FORBIDDEN = ["pygame", "src.gui", "src.game", "asyncio", "multiprocessing.shared_memory"]
+
+# Default budget for the whole headless import, in milliseconds
+BUDGET_MS = 250
+
+
+def measure(modules=HEADLESS_MODULES):
+    """
+    Import `modules` in a fresh interpreter under `python -X importtime`.
+
+    The interpreter runs in an empty temporary directory, so any file an
+    import creates is detected.
+
+    Returns:
+        (total_ms, imports, created): Cumulative import time of the
+        requested modules, {module: (self_ms, cumulative_ms)} for every
+        module loaded, and the files the imports created
+    """
+    with tempfile.TemporaryDirectory() as cwd:
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        code = "; ".join(f"import {module}" for module in modules)
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=cwd, env=env,
+                                capture_output=True, text=True, check=True)
+        created = sorted(os.listdir(cwd))
+
+    imports = {}
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        imports[name] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+        if depth == 0:
+            total += int(cumulative_us) / 1000
+    return total, imports, created
+
+
+def main(argv=None):
+    """Check the headless import path against its time budget."""
+    parser = argparse.ArgumentParser(description="Measure the headless import path with python -X importtime.")
+    parser.add_argument("--budget", type=float, default=BUDGET_MS,
+                        help=f"allowed import time in ms (default: {BUDGET_MS})")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules to list (default: 10)")
+    args = parser.parse_args(argv)
+
+    total, imports, created = measure()
+    print(f"headless import: {total:.1f} ms (budget {args.budget:.0f} ms), {len(imports)} modules")
+    for name, (self_ms, cumulative_ms) in sorted(imports.items(), key=lambda item: item[1][0],
+                                                 reverse=True)[:args.top]:
+        print(f"  {self_ms:7.1f} ms self  {cumulative_ms:7.1f} ms cumulative  {name}")
+
+    failures = []
+    if total > args.budget:
+        failures.append(f"import time {total:.1f} ms is over the {args.budget:.0f} ms budget")
+    for name in FORBIDDEN:
+        if name in imports:
+            failures.append(f"{name} is imported on the headless path")
+    if created:
+        failures.append(f"importing created files: {', '.join(created)}")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
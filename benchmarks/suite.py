@@ -0,0 +1,218 @@
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from src.models.board import Board
+from src.ai import minimax as minimax_module
+from src.ai.evaluation import evaluate_position
+from src.ai.mcts import MCTSNode, run_iterations
+from src.ai.stats import SearchStats
+
+POSITIONS_FILE = os.path.join(os.path.dirname(__file__), 'positions.json')
+
+# Minimum wall time per microbenchmark repeat, in seconds
+MICRO_TIME = 0.2
+REPEATS = 3
+
+
+def load_positions(path=POSITIONS_FILE):
+    """
+    Load the benchmark positions.
+
+    Returns:
+        positions: List of dicts with name, phase, moves, board, player and
+        optionally the accepted best moves (0-based columns)
+    """
+    with open(path) as f:
+        positions = json.load(f)
+    for position in positions:
+        position["board"] = Board.from_moves(position["moves"])
+        position["player"] = position["board"].next_player()
+        if "best" in position:
+            position["best"] = [col - 1 for col in position["best"]]
+    return positions
+
+
+def _rate(operation, items):
+    """
+    Measure operations per second of `operation` over `items`.
+
+    The items are cycled until MICRO_TIME has passed; the best of REPEATS
+    runs is reported to keep scheduler noise out of the result.
+    """
+    best = 0.0
+    for _ in range(REPEATS):
+        count = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < MICRO_TIME:
+            for item in items:
+                operation(item)
+            count += len(items)
+            elapsed = time.perf_counter() - start
+        best = max(best, count / elapsed)
+    return best
+
+
+def micro_benchmarks(positions):
+    """Board and evaluation hot paths, in operations per second."""
+    boards = [p["board"] for p in positions if p["moves"]]
+    sequences = [[int(c) - 1 for c in p["moves"]] for p in positions if p["moves"]]
+    plies = sum(len(s) for s in sequences)
+
+    def replay(moves):
+        board = Board()
+        player = 1
+        for col in moves:
+            board.drop_piece(col, player)
+            player = 3 - player
+
+    def win_check(board):
+        row, col = board.last_move
+        board.check_win(row, col, board.board[row][col])
+
+    return {
+        "drops_per_sec": _rate(replay, sequences) * plies / len(sequences),
+        "win_checks_per_sec": _rate(win_check, boards),
+        "evals_per_sec": _rate(lambda board: evaluate_position(board, 2), boards),
+        "copies_per_sec": _rate(copy.deepcopy, boards),
+    }
+
+
+def minimax_benchmarks(positions, depth):
+    """Nodes per second, time to each depth and best-move agreement for minimax."""
+    stats = SearchStats("minimax")
+    time_to_depth = {d: 0.0 for d in range(1, depth + 1)}
+    total_time = 0.0
+    agree = 0
+    known = 0
+    try:
+        for position in positions:
+            # Start every position from empty history so runs are comparable
+            minimax_module.reset_history_scores()
+            col = None
+            start = time.perf_counter()
+            for d in range(1, depth + 1):
+                _, col = minimax_module.minimax(position["board"], d, float('-inf'), float('inf'),
+                                                True, player=position["player"], stats=stats)
+                time_to_depth[d] += time.perf_counter() - start
+            total_time += time.perf_counter() - start
+            if "best" in position:
+                known += 1
+                agree += col in position["best"]
+    finally:
+        minimax_module.reset_history_scores()
+
+    results = {
+        "minimax_nodes_per_sec": stats.nodes / total_time,
+        "minimax_first_move_cutoff_rate": stats.first_move_cutoff_rate,
+        "minimax_branching_factor": stats.branching_factor,
+        "minimax_agreement": agree / known if known else 0.0,
+    }
+    for d, seconds in time_to_depth.items():
+        results[f"minimax_time_to_depth_{d}"] = seconds
+    return results
+
+
+def mcts_benchmarks(positions, iterations, seed=0):
+    """Iterations per second and best-move agreement for MCTS."""
+    random.seed(seed)
+    total_iterations = 0
+    total_time = 0.0
+    agree = 0
+    known = 0
+    for position in positions:
+        root = MCTSNode(copy.deepcopy(position["board"]), player=position["player"])
+        start = time.perf_counter()
+        run_iterations(root, iterations)
+        total_time += time.perf_counter() - start
+        total_iterations += root.visits
+        if "best" in position and root.children:
+            known += 1
+            best = max(root.children.items(), key=lambda item: item[1].visits)[0]
+            agree += best in position["best"]
+    return {
+        "mcts_iterations_per_sec": total_iterations / total_time,
+        "mcts_agreement": agree / known if known else 0.0,
+    }
+
+
+def lower_is_better(metric):
+    """Timings and branching factors regress upwards; every other metric regresses downwards."""
+    return "time" in metric or "branching" in metric
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results with a saved baseline.
+
+    Args:
+        results: Metrics dict from this run
+        baseline: Metrics dict from an earlier run
+        threshold: Allowed relative slowdown, e.g. 0.1 for 10%
+
+    Returns:
+        regressions: List of (metric, baseline value, new value, change)
+    """
+    regressions = []
+    for metric, old in baseline.items():
+        new = results.get(metric)
+        if new is None or not old:
+            continue
+        change = (new - old) / old
+        worse = change > threshold if lower_is_better(metric) else change < -threshold
+        print(f"  {metric:32s} {old:14.4f} -> {new:14.4f}  {change:+7.1%}{'  REGRESSION' if worse else ''}",
+              file=sys.stderr)
+        if worse:
+            regressions.append((metric, old, new, change))
+    return regressions
+
+
+def main(argv=None):
+    """Run the suite, print JSON to stdout and optionally check against a baseline."""
+    parser = argparse.ArgumentParser(description="Benchmark board, evaluation and search hot paths.")
+    parser.add_argument("--depth", type=int, default=4, help="minimax depth (default: 4)")
+    parser.add_argument("--iterations", type=int, default=300, help="MCTS iterations per position (default: 300)")
+    parser.add_argument("--skip-search", action="store_true", help="run the microbenchmarks only")
+    parser.add_argument("--save", metavar="FILE", help="write the results as a new baseline")
+    parser.add_argument("--compare", metavar="FILE", help="baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative change counted as a regression (default: 0.10)")
+    args = parser.parse_args(argv)
+
+    positions = load_positions()
+    metrics = micro_benchmarks(positions)
+    if not args.skip_search:
+        metrics.update(minimax_benchmarks(positions, args.depth))
+        metrics.update(mcts_benchmarks(positions, args.iterations))
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "depth": args.depth,
+        "iterations": args.iterations,
+        "metrics": metrics,
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(metrics, baseline["metrics"], args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
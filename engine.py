@@ -0,0 +1,4 @@
+from src.protocol import main
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,5 @@
 import pygame
 import sys
-from src.game import Game
-from src.ai.minimax import iterative_deepening_minimax
-from src.ai.mcts import mcts_search
 
 def display_menu(screen):
     """Display the game mode selection menu."""
@@ -323,6 +320,9 @@ def main():
     screen = pygame.display.set_mode((screen_width, screen_height))
     pygame.display.set_caption('Connect Four AI')
     
+    # Load the engines only once the window is open
+    from src.game import Game
+    
     running = True
     while running:  # Main application loop
         # Display menu and get user selection
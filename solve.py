@@ -0,0 +1,4 @@
+from src.solve import main
+
+if __name__ == "__main__":
+    main()
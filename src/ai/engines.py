@@ -0,0 +1,333 @@
+import json
+import os
+import threading
+import time
+
+from src.ai.evaluation import weights_for
+from src.ai.minimax import iterative_deepening_minimax, Selectivity, SearchAborted
+from src.ai.mcts import mcts_search
+from src.ai.poscache import open_cache, MIN_DEPTH
+from src.ai.stats import SearchStats, SamplingProfiler
+from src.ai.threats import ThreatMap, columns
+
+# Engine registry file: the budget of every engine at every difficulty
+ENGINES_FILE = 'data/engines.json'
+
+# Used when the registry file is missing (the budgets of the original game,
+# with time caps added for minimax and an expert level for MCTS)
+DEFAULT_REGISTRY = {
+    "targets": {"easy": 0.1, "medium": 0.5, "hard": 2.0, "expert": 5.0},
+    "minimax": {
+        "easy": {"depth": 2, "max_time": 1.0},
+        "medium": {"depth": 3, "max_time": 2.0},
+        "hard": {"depth": 5, "max_time": 5.0},
+        "expert": {"depth": 7, "max_time": 10.0},
+    },
+    "mcts": {
+        "easy": {"iterations": 1000, "max_time": 0.5},
+        "medium": {"iterations": 5000, "max_time": 2.0},
+        "hard": {"iterations": 10000, "max_time": 5.0},
+        "expert": {"iterations": 20000, "max_time": 10.0},
+    },
+}
+
+# Budget keys accepted in an engine spec, with their types
+BUDGET_KEYS = {"depth": int, "iterations": int, "max_time": float, "nodes": int}
+
+# Other keys accepted in an engine spec: 'tt' names a shared transposition
+# table, 'weights' an evaluation weights file, 'tb' a tablebase directory
+# and 'cache' a persistent position cache file ('auto' for the default
+# one of the board's shape, for both)
+OPTION_KEYS = {"tt": str, "weights": str, "tb": str, "cache": str}
+
+# Minimax selective-search keys, as Selectivity arguments: lmr (moves
+# before reductions start, 0 for none), lmr_reduction, lmr_depth and ext
+# (extension plies per line, 0 for none)
+SELECTIVE_KEYS = {"lmr": "reduce_after", "lmr_reduction": "reduction", "lmr_depth": "min_depth",
+                  "ext": "max_extensions"}
+
+
+class SearchLimit:
+    """
+    Stop condition for one search: an explicit stop, a deadline or a node budget.
+
+    Quacks like threading.Event so it can be passed as minimax's stop_event.
+    """
+
+    def __init__(self, max_time=None, max_nodes=None, stats=None, parent=None):
+        """
+        Initialize the limit.
+
+        Args:
+            max_time: Seconds allowed for the search, or None
+            max_nodes: Node budget (checked against stats.nodes), or None
+            stats: SearchStats of the running search
+            parent: Optional threading.Event or SearchLimit that also stops the search
+        """
+        self.deadline = time.perf_counter() + max_time if max_time is not None else None
+        self.max_nodes = max_nodes
+        self.stats = stats
+        self.parent = parent
+        self.stopped = threading.Event()
+
+    def set(self):
+        """Stop the search as soon as possible."""
+        self.stopped.set()
+
+    def is_set(self):
+        """True when the search must stop."""
+        if self.stopped.is_set():
+            return True
+        if self.parent is not None and self.parent.is_set():
+            return True
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return True
+        return self.max_nodes is not None and self.stats is not None and self.stats.nodes >= self.max_nodes
+
+
+# Registry in use; loaded from ENGINES_FILE on first use
+_registry = None
+
+
+def load_registry(path=ENGINES_FILE):
+    """
+    Load the engine registry from a JSON file and make it the one in use.
+
+    The file maps each engine to {difficulty: budget}, where a budget holds
+    any of depth, iterations, max_time and nodes, plus optional
+    "targets": {difficulty: seconds} used by the calibration tool. Engines
+    and difficulties the file leaves out keep their default budgets.
+
+    Args:
+        path: Registry file; DEFAULT_REGISTRY is used if it does not exist
+
+    Returns:
+        registry: The loaded registry
+    """
+    global _registry
+    registry = json.loads(json.dumps(DEFAULT_REGISTRY))
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            loaded = json.load(f)
+        for section, entries in loaded.items():
+            registry.setdefault(section, {}).update(entries)
+    for engine, levels in registry.items():
+        if engine == "targets":
+            continue
+        for difficulty, budget in levels.items():
+            for key in budget:
+                if key not in BUDGET_KEYS:
+                    raise ValueError(f"Unknown budget key '{key}' for {engine}:{difficulty} in {path}")
+    _registry = registry
+    return registry
+
+
+def registry():
+    """Return the engine registry in use, loading it on first call."""
+    if _registry is None:
+        load_registry()
+    return _registry
+
+
+def engine_config(ai_type, difficulty):
+    """
+    Build the engine configuration for an AI type and difficulty from the registry.
+
+    Args:
+        ai_type: 'minimax' or 'mcts'
+        difficulty: 'easy', 'medium', 'hard' or 'expert'
+
+    Returns:
+        config: Dict with the engine name and its search budget
+    """
+    levels = registry().get(ai_type) if ai_type != "targets" else None
+    if levels is None:
+        raise ValueError(f"Unknown engine: {ai_type}")
+    if difficulty not in levels:
+        raise ValueError(f"Unknown difficulty '{difficulty}' for {ai_type} (known: {', '.join(levels)})")
+    return dict({"engine": ai_type}, **levels[difficulty])
+
+
+def parse_engine_spec(spec):
+    """
+    Parse an engine spec such as 'minimax:hard' or 'mcts:iterations=2000,max_time=0.5'.
+
+    A bare engine name uses the medium budget; key=value pairs override
+    individual budget entries of the medium configuration (0 removes a
+    max_time or nodes cap), tt=<name> makes the engine use a shared
+    transposition table, weights=<path> an evaluation weights file,
+    tb=<dir> (or tb=auto) a tablebase, cache=<path> (or cache=auto) a
+    persistent position cache, and lmr, lmr_reduction, lmr_depth and ext
+    set minimax's selective search.
+
+    Args:
+        spec: Engine spec string
+
+    Returns:
+        config: Dict with the engine name and its search budget
+    """
+    name, _, rest = spec.partition(":")
+    if not rest or "=" not in rest:
+        return engine_config(name, rest or "medium")
+
+    config = engine_config(name, "medium")
+    for item in rest.split(","):
+        key, _, value = item.partition("=")
+        cast = BUDGET_KEYS.get(key) or OPTION_KEYS.get(key) or (int if key in SELECTIVE_KEYS else None)
+        if cast is None:
+            raise ValueError(f"Unknown budget key '{key}' in engine spec '{spec}'")
+        config[key] = cast(value)
+    for key in ("max_time", "nodes"):
+        if config.get(key) == 0:
+            del config[key]
+    return config
+
+
+def format_engine(config):
+    """Return a short human-readable label for an engine configuration."""
+    budget = ",".join(f"{key}={config[key]}" for key in BUDGET_KEYS if key in config)
+    for key in ("weights", "tb", "cache") + tuple(SELECTIVE_KEYS):
+        if key in config:
+            budget += f",{key}={config[key]}"
+    return f"{config['engine']}:{budget}"
+
+
+def selectivity(config):
+    """
+    Build the minimax Selectivity of an engine configuration.
+
+    Returns:
+        selective: Selectivity from the config's lmr/lmr_reduction/lmr_depth/ext
+        keys (defaults for the ones left out), or None when it has none
+    """
+    if not any(key in config for key in SELECTIVE_KEYS):
+        return None
+    kwargs = {SELECTIVE_KEYS[key]: config[key] for key in SELECTIVE_KEYS if key in config}
+    if kwargs.get("reduce_after") == 0:
+        kwargs["reduce_after"] = None
+    return Selectivity(**kwargs)
+
+
+def fallback_move(board, player):
+    """
+    Move played when a search is stopped before it has one: an immediate
+    win, else the first move that does not lose at once, else any legal move.
+
+    Returns:
+        col: Chosen column, or None if there is no legal move
+    """
+    threats = ThreatMap(board)
+    col = threats.winning_column(player)
+    if col is not None:
+        return col
+    safe = columns(threats.non_losing(player), board.geometry)
+    if safe:
+        return safe[0]
+    valid_moves = board.get_valid_moves()
+    return valid_moves[0] if valid_moves else None
+
+
+def _chain(first, second):
+    """Search callback calling both `first` and `second`; the search stops if either asks it to."""
+    if first is None or second is None:
+        return first or second
+    return lambda *args: bool(first(*args)) | bool(second(*args))
+
+
+def select_move(board, player, config, root=None, save_history=True, stats=None, stop_event=None, clock=None,
+                callback=None):
+    """
+    Pick a move for `player` with the configured engine.
+
+    Args:
+        board: Current board state
+        player: Player to move (1 or 2)
+        config: Engine configuration from engine_config/parse_engine_spec
+        root: Optional warm MCTSNode for this position (MCTS only)
+        save_history: Persist minimax history scores after the search
+        stats: Optional SearchStats filled in by the engine
+        stop_event: Optional threading.Event or SearchLimit; when it fires
+            the engine returns its best move so far (fallback_move when it
+            has none yet)
+        clock: Optional MoveClock from a TimeManager; it replaces the
+            config's max_time, and ends the search early once more time is
+            unlikely to change the move (depth and iterations still cap the search)
+        callback: Optional progress callback, called as minimax's
+            callback(depth, score, column) after every completed depth or as
+            MCTS's callback(root, remaining) every few iterations; returning
+            True ends the search
+
+    The engine uses the shared transposition table named by config['tt'], if
+    any, and minimax evaluates with the weights file config['weights']
+    (default: the evaluation's WEIGHTS_FILE). Positions covered by the
+    tablebase named by config['tb'] are played from it without searching,
+    and the position cache named by config['cache'] answers positions
+    searched before to at least the config's depth (to MIN_DEPTH for a
+    config without a depth whose time or node limit ends the search) and is
+    saved every SAVE_INTERVAL seconds.
+    Minimax without a depth searches until its max_time or nodes budget
+    runs out; MCTS without iterations runs for its max_time.
+
+    Returns:
+        col: Chosen column, or None if there is no legal move
+    """
+    max_time = config.get("max_time")
+    cache = open_cache(config.get("cache"), board)
+    limited = bool(max_time or config.get("nodes") or clock is not None or isinstance(stop_event, SearchLimit))
+    if clock is not None:
+        if clock.parent is None:
+            clock.parent = stop_event
+        stop_event = clock
+        max_time = None
+        callback = _chain(callback, clock.minimax_callback if config["engine"] == "minimax" else clock.mcts_callback)
+    if config["engine"] == "minimax":
+        if max_time or config.get("nodes"):
+            if stats is None:
+                stats = SearchStats("minimax")
+            stop_event = SearchLimit(max_time, config.get("nodes"), stats, parent=stop_event)
+        depth = config.get("depth", board.rows * board.cols)
+        # A config's depth is its playing strength, so cached results must
+        # match it; a limited search without one may never finish a full
+        # board, so any result deep enough to be worth caching will do
+        cache_depth = MIN_DEPTH if limited and "depth" not in config else depth
+        try:
+            _, col = iterative_deepening_minimax(board, depth, stop_event, player=player,
+                                                 save_history=save_history, stats=stats, return_partial=True,
+                                                 tt=config.get("tt"), selective=selectivity(config),
+                                                 callback=callback, tablebase=config.get("tb"), cache=cache,
+                                                 cache_depth=cache_depth, weights=weights_for(config.get("weights")))
+        except SearchAborted:
+            # Stopped before the first depth completed
+            col = fallback_move(board, player)
+            if stats is not None:
+                stats.move = col
+    else:
+        iterations = config.get("iterations", float('inf') if max_time or clock is not None else 1000)
+        col = mcts_search(board, iterations=iterations, max_time=max_time, root=root, player=player,
+                          stats=stats, stop_event=stop_event, tt=config.get("tt"), callback=callback,
+                          tablebase=config.get("tb"), cache=cache)
+    if cache is not None:
+        cache.maybe_save()
+    return col
+
+
+def search_move(board, player, config, root=None, save_history=True, profile=False, clock=None):
+    """
+    Pick a move and return the search statistics alongside it.
+
+    Args:
+        board, player, config, root, save_history, clock: As for select_move
+        profile: Run the search under SamplingProfiler and keep the hottest
+            functions in `stats.profile`
+
+    Returns:
+        (col, stats): Chosen column and its SearchStats
+    """
+    stats = SearchStats(config["engine"])
+    if profile:
+        with SamplingProfiler() as profiler:
+            col = select_move(board, player, config, root, save_history, stats, clock=clock)
+        stats.profile = profiler.top_functions()
+    else:
+        col = select_move(board, player, config, root, save_history, stats, clock=clock)
+    return col, stats
@@ -1,79 +1,252 @@
-def evaluate_position(board, player):
+import json
+import os
+
+import numpy as np
+
+from src.ai.threats import ThreatMap
+from src.ai.memory import governor, DictCache
+from src.ai.ttable import key_salt
+
+# Evaluation weights file, written by the tuner (python tune.py)
+WEIGHTS_FILE = 'data/eval_weights.json'
+
+# Evaluation features: pieces in the centre column, one class per window,
+# then the threat counts of ThreatMap.features
+FEATURES = ("center", "win", "three", "two", "opp_three", "opp_two",
+            "threat_good", "threat_other", "opp_threat_good", "opp_threat_other")
+THREAT_FEATURES = slice(6, 10)
+
+# The original hand-picked weights, used when the weights file is missing.
+# Weights are integers because transposition tables store integer scores.
+DEFAULT_WEIGHTS = {"center": 3, "win": 100, "three": 5, "two": 2, "opp_three": -4, "opp_two": 0,
+                   "threat_good": 0, "threat_other": 0, "opp_threat_good": 0, "opp_threat_other": 0}
+
+# Window class (index into FEATURES, NO_CLASS for none) of every base-3
+# window code, keyed by (connect, player)
+NO_CLASS = len(FEATURES)
+_class_tables = {}
+
+# Per-window scores indexed by window code, keyed by (connect, player, weights)
+_window_tables = {}
+
+# Both lookup tables are rebuilt on demand, so the memory governor may drop them
+_table_memory = (
+    governor().register("eval_class_tables", DictCache(_class_tables, entry_bytes=200,
+                                                       value_bytes=lambda table: table.nbytes)),
+    governor().register("eval_window_tables", DictCache(_window_tables, entry_bytes=200,
+                                                        value_bytes=lambda table: table.nbytes)),
+)
+
+# Weights in use as a tuple in FEATURES order, and every weights file read so
+# far; the default file is read by the first evaluation rather than at import
+_weights = None
+_weights_files = {}
+
+# Table key salt of every (shape, weights) searched so far
+_salts = {}
+
+def load_weights(path=WEIGHTS_FILE):
+    """
+    Read an evaluation weights file.
+
+    The file holds {"version": n, "weights": {feature: weight}}; features it
+    leaves out keep their default weights.
+
+    Args:
+        path: Weights file; DEFAULT_WEIGHTS are returned if it does not exist
+
+    Returns:
+        weights: Dict of integer weights for every feature
+    """
+    weights = dict(DEFAULT_WEIGHTS)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            loaded = json.load(f).get("weights", {})
+        for feature, weight in loaded.items():
+            if feature not in weights:
+                raise ValueError(f"Unknown evaluation feature '{feature}' in {path}")
+            if weight != int(weight):
+                raise ValueError(f"Weight of '{feature}' in {path} must be an integer")
+            weights[feature] = int(weight)
+    return weights
+
+def weights_for(path=None):
+    """
+    Weights of the file at `path` (default: WEIGHTS_FILE) as a tuple in FEATURES order.
+
+    Searches pass the tuple down to evaluate_position and table_salt, so
+    engines with different weights can search at the same time in one
+    process. Each file is read once per process.
+    """
+    path = path or WEIGHTS_FILE
+    weights = _weights_files.get(path)
+    if weights is None:
+        loaded = load_weights(path)
+        weights = _weights_files[path] = tuple(loaded[feature] for feature in FEATURES)
+    return weights
+
+def use_weights(path=None):
+    """Make the weights from `path` (default: WEIGHTS_FILE) the default of searches given no weights."""
+    global _weights
+    _weights = weights_for(path)
+
+def set_weights(weights):
+    """Use the given {feature: weight} dict; features it leaves out keep their default weights."""
+    global _weights
+    merged = dict(DEFAULT_WEIGHTS, **weights)
+    _weights = tuple(int(merged[feature]) for feature in FEATURES)
+
+def active_weights():
+    """Return the weights in use as a {feature: weight} dict."""
+    if _weights is None:
+        use_weights()
+    return dict(zip(FEATURES, _weights))
+
+def table_salt(board, weights=None):
+    """
+    Key salt of positions evaluated with `weights` (default: the weights in use) on `board`'s shape.
+
+    Scores differ between weights and between board shapes (whose keys can
+    coincide), so they are stored under table keys salted with both.
+    """
+    if weights is None:
+        if _weights is None:
+            use_weights()
+        weights = _weights
+    shape = (board.rows, board.cols, board.connect)
+    salt = _salts.get((shape, weights))
+    if salt is None:
+        salt = _salts[(shape, weights)] = key_salt(*shape, *weights)
+    return salt
+
+def evaluate_position(board, player, weights=None):
     """
     Evaluate the current board position for the given player.
-    
+
     Args:
         board: The board to evaluate
         player: The player (1 for human, 2 for AI)
-        
+        weights: Weights tuple from weights_for (default: the weights in use)
+
     Returns:
         score: A numerical score representing how good the position is for the player
     """
-    score = 0
-    opponent = 1 if player == 2 else 2
-    
+    if weights is None:
+        if _weights is None:
+            use_weights()
+        weights = _weights
+    geometry = board.geometry
+
     # Score center column (controlling center is advantageous)
-    center_column = [board.get_cell(r, board.cols // 2) for r in range(board.rows)]
-    center_count = center_column.count(player)
-    score += center_count * 3
-    
-    # Check horizontal, vertical, and diagonal patterns
-    # Horizontal
-    for r in range(board.rows):
-        for c in range(board.cols - 3):
-            window = [board.get_cell(r, c + i) for i in range(4)]
-            score += _evaluate_window(window, player, opponent)
-    
-    # Vertical
-    for c in range(board.cols):
-        for r in range(board.rows - 3):
-            window = [board.get_cell(r + i, c) for i in range(4)]
-            score += _evaluate_window(window, player, opponent)
-    
-    # Positive diagonal (/)
-    for r in range(board.rows - 3):
-        for c in range(board.cols - 3):
-            window = [board.get_cell(r + i, c + i) for i in range(4)]
-            score += _evaluate_window(window, player, opponent)
-    
-    # Negative diagonal (\)
-    for r in range(3, board.rows):
-        for c in range(board.cols - 3):
-            window = [board.get_cell(r - i, c + i) for i in range(4)]
-            score += _evaluate_window(window, player, opponent)
-    
+    center_count = int(np.count_nonzero(board.board[:, board.cols // 2] == player))
+    score = center_count * weights[0]
+
+    # Score every horizontal, vertical and diagonal window in one lookup
+    codes = board.board.ravel()[geometry.windows] @ geometry.powers
+    score += int(_window_table(geometry.connect, player, weights)[codes].sum())
+
+    # Threat analysis only runs when the threat features carry weight
+    threat_weights = weights[THREAT_FEATURES]
+    if any(threat_weights):
+        counts = ThreatMap(board).features(player)
+        score += sum(weight * count for weight, count in zip(threat_weights, counts))
+
     return score
 
-def _evaluate_window(window, player, opponent):
+def position_features(board, player):
     """
-    Evaluate a window of 4 positions.
-    
+    Feature counts of a position, so that evaluate_position is their dot
+    product with the weights (in FEATURES order).
+
     Args:
-        window: List of 4 positions to evaluate
+        board: The board to describe
+        player: The player the features are counted for
+
+    Returns:
+        features: Integer array with one count per feature
+    """
+    geometry = board.geometry
+    codes = board.board.ravel()[geometry.windows] @ geometry.powers
+    features = np.bincount(_class_table(geometry.connect, player)[codes], minlength=NO_CLASS + 1)[:NO_CLASS]
+    features[0] = np.count_nonzero(board.board[:, board.cols // 2] == player)
+    features[THREAT_FEATURES] = ThreatMap(board).features(player)
+    return features
+
+def _class_table(connect, player):
+    """
+    Window class of every possible window of `connect` cells for the player.
+
+    A window's cells read as base-3 digits (0 empty, 1 and 2 the players)
+    give its index, so classifying a board is a single lookup per window.
+    """
+    table = _class_tables.get((connect, player))
+    if table is None:
+        opponent = 1 if player == 2 else 2
+        table = np.empty(3 ** connect, dtype=np.intp)
+        for code in range(3 ** connect):
+            window = [(code // 3 ** i) % 3 for i in range(connect)]
+            feature = _window_class(window, player, opponent)
+            table[code] = FEATURES.index(feature) if feature else NO_CLASS
+        _class_tables[(connect, player)] = table
+    return table
+
+def _window_table(connect, player, weights):
+    """Scores of every possible window of `connect` cells for the player under `weights`."""
+    table = _window_tables.get((connect, player, weights))
+    if table is None:
+        scores = np.array(weights + (0,), dtype=np.int64)
+        scores[0] = 0  # the centre bonus is per piece, not per window
+        table = scores[_class_table(connect, player)]
+        _window_tables[(connect, player, weights)] = table
+    return table
+
+def _window_class(window, player, opponent):
+    """
+    Classify a window of N positions, N being the line length needed to win.
+
+    Args:
+        window: List of N positions to classify
         player: The player (1 or 2)
         opponent: The opponent (1 or 2)
-        
+
     Returns:
-        score: Points for this window
+        feature: Name of the window's feature, or None for a neutral window
     """
     # Empty cells
     empty = 0
-    
+
     # Count pieces
+    size = len(window)
     player_count = window.count(player)
     opponent_count = window.count(opponent)
     empty_count = window.count(empty)
-    
-    # Scoring logic
-    if player_count == 4:  # Winning position
-        return 100
-    elif player_count == 3 and empty_count == 1:  # Strong threat
-        return 5
-    elif player_count == 2 and empty_count == 2:  # Developing position
-        return 2
-    
+
+    if player_count == size:  # Winning position
+        return "win"
+    elif player_count == size - 1 and empty_count == 1:  # Strong threat
+        return "three"
+    elif player_count == size - 2 and empty_count == 2:  # Developing position
+        return "two"
+
     # Defensive scoring - block opponent threats
-    if opponent_count == 3 and empty_count == 1:
-        return -4  # Block immediate threat
-    
-    return 0  # Neutral position
\ No newline at end of file
+    if opponent_count == size - 1 and empty_count == 1:
+        return "opp_three"  # Block immediate threat
+    elif opponent_count == size - 2 and empty_count == 2:
+        return "opp_two"
+
+    return None  # Neutral position
+
+def _evaluate_window(window, player, opponent):
+    """
+    Evaluate a window of N positions with the weights in use.
+
+    Args:
+        window: List of N positions to evaluate
+        player: The player (1 or 2)
+        opponent: The opponent (1 or 2)
+
+    Returns:
+        score: Points for this window
+    """
+    feature = _window_class(window, player, opponent)
+    return active_weights()[feature] if feature else 0
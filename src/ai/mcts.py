@@ -2,21 +2,60 @@ import numpy as np
 import copy
 import math
 import random
+import threading
 import time
 
+from src.ai.ttable import resolve, table_key, key_salt, KIND_MCTS
+from src.ai.threats import ThreatMap, columns
+from src.ai.memory import governor, PRIORITY_TREE
+from src.ai.tablebase import open_tablebase
+from src.ai.poscache import open_cache
+
+# Visits a node needs before its statistics are written to a shared table,
+# and the most visits a table entry may contribute as a prior to a new node
+TT_MIN_VISITS = 16
+TT_PRIOR_CAP = 32
+
+# Iterations between calls of a search's early-stop callback, and between
+# checks of the memory budget
+CALLBACK_INTERVAL = 64
+
+# Estimated bytes of one tree node with its board (measured with tracemalloc)
+NODE_BYTES = 1200
+
+def candidate_moves(board, player):
+    """
+    Moves worth expanding for the player to move.
+
+    None after a winning move; only the win when one is available; else
+    the moves that do not hand the opponent an immediate win, or every
+    legal move when all of them lose.
+    """
+    if board.last_move is not None and board.is_winner(3 - player):
+        return []
+    threats = ThreatMap(board)
+    win_col = threats.winning_column(player)
+    if win_col is not None:
+        return [win_col]
+    safe = threats.non_losing(player)
+    return columns(safe, board.geometry) if safe else board.get_valid_moves()
+
 class MCTSNode:
     """Node in the Monte Carlo Tree Search."""
     
-    def __init__(self, board, parent=None, move=None):
+    def __init__(self, board, parent=None, move=None, player=None, prune=True):
         self.board = board
         self.parent = parent
         self.move = move  # Move that led to this state
         self.children = {}  # Dictionary of {move: MCTSNode}
         self.visits = 0
         self.wins = 0
-        self.untried_moves = board.get_valid_moves()
         # Important: Set player correctly based on the board state or parent
-        self.player = board.current_player if hasattr(board, 'current_player') else (1 if parent and parent.player == 2 else 2)
+        if player is not None:
+            self.player = player
+        else:
+            self.player = board.current_player if hasattr(board, 'current_player') else (1 if parent and parent.player == 2 else 2)
+        self.untried_moves = candidate_moves(board, self.player) if prune else board.get_valid_moves()
     
     def uct_select_child(self, exploration_weight=1.0):  # sqrt(2) is a common value
         """Select a child node using the UCT formula."""
@@ -68,7 +107,8 @@ class MCTSNode:
 
 
 # In src/ai/mcts.py
-def mcts_search(board, iterations=1000, max_time=None):
+def mcts_search(board, iterations=1000, max_time=None, root=None, player=2, stats=None, stop_event=None,
+                tt=None, callback=None, tablebase=None, cache=None):
     """
     Run Monte Carlo Tree Search to find the best move.
     
@@ -76,32 +116,62 @@ def mcts_search(board, iterations=1000, max_time=None):
         board: Current board state
         iterations: Maximum number of iterations to run
         max_time: Maximum search time in seconds (optional)
+        root: Optional warm MCTSNode for this position (e.g. a subtree kept
+            from pondering); its existing visits count toward `iterations`
+        player: Player to move on `board` (1 or 2)
+        stats: Optional SearchStats filled in with iterations, tree size
+            and rollout lengths
+        stop_event: Optional threading.Event that ends the search early
+        tt: Optional TranspositionTable or its shared-memory name; new nodes
+            start from the statistics stored there and well-visited nodes
+            are written back
+        callback: Optional function called as callback(root, remaining)
+            every CALLBACK_INTERVAL iterations, `remaining` being the
+            iterations left; returning True ends the search
+        tablebase: Optional Tablebase, tablebase directory or 'auto'; a
+            position it covers is answered from it without searching
+        cache: Optional PositionCache, cache file or 'auto'; a position
+            searched before with at least `iterations` visits is answered
+            from it, and the result of every search is recorded in it
         
     Returns:
         best_move: The best move determined by MCTS
     """
-    root = MCTSNode(copy.deepcopy(board))
+    # Solved positions need no search
+    tablebase = open_tablebase(tablebase, board)
+    if tablebase is not None:
+        hit = tablebase.best_move(board, player)
+        if stats is not None:
+            stats.record_cache("tablebase", hit is not None)
+        if hit is not None:
+            col, value = hit
+            if stats is not None:
+                stats.move = col
+                stats.score = 1.0 if value > 0 else (0.0 if value < 0 else 0.5)
+            return col
     
-    # Set time limit if specified
-    end_time = None
-    if max_time:
-        end_time = time.time() + max_time
+    # So are positions searched with as many visits before, in this or an earlier run
+    cache = open_cache(cache, board)
+    if cache is not None:
+        hit = cache.mcts_result(board, player, iterations)
+        if stats is not None:
+            stats.record_cache("cache", hit is not None)
+        if hit is not None:
+            if stats is not None:
+                stats.move, stats.score = hit
+            return hit[0]
     
-    # Run MCTS iterations
-    for i in range(iterations):
-        # Check time limit
-        if end_time and time.time() > end_time:
-            break
-            
-        # 1. Selection and Expansion
-        node = _select_and_expand(root)
-        
-        # 2. Simulation
-        simulation_board = copy.deepcopy(node.board)
-        result = _simulate(simulation_board, node.player)
-        
-        # 3. Backpropagation
-        _backpropagate(node, result)
+    if root is None:
+        root = MCTSNode(copy.deepcopy(board), player=player)
+    root.parent = None
+    tt = resolve(tt)
+    
+    # A forced move (or an immediate win) needs one iteration, for its score
+    if len(root.untried_moves) + len(root.children) == 1:
+        iterations = min(iterations, root.visits + 1)
+    
+    start = time.perf_counter()
+    run_iterations(root, iterations, max_time, stop_event, stats, tt, callback)
     
     # Select the best move based on visit count
     best_move = None
@@ -112,11 +182,202 @@ def mcts_search(board, iterations=1000, max_time=None):
             best_visits = child.visits
             best_move = move
     
+    if tt is not None:
+        _store_tree(root, tt)
+    if cache is not None and best_move is not None:
+        child = root.children[best_move]
+        cache.record_mcts(board, player, root.visits, 1 - child.wins / child.visits, best_move)
+    
+    if stats is not None:
+        stats.time += time.perf_counter() - start
+        stats.move = best_move
+        stats.tree_size = count_nodes(root)
+        if best_move is not None:
+            child = root.children[best_move]
+            stats.score = 1 - child.wins / child.visits  # Win rate for the player to move
+    
     return best_move
 
 
-def _select_and_expand(node):
-    """Select a node to expand using the UCT formula."""
+def root_distribution(root):
+    """
+    Visit and value distribution over the root moves.
+
+    Args:
+        root: Searched MCTSNode
+
+    Returns:
+        lines: List of (column, visits, win_rate) sorted by visits, most
+        visited first; win_rate is for the player to move at the root
+    """
+    lines = [(move, child.visits, 1 - child.wins / child.visits)
+             for move, child in root.children.items() if child.visits]
+    lines.sort(key=lambda line: line[1], reverse=True)
+    return lines
+
+
+def mcts_multipv(board, iterations=1000, max_time=None, player=2, stats=None, stop_event=None, tt=None):
+    """
+    Run MCTS and return the distribution over every root move.
+
+    Args:
+        As for mcts_search
+
+    Returns:
+        lines: root_distribution of the searched tree
+    """
+    root = MCTSNode(copy.deepcopy(board), player=player, prune=False)  # score every root move
+    mcts_search(board, iterations, max_time, root=root, player=player, stats=stats, stop_event=stop_event, tt=tt)
+    return root_distribution(root)
+
+
+def count_nodes(root):
+    """Count the nodes in the tree under `root`, including `root`."""
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children.values())
+    return count
+
+
+def prune_tree(root, count):
+    """
+    Remove at least `count` nodes from the tree by collapsing its least-visited subtrees.
+
+    A collapsed node keeps its own statistics and gets its moves back as
+    untried, so the search can grow it again if it returns there. The
+    root's children are never removed.
+
+    Returns:
+        removed: Number of nodes removed
+    """
+    # Removing the children of every node with at most `threshold` visits
+    # removes exactly the nodes whose parent has at most `threshold` visits,
+    # since visits never grow going down the tree
+    parent_visits = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        for child in node.children.values():
+            parent_visits.append(node.visits)
+            stack.append(child)
+    if count <= 0 or not parent_visits:
+        return 0
+    parent_visits.sort()
+    threshold = parent_visits[min(count, len(parent_visits)) - 1]
+
+    removed = 0
+    stack = list(root.children.values())
+    while stack:
+        node = stack.pop()
+        if node.children and node.visits <= threshold:
+            removed += count_nodes(node) - 1
+            node.children = {}
+            node.untried_moves = candidate_moves(node.board, node.player)
+        else:
+            stack.extend(node.children.values())
+    return removed
+
+
+class TreeMemory:
+    """
+    Memory accounting of an MCTS tree, registered with the governor while a search grows it.
+
+    Only the searching thread may prune the tree; a shrink requested from
+    another thread is recorded and applied at the search's next check.
+    """
+
+    def __init__(self, root):
+        """Count the nodes already under `root`."""
+        self.root = root
+        self.nodes = count_nodes(root)
+        self.thread = threading.get_ident()
+        self.requested = None
+
+    def memory_usage(self):
+        """Estimated bytes of the tree."""
+        return self.nodes * NODE_BYTES
+
+    def shrink(self, target):
+        """Prune the tree down to about `target` bytes; returns the bytes freed."""
+        if threading.get_ident() != self.thread:
+            self.requested = target
+            return 0
+        self.requested = None
+        removed = prune_tree(self.root, self.nodes - target // NODE_BYTES)
+        self.nodes -= removed
+        return removed * NODE_BYTES
+
+
+def run_iterations(root, iterations, max_time=None, stop_event=None, stats=None, tt=None, callback=None):
+    """
+    Grow the tree under `root` until it has `iterations` visits.
+    
+    The tree is registered with the memory governor (as
+    'mcts_tree:<thread name>') for the duration, and pruned when the
+    process goes over its memory budget.
+    
+    Args:
+        root: MCTSNode to search from
+        iterations: Target number of visits at the root
+        max_time: Maximum search time in seconds (optional)
+        stop_event: Optional threading.Event that ends the search early
+        stats: Optional SearchStats counting iterations and rollout plies
+        tt: Optional TranspositionTable seeding newly expanded nodes
+        callback: Optional early-stop callback, as for mcts_search
+    """
+    # Set time limit if specified
+    end_time = None
+    if max_time:
+        end_time = time.time() + max_time
+    
+    memory = governor()
+    tree = TreeMemory(root)
+    tree_name = f"mcts_tree:{threading.current_thread().name}"
+    memory.register(tree_name, tree, PRIORITY_TREE)
+    try:
+        # Run MCTS iterations
+        while root.visits < iterations:
+            # Check time limit
+            if end_time and time.time() > end_time:
+                break
+            if stop_event is not None and stop_event.is_set():
+                break
+            if root.visits % CALLBACK_INTERVAL == 0:
+                if callback is not None and callback(root, iterations - root.visits):
+                    break
+                if tree.requested is not None:
+                    tree.shrink(tree.requested)
+                memory.enforce()
+            
+            # 1. Selection and Expansion
+            node, expanded = _select_and_expand(root, tt, stats)
+            tree.nodes += expanded
+        
+            # 2. Simulation
+            simulation_board = copy.deepcopy(node.board)
+            result = _simulate(simulation_board, node.player, stats)
+        
+            # 3. Backpropagation
+            _backpropagate(node, result)
+        
+            if stats is not None:
+                stats.iterations += 1
+    finally:
+        if stats is not None:
+            stats.memory = memory.usage()
+        memory.unregister(tree_name)
+
+
+def _select_and_expand(node, tt=None, stats=None):
+    """
+    Select a node to expand using the UCT formula.
+
+    Returns:
+        (node, expanded): Node to simulate from, and whether it was just added
+    """
     # Navigate down the tree until we reach a leaf node
     while node.untried_moves == [] and node.children:
         node = node.uct_select_child()
@@ -127,15 +388,56 @@ def _select_and_expand(node):
         board_copy = copy.deepcopy(node.board)
         board_copy.drop_piece(move, node.player)
         node = node.add_child(move, board_copy)
+        if tt is not None:
+            _seed_from_table(node, tt, stats)
+        return node, True
     
-    return node
+    return node, False
 
 
-def _simulate(board, player):
+def _node_key(node):
+    """
+    Table key of a node's statistics.
+
+    The salt holds the board shape, since keys of boards of different
+    shapes can coincide, and the player to move, since the same pieces
+    can be reached with either player to move when either may start.
+    """
+    board = node.board
+    return table_key(board.key(), KIND_MCTS, key_salt(board.rows, board.cols, board.connect, node.player))
+
+
+def _seed_from_table(node, tt, stats=None):
+    """Start a new node from statistics another search stored, scaled to a capped prior."""
+    entry = tt.probe_stats(_node_key(node))
+    if stats is not None:
+        stats.record_cache("tt", entry is not None)
+    if entry is not None and entry[0] > 0:
+        visits, wins = entry
+        scale = min(1.0, TT_PRIOR_CAP / visits)
+        node.visits = visits * scale
+        node.wins = wins * scale
+
+
+def _store_tree(root, tt):
+    """Write the statistics of every well-visited node under `root` to the table."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.visits < TT_MIN_VISITS:
+            continue
+        tt.store_stats(_node_key(node), node.visits, node.wins)
+        stack.extend(node.children.values())
+
+
+def _simulate(board, player, stats=None):
     """Simulate a random game from the current board state."""
     # Start with the next player (opponent of the player who just moved)
     current_player = 3 - player  # Toggle between 1 and 2
     
+    if stats is not None:
+        stats.rollouts += 1
+    
     # Play until the game is over
     while True:
         # Check if the game is over
@@ -156,6 +458,8 @@ def _simulate(board, player):
         # Make a random move
         move = random.choice(valid_moves)
         board.drop_piece(move, current_player)
+        if stats is not None:
+            stats.rollout_plies += 1
         
         # Switch player
         current_player = 3 - current_player
@@ -0,0 +1,177 @@
+import gc
+import sys
+import threading
+import weakref
+
+# Per-process memory budget used until set_budget is called
+DEFAULT_BUDGET_MB = 512
+
+# Share of the budget shrinking aims for, so a growing tree is not pruned
+# again a few iterations later
+SHRINK_TO = 0.8
+
+# Eviction priorities: structures with a lower priority are shrunk first
+PRIORITY_CACHE = 0   # results or tables that are cheap to rebuild
+PRIORITY_TREE = 1    # search trees, pruned from their least-visited subtrees
+PRIORITY_TABLE = 2   # fixed-size tables, counted but never shrunk
+
+# The process's governor, created on first use
+_governor = None
+_governor_lock = threading.Lock()
+
+
+class MemoryGovernor:
+    """
+    Keeps the engine-side structures of one process within a byte budget.
+
+    Structures register themselves with a name and a priority. A structure
+    provides memory_usage() (bytes) and shrink(target) (try to get down to
+    `target` bytes, return the bytes freed). The governor holds them weakly,
+    so a structure that is dropped stops counting without unregistering.
+
+    Searches call enforce() every so often. When the total is over budget,
+    structures are shrunk from the lowest priority up until it is back
+    under SHRINK_TO of the budget. PRIORITY_TABLE structures are counted
+    but left alone, so the others are shrunk to fit what they leave; when
+    the tables alone fill the budget, everything else is emptied.
+    """
+
+    def __init__(self, budget_bytes):
+        """Initialize an empty governor with a budget in bytes."""
+        self.budget = budget_bytes
+        self._structures = {}   # name: (priority, weakref)
+        self._lock = threading.Lock()
+        self.freed = {}         # name: bytes freed by shrinking so far
+
+    def register(self, name, structure, priority=PRIORITY_CACHE):
+        """
+        Track `structure` under `name`, replacing any structure of that name.
+
+        Returns:
+            structure: The structure, for chaining
+        """
+        with self._lock:
+            self._structures[name] = (priority, weakref.ref(structure))
+        return structure
+
+    def unregister(self, name):
+        """Stop tracking the structure registered under `name`."""
+        with self._lock:
+            self._structures.pop(name, None)
+
+    def _live(self):
+        """Registered structures still alive, as (priority, name, structure), lowest priority first."""
+        live = []
+        for name, (priority, ref) in list(self._structures.items()):
+            structure = ref()
+            if structure is None:
+                self._structures.pop(name, None)
+            else:
+                live.append((priority, name, structure))
+        live.sort(key=lambda item: item[0])
+        return live
+
+    def usage(self):
+        """Return {name: bytes} of every registered structure."""
+        with self._lock:
+            return {name: int(structure.memory_usage()) for _, name, structure in self._live()}
+
+    def total(self):
+        """Bytes used by all registered structures."""
+        return sum(self.usage().values())
+
+    def enforce(self):
+        """
+        Shrink structures, lowest priority first, when the total is over budget.
+
+        Returns:
+            freed: Bytes freed
+        """
+        with self._lock:
+            live = self._live()
+            sizes = [structure.memory_usage() for _, _, structure in live]
+            if sum(sizes) <= self.budget:
+                return 0
+            # Fixed-size tables cannot give anything back, so the rest must
+            # fit in what they leave of the budget
+            fixed = sum(size for (priority, _, _), size in zip(live, sizes) if priority >= PRIORITY_TABLE)
+            excess = sum(sizes) - fixed - max(0, int(self.budget * SHRINK_TO) - fixed)
+            freed = 0
+            for (priority, name, structure), size in zip(live, sizes):
+                if freed >= excess or priority >= PRIORITY_TABLE:
+                    break
+                released = structure.shrink(max(0, size - (excess - freed)))
+                if released:
+                    self.freed[name] = self.freed.get(name, 0) + released
+                    freed += released
+        if freed:
+            # Pruned search trees hold parent/child reference cycles
+            gc.collect()
+        return freed
+
+
+def governor():
+    """Return the process's MemoryGovernor, creating it on first call."""
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = MemoryGovernor(DEFAULT_BUDGET_MB << 20)
+    return _governor
+
+
+def set_budget(budget_mb):
+    """Set the process's memory budget in megabytes."""
+    governor().budget = int(budget_mb * (1 << 20))
+
+
+class DictCache:
+    """
+    A plain dict (or OrderedDict) registered with the governor.
+
+    Its size is estimated from the dict itself plus `entry_bytes` per
+    entry, plus value_bytes(value) of every value when given. Shrinking
+    drops the oldest entries first (insertion order, so least recently used
+    for an OrderedDict kept in LRU order), or everything with `clear_only`.
+    """
+
+    def __init__(self, data, entry_bytes=0, value_bytes=None, clear_only=False):
+        """
+        Initialize the wrapper.
+
+        Args:
+            data: The dict to account for (kept by reference, never copied)
+            entry_bytes: Estimated bytes of one key and value
+            value_bytes: Optional function giving the extra bytes held by a value
+            clear_only: Shrink by clearing the whole dict
+        """
+        self.data = data
+        self.entry_bytes = entry_bytes
+        self.value_bytes = value_bytes
+        self.clear_only = clear_only
+
+    def _entry(self, value):
+        """Estimated bytes of one entry holding `value`."""
+        return self.entry_bytes + (self.value_bytes(value) if self.value_bytes else 0)
+
+    def memory_usage(self):
+        """Estimated bytes held by the dict."""
+        size = sys.getsizeof(self.data) + len(self.data) * self.entry_bytes
+        if self.value_bytes is not None:
+            size += sum(self.value_bytes(value) for value in list(self.data.values()))
+        return size
+
+    def shrink(self, target):
+        """Drop entries until the estimate is at most `target` bytes; returns the bytes freed."""
+        size = self.memory_usage()
+        if size <= target:
+            return 0
+        if self.clear_only:
+            self.data.clear()
+            return size - sys.getsizeof(self.data)
+        freed = 0
+        for key in list(self.data):
+            if size - freed <= target:
+                break
+            freed += self._entry(self.data.pop(key))
+        return freed
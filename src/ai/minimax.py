@@ -1,13 +1,18 @@
 import json
 import os
+import threading
+import time
 from copy import deepcopy
 
+from src.ai.ttable import TranspositionTable, resolve, check_board, table_key, EXACT, LOWER, UPPER, KIND_MINIMAX_P1, KIND_MINIMAX_P2
+from src.ai.threats import ThreatMap, columns
+from src.ai.memory import governor, DictCache
+from src.ai.tablebase import open_tablebase
+from src.ai.poscache import open_cache
+
 # History scores file path
 HISTORY_FILE = 'data/history_scores.json'
 
-# Ensure data directory exists
-os.makedirs('data', exist_ok=True)
-
 # Load history scores
 def load_history_scores():
     """Load history scores from file or create empty dict if file doesn't exist."""
@@ -19,22 +24,105 @@ def load_history_scores():
             return {}
     return {}
 
+# Serialises saves and the first load; searches update the scores without it
+_history_lock = threading.Lock()
+
 # Save history scores
 def save_history_scores(history_scores):
-    """Save history scores to file."""
-    with open(HISTORY_FILE, 'w') as f:
-        json.dump(history_scores, f)
+    """Save history scores to file; a snapshot is written, so searches in other threads may keep updating them."""
+    with _history_lock:
+        snapshot = dict(history_scores)
+        os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
+        with open(HISTORY_FILE, 'w') as f:
+            json.dump(snapshot, f)
+
+# Global history scores; filled from HISTORY_FILE by the first search rather
+# than at import, so importing the engine does no I/O
+history_scores = {}
+_history_loaded = False
+
+# History scores are only a move-ordering hint, so the memory governor may
+# clear them
+_history_memory = governor().register("history_scores", DictCache(history_scores, entry_bytes=100, clear_only=True))
+
+def ensure_history_loaded():
+    """Load the saved history scores into `history_scores` once per process."""
+    global _history_loaded
+    if not _history_loaded:
+        with _history_lock:
+            if not _history_loaded:
+                history_scores.update(load_history_scores())
+                _history_loaded = True
+
+def reset_history_scores():
+    """Start from empty history scores (the saved ones are not loaded afterwards)."""
+    global _history_loaded
+    history_scores.clear()
+    _history_loaded = True
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when its stop event has been set."""
+
+
+class Selectivity:
+    """
+    Selective-search settings for minimax: late-move reductions and threat extensions.
+
+    Moves after the first `reduce_after` at a node with at least
+    `min_depth` plies left are searched `reduction` plies shallower, and
+    searched again at full depth if they turn out better than the best
+    move so far. A forced reply (the block of a threat the previous move
+    created) is searched one ply deeper, at most `max_extensions` times
+    along one line.
+    """
+
+    def __init__(self, reduce_after=3, reduction=1, min_depth=3, max_extensions=2):
+        """
+        Initialize the settings.
 
-# Global history scores
-history_scores = load_history_scores()
+        Args:
+            reduce_after: Moves searched at full depth before reductions
+                start (None disables reductions)
+            reduction: Plies taken off a reduced move
+            min_depth: Remaining depth a node needs for its moves to be reduced
+            max_extensions: Extension plies allowed along one line (0 disables extensions)
+        """
+        self.reduce_after = reduce_after
+        self.reduction = reduction
+        self.min_depth = max(min_depth, reduction + 1)
+        self.max_extensions = max_extensions
 
-def iterative_deepening_minimax(board, max_depth):
+
+def iterative_deepening_minimax(board, max_depth, stop_event=None, player=2, save_history=True, stats=None,
+                                return_partial=False, tt=None, selective=None, callback=None, tablebase=None, cache=None,
+                                cache_depth=None, weights=None):
     """
     Perform iterative deepening minimax to find the best move.
     
     Args:
         board: Current board state
         max_depth: Maximum depth to search
+        stop_event: Optional threading.Event; when set the search raises
+            SearchAborted (used to cancel pondering)
+        player: Player the search moves for (1 or 2)
+        save_history: Write the history scores to disk after the search
+        stats: Optional SearchStats filled in with counters and per-depth times
+        return_partial: When the stop event fires, return the result of the
+            last completed depth instead of raising SearchAborted
+        tt: Optional TranspositionTable, or the shared-memory name of one
+        selective: Optional Selectivity for reductions and extensions
+        callback: Optional function called as callback(depth, score, column)
+            after every completed depth; returning True ends the search
+        tablebase: Optional Tablebase, tablebase directory or 'auto'; a
+            position it covers is answered from it without searching
+        cache: Optional PositionCache, cache file or 'auto'; a position it
+            holds a result of at least `cache_depth` for is answered from it,
+            and the result of every completed search is recorded in it
+        cache_depth: Shallowest cached result accepted (default: max_depth);
+            a time-limited search may take a result shallower than max_depth
+        weights: Evaluation weights tuple from weights_for (default: the
+            weights in use)
         
     Returns:
         (value, column): Best move with its evaluation
@@ -43,21 +131,171 @@ def iterative_deepening_minimax(board, max_depth):
     
     best_score = float('-inf')
     best_col = None
+    tt = resolve(tt)
+    if tt is not None:
+        check_board(board)
+    
+    # Solved positions need no search
+    tablebase = open_tablebase(tablebase, board)
+    if tablebase is not None:
+        hit = tablebase.best_move(board, player)
+        if stats is not None:
+            stats.record_cache("tablebase", hit is not None)
+        if hit is not None:
+            col, value = hit
+            score = 1000000 if value > 0 else (-1000000 if value < 0 else 0)
+            if stats is not None:
+                stats.move = col
+                stats.score = score
+            return score, col
+    
+    # So are positions searched as deep before, in this or an earlier run
+    cache = open_cache(cache, board)
+    if cache is not None:
+        hit = cache.result(board, player, max_depth if cache_depth is None else cache_depth, weights)
+        if stats is not None:
+            stats.record_cache("cache", hit is not None)
+        if hit is not None:
+            if stats is not None:
+                stats.move = hit[1]
+                stats.score = hit[0]
+            return hit
+    
+    ensure_history_loaded()
+    
+    # A forced reply or an immediate win is settled by the first depth
+    threats = ThreatMap(board)
+    if threats.winning_column(player) is not None or len(columns(threats.non_losing(player), board.geometry)) <= 1:
+        max_depth = min(max_depth, 1)
     
     # Start with depth 1 and increase
+    memory = governor()
     for depth in range(1, max_depth + 1):
-        score, col = minimax(board, depth, float('-inf'), float('inf'), True)
+        memory.enforce()
+        depth_start = time.perf_counter()
+        pv = [] if stats is not None else None
+        try:
+            score, col = minimax(board, depth, float('-inf'), float('inf'), True, stop_event, player, stats,
+                                 pv, tt=tt, selective=selective, weights=weights)
+        except SearchAborted:
+            if not return_partial or best_col is None:
+                raise
+            if stats is not None:
+                stats.time += time.perf_counter() - depth_start
+            break
+        
+        if stats is not None:
+            elapsed = time.perf_counter() - depth_start
+            stats.depth_times.append(elapsed)
+            stats.time += elapsed
+            stats.depth = depth
+            stats.pv = pv
         
         if score > best_score:
             best_score = score
             best_col = col
+        if cache is not None:
+            cache.record_result(board, player, score, depth, col, weights)
+        
+        if callback is not None and callback(depth, score, col):
+            break
+    
+    if stats is not None:
+        stats.move = best_col
+        stats.score = best_score
+        stats.memory = memory.usage()
     
     # Make sure to save the history scores after each search
-    save_history_scores(history_scores)
+    if save_history:
+        save_history_scores(history_scores)
     
     return best_score, best_col
 
-def minimax(board, depth, alpha, beta, maximizing_player):
+def multipv_minimax(board, max_depth, k=None, stop_event=None, player=2, stats=None, tt=None, callback=None,
+                    weights=None):
+    """
+    Score the top `k` root moves exactly with one iterative-deepening search.
+
+    At each depth the root moves are searched best-first (by the previous
+    depth's scores). Once `k` exact scores are known, the remaining moves
+    are searched with the k-th best score as alpha, so moves that cannot
+    enter the top `k` are cut off early. A transposition table is shared
+    between the root moves and across depths; a private in-process one is
+    created when none is given (callers analysing many positions pass their
+    own, so its entries carry over).
+
+    Args:
+        board: Current board state
+        max_depth: Maximum depth to search
+        k: Number of moves to score exactly (default: all legal moves)
+        stop_event: Optional threading.Event; when set the result of the
+            last completed depth is returned
+        player: Player the search moves for (1 or 2)
+        stats: Optional SearchStats filled in with counters and per-depth times
+        tt: Optional TranspositionTable, or the shared-memory name of one
+        callback: Optional function called as callback(depth, lines) after
+            every completed depth
+        weights: Evaluation weights tuple from weights_for (default: the
+            weights in use)
+
+    Returns:
+        lines: List of (column, score, pv) for the top `k` moves, best first;
+            raises SearchAborted if the first depth did not complete
+    """
+    ensure_history_loaded()
+    valid_moves = board.get_valid_moves()
+    k = len(valid_moves) if k is None else min(k, len(valid_moves))
+    tt = TranspositionTable.private(4) if tt is None else resolve(tt)
+    check_board(board)
+
+    lines = []
+    order = sorted(valid_moves, key=lambda col: history_scores.get(str(col), 0), reverse=True)
+    for depth in range(1, max_depth + 1):
+        depth_start = time.perf_counter()
+        results = []
+        try:
+            for col in order:
+                # Alpha is the k-th best exact score once k are known
+                exact = sorted((score for _, score, _ in results), reverse=True)
+                alpha = exact[k - 1] if len(exact) >= k else float('-inf')
+
+                child = deepcopy(board)
+                child.drop_piece(col, player)
+                child_pv = []
+                score, _ = minimax(child, depth - 1, alpha, float('inf'), False, stop_event, player, stats,
+                                   child_pv, tt, weights=weights)
+                if score > alpha or len(exact) < k:
+                    results.append((col, score, [col] + child_pv))
+        except SearchAborted:
+            if not lines:
+                raise
+            if stats is not None:
+                stats.time += time.perf_counter() - depth_start
+            break
+
+        results.sort(key=lambda line: line[1], reverse=True)
+        lines = results[:k]
+        searched = [col for col, _, _ in results]
+        order = searched + [col for col in order if col not in searched]
+
+        if stats is not None:
+            elapsed = time.perf_counter() - depth_start
+            stats.depth_times.append(elapsed)
+            stats.time += elapsed
+            stats.depth = depth
+            stats.pv = lines[0][2]
+        if callback is not None:
+            callback(depth, lines)
+        if all(abs(score) >= 1000000 for _, score, _ in lines):
+            break  # Every line is a forced result
+
+    if stats is not None and lines:
+        stats.move = lines[0][0]
+        stats.score = lines[0][1]
+    return lines
+
+def minimax(board, depth, alpha, beta, maximizing_player, stop_event=None, player=2, stats=None, pv=None, tt=None,
+            selective=None, extensions=0, weights=None):
     """
     Minimax algorithm with alpha-beta pruning.
     
@@ -67,24 +305,106 @@ def minimax(board, depth, alpha, beta, maximizing_player):
         alpha: Alpha value for pruning
         beta: Beta value for pruning
         maximizing_player: True if maximizing (AI), False if minimizing (human)
+        stop_event: Optional threading.Event checked at every node
+        player: Player the search maximizes for (1 or 2)
+        stats: Optional SearchStats counting nodes, leaf evaluations and cutoffs
+        pv: Optional list, filled with the best line found from this node
+        tt: Optional TranspositionTable for results and leaf evaluations
+        selective: Optional Selectivity for reductions and extensions
+        extensions: Extension plies already used on the line to this node
+        weights: Evaluation weights tuple from weights_for (default: the weights in use)
         
     Returns:
         (value, column): Best move with its evaluation
     """
     global history_scores
     
-    from src.ai.evaluation import evaluate_position
+    from src.ai.evaluation import evaluate_position, table_salt
+    
+    if stop_event is not None and stop_event.is_set():
+        raise SearchAborted()
+    
+    if stats is not None:
+        stats.nodes += 1
+    
+    opponent = 3 - player
     
     # Terminal conditions
-    if board.is_winner(2):  # AI wins
+    if board.is_winner(player):  # AI wins
         return (1000000, None)
-    elif board.is_winner(1):  # Human wins
+    elif board.is_winner(opponent):  # Opponent wins
         return (-1000000, None)
-    elif board.is_full() or depth == 0:  # Draw or max depth
-        score = evaluate_position(board, 2)  # Evaluate for AI
+    
+    # Transposition table: reuse results searched at least this deep
+    key = None
+    tt_move = None
+    if tt is not None:
+        key = table_key(board.key(), KIND_MINIMAX_P1 if player == 1 else KIND_MINIMAX_P2, table_salt(board, weights))
+        entry = tt.probe(key)
+        if stats is not None:
+            stats.record_cache("tt", entry is not None)
+        if entry is not None:
+            tt_value, tt_depth, flag, tt_move = entry
+            if tt_depth >= depth and (depth == 0 or tt_move is not None):
+                if (flag == EXACT or (flag == LOWER and tt_value >= beta)
+                        or (flag == UPPER and tt_value <= alpha)):
+                    if pv is not None and tt_move is not None:
+                        pv[:] = [tt_move]
+                    return (tt_value, tt_move)
+    
+    # Threat hints: the side to move wins at once with a playable winning
+    # cell, and loses facing two playable opponent threats it cannot both block
+    mover = player if maximizing_player else opponent
+    threats = ThreatMap(board)
+    win_col = threats.winning_column(mover)
+    must_block = threats.immediate(3 - mover)
+    if win_col is not None or must_block & (must_block - 1):
+        if stats is not None:
+            stats.threat_exits += 1
+        won = win_col is not None
+        column = win_col if won else threats.winning_column(3 - mover)  # lost: block one anyway
+        if pv is not None:
+            pv[:] = [column]
+        return (1000000 if won == maximizing_player else -1000000, column)
+    
+    # Only moves that do not hand the opponent an immediate win are searched
+    safe = threats.non_losing(mover)
+    if not safe and threats.playable:
+        # Every move loses: a forced block under another threat, or every
+        # column only playable beneath an opponent threat
+        if stats is not None:
+            stats.threat_exits += 1
+        column = threats.winning_column(3 - mover)
+        if column is None:
+            column = columns(threats.playable, board.geometry)[0]
+        if pv is not None:
+            pv[:] = [column]
+        return (-1000000 if maximizing_player else 1000000, column)
+    
+    # Selective search: a forced block is searched one ply deeper (even
+    # past the horizon), late moves at deep enough nodes shallower
+    extend = 0
+    reduce_from = None
+    if selective is not None:
+        if must_block and extensions < selective.max_extensions:
+            extend = 1
+        elif depth >= selective.min_depth and selective.reduce_after is not None:
+            reduce_from = selective.reduce_after
+    
+    if board.is_full() or (depth == 0 and not extend):  # Draw or max depth
+        if stats is not None:
+            stats.leaf_evals += 1
+        score = evaluate_position(board, player, weights)  # Evaluate for AI
+        if tt is not None:
+            tt.store(key, score, depth, EXACT, None)
         return (score, None)
     
-    valid_moves = board.get_valid_moves()
+    alpha_orig, beta_orig = alpha, beta
+    valid_moves = columns(safe, board.geometry)
+    if stats is not None:
+        stats.expanded += 1
+        stats.moves_generated += len(valid_moves)
+        stats.extensions += extend
     
     # Sort moves by history score for better pruning
     move_scores = []
@@ -93,57 +413,109 @@ def minimax(board, depth, alpha, beta, maximizing_player):
         score = history_scores.get(move_key, 0)
         move_scores.append((col, score))
     
-    # Sort by score (descending)
-    move_scores.sort(key=lambda x: x[1], reverse=True)
+    # Sort by score (descending), the transposition table's best move first
+    move_scores.sort(key=lambda x: (x[0] == tt_move, x[1]), reverse=True)
     
     if maximizing_player:  # AI's turn
         value = float('-inf')
         column = valid_moves[0] if valid_moves else None
         
-        for col, _ in move_scores:
+        for index, (col, _) in enumerate(move_scores):
             temp_board = deepcopy(board)
-            temp_board.drop_piece(col, 2)  # AI player
+            temp_board.drop_piece(col, player)  # AI player
             
-            new_score, _ = minimax(temp_board, depth - 1, alpha, beta, False)
+            child_pv = [] if pv is not None else None
+            child_depth = depth - 1 + extend
+            if reduce_from is not None and index >= reduce_from:
+                if stats is not None:
+                    stats.reductions += 1
+                new_score, _ = minimax(temp_board, child_depth - selective.reduction, alpha, beta, False, stop_event,
+                                       player, stats, child_pv, tt, selective, extensions, weights)
+                if new_score > alpha:  # Better than expected: verify at full depth
+                    if stats is not None:
+                        stats.re_searches += 1
+                    new_score, _ = minimax(temp_board, child_depth, alpha, beta, False, stop_event, player, stats,
+                                           child_pv, tt, selective, extensions, weights)
+            else:
+                new_score, _ = minimax(temp_board, child_depth, alpha, beta, False, stop_event, player, stats,
+                                       child_pv, tt, selective, extensions + extend, weights)
             
             if new_score > value:
                 value = new_score
                 column = col
+                if pv is not None:
+                    pv[:] = [col] + child_pv
             
             alpha = max(alpha, value)
             
             if alpha >= beta:
+                if stats is not None:
+                    stats.cutoffs += 1
+                    stats.first_move_cutoffs += index == 0
                 # Store successful pruning move
                 move_key = str(column)
                 history_scores[move_key] = history_scores.get(move_key, 0) + (2 ** depth)
                 break
         
+        _tt_store(tt, key, value, depth, alpha_orig, beta_orig, column)
         return value, column
     
-    else:  # Human's turn
+    else:  # Opponent's turn
         value = float('inf')
         column = valid_moves[0] if valid_moves else None
         
-        for col, _ in move_scores:
+        for index, (col, _) in enumerate(move_scores):
             temp_board = deepcopy(board)
-            temp_board.drop_piece(col, 1)  # Human player
+            temp_board.drop_piece(col, opponent)  # Opponent
             
-            new_score, _ = minimax(temp_board, depth - 1, alpha, beta, True)
+            child_pv = [] if pv is not None else None
+            child_depth = depth - 1 + extend
+            if reduce_from is not None and index >= reduce_from:
+                if stats is not None:
+                    stats.reductions += 1
+                new_score, _ = minimax(temp_board, child_depth - selective.reduction, alpha, beta, True, stop_event,
+                                       player, stats, child_pv, tt, selective, extensions, weights)
+                if new_score < beta:  # Better than expected: verify at full depth
+                    if stats is not None:
+                        stats.re_searches += 1
+                    new_score, _ = minimax(temp_board, child_depth, alpha, beta, True, stop_event, player, stats,
+                                           child_pv, tt, selective, extensions, weights)
+            else:
+                new_score, _ = minimax(temp_board, child_depth, alpha, beta, True, stop_event, player, stats,
+                                       child_pv, tt, selective, extensions + extend, weights)
             
             if new_score < value:
                 value = new_score
                 column = col
+                if pv is not None:
+                    pv[:] = [col] + child_pv
             
             beta = min(beta, value)
             
             if alpha >= beta:
+                if stats is not None:
+                    stats.cutoffs += 1
+                    stats.first_move_cutoffs += index == 0
                 # Store successful pruning move
                 move_key = str(column)
                 history_scores[move_key] = history_scores.get(move_key, 0) + (2 ** depth)
                 break
         
+        _tt_store(tt, key, value, depth, alpha_orig, beta_orig, column)
         return value, column
 
+def _tt_store(tt, key, value, depth, alpha, beta, column):
+    """Store a node's result with the bound type implied by its search window."""
+    if tt is None:
+        return
+    if value <= alpha:
+        flag = UPPER
+    elif value >= beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    tt.store(key, value, depth, flag, column)
+
 def decay_history_scores():
     """Decay history scores to prevent inflation over time."""
     global history_scores
@@ -0,0 +1,230 @@
+import copy
+import threading
+
+import numpy as np
+
+from src.ai.minimax import multipv_minimax, history_scores, ensure_history_loaded, SearchAborted
+from src.ai.mcts import MCTSNode, run_iterations
+from src.ai.engines import select_move
+from src.ai.ttable import TranspositionTable
+
+
+class Ponderer:
+    """
+    Searches on the opponent's time.
+
+    While the opponent is to move, a background thread speculatively
+    searches the position. For minimax every reply is searched in turn
+    (most promising first) and the chosen answer is stored per reply; for
+    MCTS a tree is grown from the opponent's point of view so the subtree
+    under the reply that is actually played can be reused. When the
+    opponent's move arrives, `take` returns the matching work and throws
+    the rest away.
+    """
+
+    def __init__(self, config, player):
+        """
+        Initialize the ponderer.
+
+        Args:
+            config: Engine configuration of the engine pondering; minimax
+                replies are searched exactly as select_move would search them,
+                and MCTS grows its tree up to the config's iterations
+            player: The player this engine moves for (1 or 2)
+        """
+        self.config = config
+        self.ai_type = config["engine"]
+        self.player = player
+        self.iterations = config.get("iterations", float('inf'))
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._board = None
+        self._results = {}     # minimax: {reply: column}
+        self._current = None   # minimax: reply being searched right now
+        self._finish_current = False
+        self._root = None      # mcts: tree rooted at the opponent's turn
+
+    def start(self, board):
+        """
+        Start pondering on `board`, where the opponent is to move.
+
+        Args:
+            board: Current board state (copied, never modified)
+        """
+        self.stop()
+        self._stop.clear()
+        self._board = copy.deepcopy(board)
+        self._results = {}
+        self._current = None
+        self._finish_current = False
+        self._root = None
+
+        if self.ai_type == "minimax":
+            target = self._ponder_minimax
+        else:
+            self._root = MCTSNode(copy.deepcopy(board), player=3 - self.player)
+            target = self._ponder_mcts
+
+        self._thread = threading.Thread(target=target, name=f"ponder{self.player}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Halt speculative work, keeping whatever has already finished."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def take(self, board, move):
+        """
+        Collect the pondering result for the opponent's actual move.
+
+        If that reply is being searched right now it is allowed to finish,
+        since it is exactly the search we would otherwise start from scratch.
+
+        Args:
+            board: Board after the opponent's move
+            move: Column the opponent played
+
+        Returns:
+            result: Column to play (minimax) or warm MCTSNode for `board`
+                (MCTS), or None if pondering did not cover this move
+        """
+        if self._board is None:
+            return None
+
+        with self._lock:
+            if self.ai_type == "minimax" and self._current == move:
+                self._finish_current = True
+            else:
+                self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop.set()
+
+        result = None
+        if self.ai_type == "minimax":
+            result = self._results.get(move)
+        elif self._root is not None and move in self._root.children:
+            result = self._root.children[move]
+            if not np.array_equal(result.board.board, board.board):
+                result = None
+
+        self._board = None
+        self._results = {}
+        self._root = None
+        return result
+
+    def _ponder_minimax(self):
+        """Search every opponent reply, best history score first."""
+        ensure_history_loaded()
+        replies = self._board.get_valid_moves()
+        replies.sort(key=lambda col: history_scores.get(str(col), 0), reverse=True)
+
+        for reply in replies:
+            with self._lock:
+                if self._stop.is_set() or self._finish_current:
+                    return
+                self._current = reply
+
+            reply_board = copy.deepcopy(self._board)
+            reply_board.drop_piece(reply, 3 - self.player)
+            if reply_board.is_winner(3 - self.player) or reply_board.is_full():
+                continue
+
+            col = select_move(reply_board, self.player, self.config, save_history=False, stop_event=self._stop)
+            with self._lock:
+                # A search cut short by stop() is not the move the engine would play
+                if self._stop.is_set():
+                    return
+                self._results[reply] = col
+
+        with self._lock:
+            self._current = None
+
+    def _ponder_mcts(self):
+        """Grow the opponent-to-move tree until stopped or full."""
+        run_iterations(self._root, self.iterations, stop_event=self._stop)
+
+
+class Analyst:
+    """
+    Background multi-PV analysis of the position shown to the player.
+
+    The search deepens one level at a time and publishes the score of
+    every column after each completed depth, so the first scores appear
+    almost at once and improve while the player thinks. One private
+    transposition table serves every analysis, so positions reached again
+    after a move start from what was already searched.
+    """
+
+    def __init__(self, depth):
+        """
+        Initialize the analyst.
+
+        Args:
+            depth: Deepest multi-PV search to run
+        """
+        self.depth = depth
+        self.board_key = None
+        self.table = TranspositionTable.private(4)
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._scores = None
+        self._searched_depth = 0
+
+    def start(self, board, player):
+        """
+        Analyse `board` for `player` in the background, replacing any running analysis.
+
+        Args:
+            board: Current board state (copied, never modified)
+            player: Player to move on `board`
+        """
+        self.stop()
+        self._stop.clear()
+        self.board_key = board.key()
+        self._thread = threading.Thread(target=self._analyse, args=(copy.deepcopy(board), player), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Halt the analysis and forget its scores."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._scores = None
+            self._searched_depth = 0
+        self.board_key = None
+
+    def scores(self):
+        """
+        Latest published analysis.
+
+        Returns:
+            (depth, scores): Depth searched and {column: score} from the
+            mover's point of view, or None before the first depth completes
+        """
+        with self._lock:
+            if self._scores is None:
+                return None
+            return self._searched_depth, dict(self._scores)
+
+    def _publish(self, depth, lines):
+        """multipv_minimax callback: keep the scores of a completed depth."""
+        with self._lock:
+            self._scores = {col: score for col, score, _ in lines}
+            self._searched_depth = depth
+
+    def _analyse(self, board, player):
+        """Run the multi-PV search until it completes or is stopped."""
+        try:
+            multipv_minimax(board, self.depth, stop_event=self._stop, player=player, tt=self.table,
+                            callback=self._publish)
+        except SearchAborted:
+            pass
@@ -0,0 +1,323 @@
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from src.ai.evaluation import table_salt
+from src.ai.ttable import (table_key, key_salt, pack_result, unpack_result, EXACT, MAX_COLS, KIND_MINIMAX_P1,
+                           KIND_MINIMAX_P2)
+
+# Cache files live in CACHE_DIR, one per board shape
+CACHE_DIR = 'data/cache'
+
+_HEADER = struct.Struct("<8sIBBBx8xQ")  # magic, version, rows, cols, connect, entry count
+_MAGIC = b"C4PCACHE"
+CACHE_VERSION = 3
+
+# Entries kept in a cache file (16 bytes each)
+MAX_ENTRIES = 1 << 20
+
+# Entries recorded since the last save before the cache is saved early
+PENDING_LIMIT = 1 << 16
+
+# Seconds between periodic saves
+SAVE_INTERVAL = 60.0
+
+# Key kind of MCTS root results, which tables never store. They use the
+# minimax data layout: root visits as the value, the win rate in percent
+# as the depth, and the chosen move. Their keys are salted with the side
+# to move (see _mcts_key), as minimax keys are through their kind
+KIND_MCTS_ROOT = 3
+
+# Shallowest minimax result and fewest MCTS root visits worth keeping
+MIN_DEPTH = 4
+MIN_VISITS = 256
+
+# Caches opened in this process, by path
+_opened = {}
+
+
+def cache_path(rows=6, cols=7, connect=4):
+    """Default cache file of a board shape."""
+    return os.path.join(CACHE_DIR, f"{rows}x{cols}c{connect}.bin")
+
+
+def _priority(keys, data):
+    """
+    How much each entry is worth keeping, for uint64 arrays of keys and data words.
+
+    Minimax results count their search depth, MCTS results the log2 of
+    their visits, which puts the two on a similar scale (a depth-8 search
+    is worth about as much as 256 visits).
+    """
+    mcts = (keys & np.uint64(3)) == KIND_MCTS_ROOT
+    depth = ((data >> np.uint64(32)) & np.uint64(0xFF)).astype(np.float64)
+    visits = (data & np.uint64(0xFFFFFFFF)).astype(np.float64) - (1 << 31)
+    return np.where(mcts, np.log2(np.maximum(visits, 1)), depth)
+
+
+def _mcts_key(board, player):
+    """Key of the MCTS root result for `player` to move on `board`."""
+    return table_key(board.key(), KIND_MCTS_ROOT, key_salt(player))
+
+
+class PositionCache:
+    """
+    Search results kept on disk across games and restarts.
+
+    Entries use the transposition table's keys and data words: exact
+    minimax results with their depth and best move (keyed by the
+    evaluation weights too, see table_salt), and the move, visits
+    and win rate of MCTS searches (under KIND_MCTS_ROOT). Both are keyed
+    by the side to move. The file is a
+    small header followed by the entries sorted by key; it is
+    memory-mapped on the first probe, so starting up costs nothing and a
+    probe reads a few pages. New results collect in memory and are merged
+    into the file by save(), which keeps the better entry for every key,
+    the MAX_ENTRIES most valuable entries overall, and replaces the file
+    atomically. Processes sharing a file each merge with what is on disk
+    when they save, so entries are only lost when two saves race. A lock
+    lets pondering threads save while the main thread probes and records.
+    """
+
+    def __init__(self, path, rows=6, cols=7, connect=4, max_entries=MAX_ENTRIES):
+        """
+        Initialize the cache; nothing is read until the first probe.
+
+        Args:
+            path: Cache file
+            rows, cols, connect: Board shape the cache holds positions of
+            max_entries: Entries kept in the file
+        """
+        self.path = path
+        self.shape = (rows, cols, connect)
+        self.max_entries = max_entries
+        self.pending = {}
+        self.keys = None
+        self.data = None
+        self.last_save = time.monotonic()
+        self.probes = 0
+        self.hits = 0
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        with self.lock:
+            self._load()
+            return len(self.keys) + len(self.pending)
+
+    def covers(self, board):
+        """True if `board` has this cache's shape and is narrow enough for its move field."""
+        return (board.rows, board.cols, board.connect) == self.shape and board.cols <= MAX_COLS
+
+    def _load(self):
+        """Map the cache file, unless already done; a missing, foreign or outdated file reads as empty."""
+        if self.keys is not None:
+            return
+        entries = np.zeros((0, 2), dtype=np.uint64)
+        if os.path.exists(self.path) and os.path.getsize(self.path) >= _HEADER.size:
+            with open(self.path, 'rb') as f:
+                magic, version, rows, cols, connect, count = _HEADER.unpack(f.read(_HEADER.size))
+            if magic == _MAGIC and version == CACHE_VERSION and (rows, cols, connect) == self.shape and count:
+                entries = np.memmap(self.path, dtype=np.uint64, mode='r', offset=_HEADER.size, shape=(count, 2))
+        self.keys = entries[:, 0]
+        self.data = entries[:, 1]
+
+    def _read(self, key):
+        """Return the data word stored for `key`, or None."""
+        with self.lock:
+            self.probes += 1
+            data = self.pending.get(key)
+            if data is None:
+                self._load()
+                index = int(np.searchsorted(self.keys, np.uint64(key)))
+                if index < len(self.keys) and int(self.keys[index]) == key:
+                    data = int(self.data[index])
+            if data is not None:
+                self.hits += 1
+            return data
+
+    def _record(self, key, data):
+        """Keep a new entry until the next save, saving early when too many are waiting."""
+        with self.lock:
+            self.pending[key] = data
+            if len(self.pending) >= PENDING_LIMIT:
+                self.save()
+
+    def probe(self, key):
+        """
+        Look up an entry (minimax results and MCTS root results share one layout).
+
+        Returns:
+            (value, depth, flag, move) or None, as TranspositionTable.probe
+        """
+        data = self._read(key)
+        return None if data is None else unpack_result(data)
+
+    def store(self, key, value, depth, flag, move):
+        """Record a minimax result; only exact results of at least MIN_DEPTH that beat the stored depth are kept."""
+        if flag != EXACT or depth < MIN_DEPTH or move is None:
+            return
+        current = self.probe(key)
+        if current is not None and current[1] >= depth:
+            return
+        self._record(key, pack_result(value, depth, flag, move))
+
+    def result(self, board, player, depth, weights=None):
+        """
+        Cached minimax answer for `player` to move on `board`.
+
+        Args:
+            board: Current board state
+            player: Player to move
+            depth: Depth the answer must have been searched to at least
+            weights: Evaluation weights tuple the answer was searched with
+                (default: the weights in use)
+
+        Returns:
+            (value, column) from `player`'s point of view, or None
+        """
+        if not self.covers(board):
+            return None
+        kind = KIND_MINIMAX_P1 if player == 1 else KIND_MINIMAX_P2
+        entry = self.probe(table_key(board.key(), kind, table_salt(board, weights)))
+        if entry is None:
+            return None
+        value, searched, _, move = entry
+        if searched < depth or move is None or not board.is_valid_move(move):
+            return None
+        return value, move
+
+    def record_result(self, board, player, value, depth, move, weights=None):
+        """Record the result of a completed minimax search of `board` for `player` with `weights` (see result)."""
+        if self.covers(board):
+            kind = KIND_MINIMAX_P1 if player == 1 else KIND_MINIMAX_P2
+            self.store(table_key(board.key(), kind, table_salt(board, weights)), value, depth, EXACT, move)
+
+    def mcts_result(self, board, player, iterations):
+        """
+        Cached MCTS answer for `player` to move on `board`.
+
+        Args:
+            board: Current board state
+            player: Player to move
+            iterations: Visits the answer must have come from at least
+
+        Returns:
+            (column, score): Chosen move and the win rate for the player to
+            move, or None
+        """
+        if not self.covers(board):
+            return None
+        entry = self.probe(_mcts_key(board, player))
+        if entry is None:
+            return None
+        visits, percent, _, move = entry
+        if visits < iterations or move is None or not board.is_valid_move(move):
+            return None
+        return move, percent / 100
+
+    def record_mcts(self, board, player, visits, score, move):
+        """Record a completed MCTS search for `player` to move: root visits, the chosen move's win rate and the move."""
+        if not self.covers(board) or visits < MIN_VISITS or move is None:
+            return
+        key = _mcts_key(board, player)
+        current = self.probe(key)
+        if current is not None and current[0] >= visits:
+            return
+        self._record(key, pack_result(int(visits), round(score * 100), EXACT, move))
+
+    def absorb(self, table, min_depth=MIN_DEPTH):
+        """
+        Record the exact results of a TranspositionTable searched at least `min_depth` deep.
+
+        Returns:
+            count: Entries taken from the table
+        """
+        keys, data = table.snapshot(min_depth)
+        for key, word in zip(keys.tolist(), data.tolist()):
+            self._record(key, word)
+        return len(keys)
+
+    def save(self):
+        """
+        Merge the recorded entries into the cache file.
+
+        Returns:
+            count: Entries in the file
+        """
+        with self.lock:
+            self._load()
+            if not self.pending:
+                self.last_save = time.monotonic()
+                return len(self.keys)
+
+            # Merge with the file as it is now, which another process may have rewritten
+            self.keys = None
+            self._load()
+            pending = np.array(list(self.pending.items()), dtype=np.uint64).reshape(-1, 2)
+            keys = np.concatenate([pending[:, 0], self.keys])
+            data = np.concatenate([pending[:, 1], self.data])
+            # Unmap the file before it is replaced (Windows cannot replace a mapped file)
+            self.keys = None
+            self.data = None
+
+            # Best entry per key, then the most valuable entries overall
+            priority = _priority(keys, data)
+            order = np.lexsort((-priority, keys))
+            keys, data, priority = keys[order], data[order], priority[order]
+            first = np.ones(len(keys), dtype=bool)
+            first[1:] = keys[1:] != keys[:-1]
+            keys, data, priority = keys[first], data[first], priority[first]
+            if len(keys) > self.max_entries:
+                keep = np.sort(np.argsort(-priority, kind='stable')[:self.max_entries])
+                keys, data = keys[keep], data[keep]
+
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path + ".tmp", 'wb') as f:
+                f.write(_HEADER.pack(_MAGIC, CACHE_VERSION, *self.shape, len(keys)))
+                np.stack([keys, data], axis=1).tofile(f)
+            os.replace(self.path + ".tmp", self.path)
+
+            self.pending = {}
+            self.last_save = time.monotonic()
+            return len(keys)
+
+    def maybe_save(self):
+        """Save when there are new entries and SAVE_INTERVAL has passed since the last save."""
+        if self.pending and time.monotonic() - self.last_save >= SAVE_INTERVAL:
+            self.save()
+
+    def hit_rate(self):
+        """Share of probes that found an entry."""
+        return self.hits / self.probes if self.probes else 0.0
+
+
+def open_cache(spec, board=None):
+    """
+    Return the PositionCache for `spec`, or None when there is none.
+
+    Args:
+        spec: A PositionCache, a cache file path, or 'auto' for the
+            default file of `board`'s shape
+        board: Board the cache is for (gives the shape of a new cache)
+
+    Returns:
+        cache: PositionCache (one per path and process), or None when `spec` is None
+    """
+    if spec is None or isinstance(spec, PositionCache):
+        return spec
+    shape = (board.rows, board.cols, board.connect) if board is not None else (6, 7, 4)
+    if spec == "auto":
+        spec = cache_path(*shape)
+    cache = _opened.get(spec)
+    if cache is None:
+        cache = _opened[spec] = PositionCache(spec, *shape)
+    return cache
+
+
+def save_caches():
+    """Save every cache opened in this process."""
+    for cache in _opened.values():
+        cache.save()
@@ -0,0 +1,210 @@
+import collections
+import json
+import sys
+import threading
+
+
+class SearchStats:
+    """Counters collected by one search, filled in by minimax or MCTS."""
+
+    def __init__(self, engine=None):
+        """Initialize empty statistics for a search by `engine`."""
+        self.engine = engine
+        self.move = None
+        self.score = None
+        self.time = 0.0
+
+        # Minimax
+        self.nodes = 0
+        self.leaf_evals = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.threat_exits = 0  # nodes decided by the threat analysis without search
+        self.expanded = 0      # nodes whose moves were generated and searched
+        self.moves_generated = 0
+        self.reductions = 0    # late moves searched shallower
+        self.re_searches = 0   # reduced moves searched again at full depth
+        self.extensions = 0    # forced replies searched one ply deeper
+        self.depth = 0
+        self.depth_times = []  # seconds spent on each completed depth
+        self.pv = []           # principal variation of the last completed depth
+
+        # MCTS
+        self.iterations = 0
+        self.tree_size = 0
+        self.rollouts = 0
+        self.rollout_plies = 0
+
+        # {cache name: [hits, lookups]}
+        self.caches = {}
+
+        # {structure name: bytes} registered with the memory governor at the end of the search
+        self.memory = {}
+
+        # Top sampled stacks when the move ran under SamplingProfiler
+        self.profile = None
+
+    def record_cache(self, name, hit):
+        """Count one lookup in the named cache."""
+        counts = self.caches.setdefault(name, [0, 0])
+        counts[0] += 1 if hit else 0
+        counts[1] += 1
+
+    @property
+    def first_move_cutoff_rate(self):
+        """Share of cutoffs produced by the first move tried (move-ordering quality)."""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def branching_factor(self):
+        """Average number of moves generated per expanded minimax node."""
+        return self.moves_generated / self.expanded if self.expanded else 0.0
+
+    @property
+    def mean_rollout_length(self):
+        """Average number of plies per MCTS rollout."""
+        return self.rollout_plies / self.rollouts if self.rollouts else 0.0
+
+    @property
+    def nodes_per_sec(self):
+        """Minimax nodes or MCTS iterations per second."""
+        work = self.nodes if self.engine == "minimax" else self.iterations
+        return work / self.time if self.time else 0.0
+
+    def cache_hit_rates(self):
+        """Return {cache name: hit rate}."""
+        return {name: hits / lookups if lookups else 0.0
+                for name, (hits, lookups) in self.caches.items()}
+
+    def to_dict(self):
+        """Return the statistics as a JSON-serialisable dict."""
+        data = {
+            "engine": self.engine,
+            "move": self.move,
+            "score": self.score,
+            "time": round(self.time, 6),
+            "nodes_per_sec": round(self.nodes_per_sec, 1),
+            "cache_hit_rates": self.cache_hit_rates(),
+        }
+        if self.engine == "minimax":
+            data.update({
+                "nodes": self.nodes,
+                "leaf_evals": self.leaf_evals,
+                "cutoffs": self.cutoffs,
+                "threat_exits": self.threat_exits,
+                "branching_factor": round(self.branching_factor, 3),
+                "reductions": self.reductions,
+                "re_searches": self.re_searches,
+                "extensions": self.extensions,
+                "first_move_cutoff_rate": round(self.first_move_cutoff_rate, 4),
+                "depth": self.depth,
+                "depth_times": [round(t, 6) for t in self.depth_times],
+            })
+        else:
+            data.update({
+                "iterations": self.iterations,
+                "tree_size": self.tree_size,
+                "mean_rollout_length": round(self.mean_rollout_length, 2),
+            })
+        if self.memory:
+            data["memory"] = self.memory
+        if self.profile is not None:
+            data["profile"] = self.profile
+        return data
+
+    def summary_lines(self):
+        """Short human-readable lines for the debug overlay."""
+        lines = [f"{self.engine}  move {self.move}  {self.time * 1000:.0f} ms  {self.nodes_per_sec:,.0f}/s"]
+        if self.engine == "minimax":
+            lines.append(f"depth {self.depth}  nodes {self.nodes:,}  leaves {self.leaf_evals:,}")
+            lines.append(f"cutoffs {self.cutoffs:,}  first-move {self.first_move_cutoff_rate:.0%}")
+        else:
+            lines.append(f"iterations {self.iterations:,}  tree {self.tree_size:,}")
+            lines.append(f"rollout {self.mean_rollout_length:.1f} plies")
+        for name, rate in self.cache_hit_rates().items():
+            lines.append(f"{name} hits {rate:.0%}")
+        if self.memory:
+            lines.append(f"memory {sum(self.memory.values()) / (1 << 20):.1f} MB")
+        return lines
+
+
+class StatsLogger:
+    """Appends one JSON line of SearchStats per move to a file."""
+
+    def __init__(self, path):
+        """Open `path` for appending."""
+        self.file = open(path, 'a')
+
+    def log(self, stats, **extra):
+        """Write `stats` (plus any extra fields) as one JSON line."""
+        record = stats.to_dict()
+        record.update(extra)
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def close(self):
+        """Close the log file."""
+        self.file.close()
+
+
+class SamplingProfiler:
+    """
+    Minimal sampling profiler for the calling thread.
+
+    A background thread samples the profiled thread's stack every
+    `interval` seconds, so overhead stays low and does not depend on how
+    many calls the search makes. Use as a context manager around a search.
+    """
+
+    def __init__(self, interval=0.002, max_frames=8):
+        """
+        Initialize the profiler.
+
+        Args:
+            interval: Seconds between samples
+            max_frames: Innermost frames kept per sampled stack
+        """
+        self.interval = interval
+        self.max_frames = max_frames
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def __enter__(self):
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def _run(self):
+        """Sample the target thread until stopped."""
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None and len(stack) < self.max_frames:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[" <- ".join(stack)] += 1
+
+    def top(self, n=10):
+        """Return the `n` most sampled stacks as [(stack, share), ...]."""
+        total = sum(self.samples.values())
+        return [(stack, round(count / total, 4)) for stack, count in self.samples.most_common(n)]
+
+    def top_functions(self, n=10):
+        """Return the `n` functions most often on top of the stack as [(function, share), ...]."""
+        leaves = collections.Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.split(" <- ", 1)[0].split(" (", 1)[0]] += count
+        total = sum(leaves.values())
+        return [(name, round(count / total, 4)) for name, count in leaves.most_common(n)]
+
@@ -0,0 +1,380 @@
+import copy
+import json
+import os
+import time
+
+import numpy as np
+
+from src.models.board import get_geometry
+
+# Tablebases are built into TABLEBASE_DIR/<rows>x<cols>c<connect>
+TABLEBASE_DIR = 'data/tablebase'
+
+MANIFEST = 'manifest.json'
+TABLEBASE_VERSION = 1
+
+# Positions per worker task while building
+CHUNK_SIZE = 1 << 18
+
+# Tablebases opened in this process, by directory
+_opened = {}
+
+
+def tablebase_path(rows=6, cols=7, connect=4):
+    """Default directory of the tablebase for a board shape."""
+    return os.path.join(TABLEBASE_DIR, f"{rows}x{cols}c{connect}")
+
+
+def mirror_bits(bits, geometry):
+    """
+    Mirror a bitboard left to right.
+
+    Works on a Python int or on a uint64 array; every column's bits move
+    to the mirrored column unchanged. Board keys mirror the same way, since
+    mask + p1_bits never carries out of a column.
+    """
+    column = (1 << geometry.height) - 1
+    if isinstance(bits, np.ndarray):
+        column = np.uint64(column)
+        mirrored = np.zeros_like(bits)
+        for col in range(geometry.cols):
+            src, dst = np.uint64(col * geometry.height), np.uint64((geometry.cols - 1 - col) * geometry.height)
+            mirrored |= ((bits >> src) & column) << dst
+        return mirrored
+    mirrored = 0
+    for col in range(geometry.cols):
+        mirrored |= ((bits >> (col * geometry.height)) & column) << ((geometry.cols - 1 - col) * geometry.height)
+    return mirrored
+
+
+def canonical_key(board, swap=False):
+    """
+    Key shared by a position and its mirror image: the smaller of the two Board keys.
+
+    With `swap` the players' pieces are exchanged first, which gives the
+    key of a position reached with player 2 moving first.
+    """
+    key = board.mask + (board.mask ^ board.p1_bits) if swap else board.key()
+    return min(key, mirror_bits(key, board.geometry))
+
+
+def _has_lines(bits, geometry):
+    """Vectorized Geometry.has_line: which bitboards in a uint64 array hold a line."""
+    found = np.zeros(len(bits), dtype=bool)
+    for shift in geometry.shifts:
+        line = bits.copy()
+        for i in range(1, geometry.connect):
+            line &= bits >> np.uint64(i * shift)
+        found |= line != 0
+    return found
+
+
+def _moves(masks, p1s, ply, geometry):
+    """
+    Yield every move from an array of positions, one column at a time.
+
+    Args:
+        masks, p1s: uint64 arrays of the positions' mask and p1_bits
+        ply: Pieces on every position (player 1 moves on even plies)
+        geometry: Board Geometry
+
+    Returns:
+        moves: Iterator of (column, legal, won, full, child masks, child p1s),
+            `legal`, `won` (the mover completed a line) and `full` (the
+            board filled up) being boolean arrays over the positions
+    """
+    mover = 1 if ply % 2 == 0 else 2
+    full = ply + 1 == geometry.rows * geometry.cols
+    for col in range(geometry.cols):
+        bottom = np.uint64(1 << (col * geometry.height))
+        top = np.uint64(1 << (col * geometry.height + geometry.rows - 1))
+        legal = (masks & top) == 0
+        move = ((masks + bottom) & ~masks) & np.uint64(((1 << geometry.rows) - 1) << (col * geometry.height))
+        child_masks = masks | move
+        child_p1s = p1s | move if mover == 1 else p1s
+        mover_bits = child_p1s if mover == 1 else child_masks ^ child_p1s
+        won = _has_lines(mover_bits, geometry) & legal
+        yield col, legal, won, np.full(len(masks), full) & legal & ~won, child_masks, child_p1s
+
+
+def _canonical(masks, p1s, geometry):
+    """Return (keys, masks, p1s) with every position replaced by its canonical orientation."""
+    keys = masks + p1s
+    mirrored_masks = mirror_bits(masks, geometry)
+    mirrored_p1s = mirror_bits(p1s, geometry)
+    use = mirrored_masks + mirrored_p1s < keys
+    return (np.where(use, mirrored_masks + mirrored_p1s, keys), np.where(use, mirrored_masks, masks),
+            np.where(use, mirrored_p1s, p1s))
+
+
+def _unique(keys, masks, p1s):
+    """Sort positions by key and drop duplicates."""
+    keys, index = np.unique(keys, return_index=True)
+    return keys, masks[index], p1s[index]
+
+
+def _ply_file(work, ply, name):
+    """Path of one array of one ply in the build's work directory."""
+    return os.path.join(work, f"ply-{ply:03d}-{name}.npy")
+
+
+def _expand_task(task):
+    """Worker: the distinct ongoing positions one move after a chunk of one ply."""
+    work, ply, start, stop, shape = task
+    geometry = get_geometry(*shape)
+    masks = np.load(_ply_file(work, ply, "masks"), mmap_mode='r')[start:stop]
+    p1s = np.load(_ply_file(work, ply, "p1s"), mmap_mode='r')[start:stop]
+    children = ([], [], [])
+    for _, legal, won, full, child_masks, child_p1s in _moves(masks, p1s, ply, geometry):
+        ongoing = legal & ~won & ~full
+        for found, part in zip(children, _canonical(child_masks[ongoing], child_p1s[ongoing], geometry)):
+            found.append(part)
+    return _unique(*(np.concatenate(parts) for parts in children))
+
+
+def child_value(value):
+    """
+    Value of a move for its mover, given the value of the position it leads to.
+
+    Values are for the side to move: +n wins with the game ending n plies
+    later, -n loses n plies later, 0 draws.
+    """
+    return -(value + np.sign(value))
+
+
+def _preference(values):
+    """Order values for the side to move: faster wins first, then draws, then slower losses."""
+    values = values.astype(np.int16)
+    return np.where(values > 0, 256 - values, np.where(values < 0, -256 - values, 0))
+
+
+def _solve_task(task):
+    """Worker: the values of a chunk of one ply, from the solved ply after it."""
+    work, ply, start, stop, shape, last = task
+    geometry = get_geometry(*shape)
+    masks = np.load(_ply_file(work, ply, "masks"), mmap_mode='r')[start:stop]
+    p1s = np.load(_ply_file(work, ply, "p1s"), mmap_mode='r')[start:stop]
+    if not last:
+        next_keys = np.load(_ply_file(work, ply + 1, "keys"), mmap_mode='r')
+        next_values = np.load(_ply_file(work, ply + 1, "values"), mmap_mode='r')
+    best = np.zeros(len(masks), dtype=np.int8)
+    best_rank = np.full(len(masks), -1000, dtype=np.int16)
+    for _, legal, won, full, child_masks, child_p1s in _moves(masks, p1s, ply, geometry):
+        values = np.zeros(len(masks), dtype=np.int8)
+        values[won] = 1
+        ongoing = legal & ~won & ~full
+        if ongoing.any():
+            keys, _, _ = _canonical(child_masks[ongoing], child_p1s[ongoing], geometry)
+            values[ongoing] = child_value(next_values[np.searchsorted(next_keys, keys)])
+        rank = np.where(legal, _preference(values), -1000)
+        better = rank > best_rank
+        best[better] = values[better]
+        best_rank[better] = rank[better]
+    return best
+
+
+def _chunks(count):
+    """(start, stop) ranges covering `count` positions."""
+    return [(start, min(start + CHUNK_SIZE, count)) for start in range(0, count, CHUNK_SIZE)]
+
+
+def build_tablebase(rows, cols, connect=4, directory=None, workers=None, log=None):
+    """
+    Solve every reachable position of a board shape and write its tablebase.
+
+    Positions are enumerated ply by ply, mirror images folded together,
+    each ply's distinct ongoing positions kept sorted in a work file. The
+    plies are then solved backwards: a position's value comes from its
+    moves' immediate results and the solved values of the ply after it.
+    Both passes split every ply into chunks handled by a process pool that
+    reads the ply files through memory maps.
+
+    Args:
+        rows, cols, connect: Board shape; its bitboards must fit in 64 bits
+        directory: Output directory (default: tablebase_path of the shape)
+        workers: Worker processes (default: CPU count)
+        log: Optional function called with a progress line per ply
+
+    Returns:
+        manifest: The written manifest (position count, value of the empty
+            board, build time)
+    """
+    import concurrent.futures
+    import shutil
+
+    geometry = get_geometry(rows, cols, connect)
+    if geometry.wide:
+        raise ValueError(f"A {rows}x{cols} board needs {geometry.key_bits}-bit keys; tablebases hold 64")
+    directory = directory or tablebase_path(rows, cols, connect)
+    work = os.path.join(directory, "work")
+    os.makedirs(work, exist_ok=True)
+    shape = (rows, cols, connect)
+    start_time = time.perf_counter()
+    cells = rows * cols
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            counts = []
+            keys, masks, p1s = (np.zeros(1, dtype=np.uint64) for _ in range(3))
+            for ply in range(cells):
+                counts.append(len(keys))
+                np.save(_ply_file(work, ply, "keys"), keys)
+                np.save(_ply_file(work, ply, "masks"), masks)
+                np.save(_ply_file(work, ply, "p1s"), p1s)
+                if log is not None:
+                    log(f"ply {ply}: {len(keys):,} positions")
+                if ply + 1 == cells or not len(keys):
+                    break
+                tasks = [(work, ply, start, stop, shape) for start, stop in _chunks(len(keys))]
+                parts = list(executor.map(_expand_task, tasks))
+                keys, masks, p1s = _unique(*(np.concatenate(arrays) for arrays in zip(*parts)))
+
+            for ply in range(len(counts) - 1, -1, -1):
+                last = ply == len(counts) - 1
+                tasks = [(work, ply, start, stop, shape, last) for start, stop in _chunks(counts[ply])]
+                values = np.concatenate(list(executor.map(_solve_task, tasks))) if tasks else np.zeros(0, np.int8)
+                np.save(_ply_file(work, ply, "values"), values)
+
+        # Plies never share a key (the piece count differs), so one sort merges them
+        keys = np.concatenate([np.load(_ply_file(work, ply, "keys")) for ply in range(len(counts))])
+        values = np.concatenate([np.load(_ply_file(work, ply, "values")) for ply in range(len(counts))])
+        order = np.argsort(keys, kind='stable')
+        np.save(os.path.join(directory, "keys.npy"), keys[order])
+        np.save(os.path.join(directory, "values.npy"), values[order])
+        root_value = int(np.load(_ply_file(work, 0, "values"))[0])
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    manifest = {
+        "version": TABLEBASE_VERSION,
+        "rows": rows,
+        "cols": cols,
+        "connect": connect,
+        "positions": int(len(keys)),
+        "root_value": root_value,
+        "seconds": round(time.perf_counter() - start_time, 1),
+    }
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    _opened.pop(directory, None)
+    return manifest
+
+
+class Tablebase:
+    """
+    Perfect-play values of every ongoing position of one board shape.
+
+    Sorted canonical keys and int8 values are memory-mapped, so opening a
+    tablebase costs nothing and a probe reads a few pages. A value is for
+    the side to move: +n wins with the game ending n plies later, -n loses
+    n plies later, 0 draws.
+    """
+
+    def __init__(self, directory):
+        """Open the tablebase in `directory`."""
+        path = os.path.join(directory, MANIFEST)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No tablebase manifest in {directory}")
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+        if manifest["version"] != TABLEBASE_VERSION:
+            raise ValueError(f"Unsupported tablebase version {manifest['version']} in {directory}")
+        self.directory = directory
+        self.manifest = manifest
+        self.shape = (manifest["rows"], manifest["cols"], manifest["connect"])
+        self.keys = np.load(os.path.join(directory, "keys.npy"), mmap_mode='r')
+        self.values = np.load(os.path.join(directory, "values.npy"), mmap_mode='r')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def covers(self, board):
+        """True if `board` has this tablebase's shape."""
+        return (board.rows, board.cols, board.connect) == self.shape
+
+    def probe(self, board, player=None):
+        """
+        Value of an ongoing position for the side to move.
+
+        The tablebase holds positions with player 1 moving first. When
+        `player` is to move on a board where that would be the other
+        player's turn, player 2 moved first, and the position is looked up
+        with the colours swapped.
+
+        Args:
+            board: Board state
+            player: Player to move (default: as if player 1 moved first)
+
+        Returns:
+            value: Signed plies to the end (see the class docstring), or
+            None for another board shape or a finished game
+        """
+        if not self.covers(board):
+            return None
+        swap = player is not None and player != board.next_player()
+        key = np.uint64(canonical_key(board, swap))
+        index = int(np.searchsorted(self.keys, key))
+        if index < len(self.keys) and self.keys[index] == key:
+            return int(self.values[index])
+        return None
+
+    def move_values(self, board, player):
+        """
+        Value of every legal move for `player`, the side to move.
+
+        Returns:
+            values: {column: value for the mover}, or None when the position is not covered
+        """
+        if self.probe(board, player) is None:
+            return None
+        values = {}
+        for col in board.get_valid_moves():
+            child = copy.deepcopy(board)
+            child.drop_piece(col, player)
+            if child.is_winner(player):
+                values[col] = 1
+            elif child.is_full():
+                values[col] = 0
+            else:
+                value = self.probe(child, 3 - player)
+                if value is None:
+                    return None
+                values[col] = int(child_value(value))
+        return values
+
+    def best_move(self, board, player):
+        """
+        Perfect move for `player`: the fastest win, else a draw, else the slowest loss.
+
+        Returns:
+            (column, value): The move and its value for the mover, or None
+            when the position is not covered
+        """
+        values = self.move_values(board, player)
+        if not values:
+            return None
+        col = max(values, key=lambda c: int(_preference(np.asarray(values[c]))))
+        return col, values[col]
+
+
+def open_tablebase(spec, board=None):
+    """
+    Return an open Tablebase for `spec`, or None when there is none.
+
+    Args:
+        spec: A Tablebase, a tablebase directory, or 'auto' for the default
+            directory of `board`'s shape
+        board: Board the tablebase is for (needed for 'auto')
+
+    Returns:
+        tablebase: Tablebase (opened once per process and cached), or None
+        when `spec` is None or names no built tablebase
+    """
+    if spec is None or isinstance(spec, Tablebase):
+        return spec
+    if spec == "auto":
+        spec = tablebase_path(board.rows, board.cols, board.connect)
+    if spec not in _opened:
+        _opened[spec] = Tablebase(spec) if os.path.exists(os.path.join(spec, MANIFEST)) else None
+    return _opened[spec]
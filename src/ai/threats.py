@@ -0,0 +1,151 @@
+def winning_cells(bits, geometry):
+    """
+    Cells that would complete a line of `connect` for the owner of `bits`.
+
+    For every direction, `forward[k]` marks the cells followed by k of the
+    owner's pieces and `backward[k]` the cells preceded by k; a cell is
+    winning when, for some j, it has j pieces on one side and connect-1-j
+    on the other. Occupied cells are not removed.
+
+    Args:
+        bits: Bitboard of one player's pieces (Board layout)
+        geometry: The board's Geometry
+
+    Returns:
+        cells: Bitboard of winning cells
+    """
+    n = geometry.connect
+    if n == 4:
+        return _winning_cells_4(bits, geometry.height) & geometry.full
+
+    # Vertical lines can only be completed on top
+    cells = -1
+    for k in range(1, n):
+        cells &= bits << k
+    for shift in geometry.shifts:
+        if shift == 1:
+            continue
+        forward = [-1]
+        backward = [-1]
+        for k in range(1, n):
+            forward.append(forward[-1] & (bits >> (k * shift)))
+            backward.append(backward[-1] & (bits << (k * shift)))
+        for j in range(n):
+            cells |= backward[j] & forward[n - 1 - j]
+    return cells & geometry.full
+
+
+def _winning_cells_4(bits, height):
+    """winning_cells unrolled for lines of four."""
+    # Vertical: three pieces below
+    cells = (bits << 1) & (bits << 2) & (bits << 3)
+    for shift in (height, height + 1, height - 1):
+        # Two pieces before, then one more before or one after
+        pair = (bits << shift) & (bits << 2 * shift)
+        cells |= pair & ((bits << 3 * shift) | (bits >> shift))
+        # Two pieces after, then one more after or one before
+        pair = (bits >> shift) & (bits >> 2 * shift)
+        cells |= pair & ((bits >> 3 * shift) | (bits << shift))
+    return cells
+
+
+def column_of(bits, geometry):
+    """Column of the lowest set bit of a non-empty bitboard."""
+    return ((bits & -bits).bit_length() - 1) // geometry.height
+
+
+def columns(bits, geometry):
+    """Columns holding a set bit, left to right."""
+    mask = (1 << geometry.height) - 1
+    return [col for col in range(geometry.cols) if bits >> (col * geometry.height) & mask]
+
+
+def popcount(bits):
+    """Number of set bits."""
+    return bin(bits).count("1")
+
+
+class ThreatMap:
+    """
+    Both players' threats on one board, as bitboards in the Board layout.
+
+    A threat is an empty cell that would complete a line for its owner.
+    Threats are classified by:
+
+    - playability: immediate threats can be played on the next move;
+    - parity: on a board with an even number of rows, once the other
+      columns fill up the first player ends up with the odd rows (counted
+      from the bottom) and the second player with the even rows, so a
+      player's good threats are the ones on their own parity (zugzwang);
+    - blocking: a threat directly above an opponent threat is useless,
+      since the opponent gets the cell below first.
+    """
+
+    def __init__(self, board):
+        """Analyse `board`."""
+        geometry = board.geometry
+        self.geometry = geometry
+        empty = geometry.full & ~board.mask
+        self.playable = (board.mask + geometry.bottom) & geometry.full
+        self.threats = {
+            1: winning_cells(board.p1_bits, geometry) & empty,
+            2: winning_cells(board.mask ^ board.p1_bits, geometry) & empty,
+        }
+
+    def immediate(self, player):
+        """Threats the player could complete on their next move."""
+        return self.threats[player] & self.playable
+
+    def winning_column(self, player):
+        """A column that wins for the player right now, or None."""
+        cells = self.immediate(player)
+        return column_of(cells, self.geometry) if cells else None
+
+    def non_losing(self, player):
+        """
+        Cells the player to move can play without losing on the opponent's reply.
+
+        A single playable opponent threat must be blocked; with two or more
+        every move loses. Playing directly below an opponent threat hands
+        them that cell. The player's own immediate wins are not considered,
+        so check winning_column first.
+
+        Returns:
+            cells: Bitboard of at most one playable cell per column; 0 when
+            every move loses
+        """
+        playable = self.playable
+        opponent = self.threats[3 - player]
+        forced = playable & opponent
+        if forced:
+            if forced & (forced - 1):
+                return 0
+            playable = forced
+        return playable & ~(opponent >> 1)
+
+    def blocked(self, player):
+        """The player's threats sitting directly above an opponent threat."""
+        return self.threats[player] & (self.threats[3 - player] << 1)
+
+    def good(self, player):
+        """Unblocked threats on the player's own row parity (all unblocked threats on odd-height boards)."""
+        threats = self.threats[player] & ~self.blocked(player)
+        if self.geometry.rows % 2:
+            return threats
+        parity = self.geometry.odd_rows if player == 1 else self.geometry.full & ~self.geometry.odd_rows
+        return threats & parity
+
+    def features(self, player):
+        """
+        Threat counts for the evaluation.
+
+        Returns:
+            (good, other, opp_good, opp_other): The player's good and other
+            unblocked threats, then the opponent's
+        """
+        counts = []
+        for side in (player, 3 - player):
+            good = self.good(side)
+            other = self.threats[side] & ~self.blocked(side) & ~good
+            counts += [popcount(good), popcount(other)]
+        return tuple(counts)
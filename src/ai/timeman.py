@@ -0,0 +1,189 @@
+import threading
+import time
+
+# Largest share of the remaining bank one move may use
+MAX_SHARE = 0.3
+
+# How far past its allocation a move may run while its best move is unstable
+INSTABILITY_FACTOR = 2.0
+
+# Assumed growth in time from one minimax depth to the next, until two
+# completed depths give a measured one
+DEPTH_GROWTH = 3.0
+
+# Score of a proven result in minimax
+WIN_SCORE = 1000000
+
+
+class MoveClock:
+    """
+    Time limits of one move, handed out by TimeManager.start.
+
+    Quacks like threading.Event, so it can be passed as either engine's
+    stop_event: it fires at the hard limit. The engines' callbacks
+    (minimax_callback, mcts_callback) stop the search earlier, at the soft
+    limit or as soon as the best move can no longer change.
+    """
+
+    def __init__(self, soft, hard, parent=None):
+        """
+        Initialize the clock.
+
+        Args:
+            soft: Seconds the move is planned to take
+            hard: Seconds the move may never exceed
+            parent: Optional threading.Event or SearchLimit that also stops the search
+        """
+        self.soft = soft
+        self.hard = hard
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.stopped = threading.Event()
+        self.reason = None
+        self._last_col = None
+        self._depth_times = []
+
+    def elapsed(self):
+        """Seconds since the move started."""
+        return time.perf_counter() - self.start
+
+    def set(self):
+        """Stop the search as soon as possible."""
+        self.stopped.set()
+
+    def is_set(self):
+        """True when the search must stop."""
+        if self.stopped.is_set():
+            return True
+        if self.parent is not None and self.parent.is_set():
+            return True
+        if self.elapsed() >= self.hard:
+            self.reason = self.reason or "hard limit"
+            return True
+        return False
+
+    def _stop(self, reason):
+        """Record why the search ends early; returns True for the engine's callback."""
+        self.reason = reason
+        return True
+
+    def minimax_callback(self, depth, score, col):
+        """
+        iterative_deepening_minimax callback after each completed depth.
+
+        Stops when the score is a proven win or loss, or when the next
+        depth would not finish within the soft limit. The soft limit
+        stretches by INSTABILITY_FACTOR (up to the hard limit) when the
+        best move just changed.
+
+        Returns:
+            stop: True to end the search
+        """
+        elapsed = self.elapsed()
+        self._depth_times.append(elapsed - sum(self._depth_times))
+        if abs(score) >= WIN_SCORE:
+            return self._stop("proven result")
+        if self._last_col is not None and col != self._last_col:
+            self.soft = min(self.hard, self.soft * INSTABILITY_FACTOR)
+        self._last_col = col
+
+        growth = DEPTH_GROWTH
+        if len(self._depth_times) >= 2 and self._depth_times[-2] > 0:
+            growth = max(1.0, self._depth_times[-1] / self._depth_times[-2])
+        if elapsed + self._depth_times[-1] * growth > self.soft:
+            return self._stop("soft limit")
+        return False
+
+    def mcts_callback(self, root, remaining):
+        """
+        mcts_search callback, called every few iterations.
+
+        Stops once the most visited root move leads the runner-up by more
+        visits than the search could still add before the hard limit (or
+        its iteration cap). Past the soft limit it stops unless the lead is
+        under a tenth of the root's visits.
+
+        Args:
+            root: Root MCTSNode of the search
+            remaining: Iterations left before the engine's iteration cap
+
+        Returns:
+            stop: True to end the search
+        """
+        visits = sorted((child.visits for child in root.children.values()), reverse=True)
+        if len(visits) < 2 or root.untried_moves:
+            return False
+        gap = visits[0] - visits[1]
+        elapsed = self.elapsed()
+        rate = root.visits / elapsed if elapsed > 0 else 0.0
+        if gap > min(remaining, rate * (self.hard - elapsed)):
+            return self._stop("best move settled")
+        if elapsed >= self.soft and gap >= 0.1 * root.visits:
+            return self._stop("soft limit")
+        return False
+
+
+class TimeManager:
+    """
+    A player's thinking time for a whole game.
+
+    The bank is spread over the moves the player probably has left,
+    weighted by game phase: opening moves get less than their share and
+    middlegame moves more. Each move may stretch to INSTABILITY_FACTOR times
+    its share while its best move keeps changing, and never uses more than
+    MAX_SHARE of the bank. Time a move does not use stays in the bank.
+    """
+
+    def __init__(self, bank, increment=0.0, min_move=0.02):
+        """
+        Initialize the time manager.
+
+        Args:
+            bank: Seconds for the player's remaining moves
+            increment: Seconds added to the bank after every move
+            min_move: Least time any move is given
+        """
+        self.bank = bank
+        self.increment = increment
+        self.min_move = min_move
+        self.moves = 0
+
+    @classmethod
+    def for_target(cls, target, board):
+        """Manager whose average move takes `target` seconds over a full game on `board`."""
+        return cls(target * (board.rows * board.cols) / 2)
+
+    def moves_left(self, board):
+        """Own moves still expected: half the empty cells are ours, and most games end with half the board empty."""
+        empty = int((board.board == 0).sum())
+        return max(2.0, empty / 4)
+
+    def phase_weight(self, board):
+        """Share of a move's even allocation by game phase (opening, middlegame, endgame)."""
+        filled = float((board.board != 0).mean())
+        if filled < 0.15:
+            return 0.6
+        if filled < 0.6:
+            return 1.3
+        return 1.0
+
+    def start(self, board, parent=None):
+        """
+        Allocate time for the move about to be searched on `board`.
+
+        Args:
+            board: Current board state
+            parent: Optional threading.Event that also stops the search
+
+        Returns:
+            clock: MoveClock for the move
+        """
+        soft = self.bank / self.moves_left(board) * self.phase_weight(board)
+        hard = max(self.min_move, min(soft * INSTABILITY_FACTOR, self.bank * MAX_SHARE))
+        soft = max(self.min_move, min(soft, hard))
+        return MoveClock(soft, hard, parent)
+
+    def finish(self, seconds):
+        """Charge a finished move's thinking time to the bank."""
+        self.bank = max(0.0, self.bank - seconds) + self.increment
+        self.moves += 1
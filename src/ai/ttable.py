@@ -0,0 +1,350 @@
+import struct
+
+import numpy as np
+
+from src.ai.memory import governor, PRIORITY_TABLE, SHRINK_TO
+
+# Entry flags for minimax results
+EXACT = 0
+LOWER = 1   # value is a lower bound (search failed high)
+UPPER = 2   # value is an upper bound (search failed low)
+
+# Key kinds: the same position is stored separately per use, because
+# evaluate_position is not symmetric between the two players
+KIND_MINIMAX_P1 = 0
+KIND_MINIMAX_P2 = 1
+KIND_MCTS = 2
+
+_HEADER = struct.Struct("<8sQ")  # magic, number of entries
+_MAGIC = b"C4TTv1\0\0"
+_ENTRY_BYTES = 16               # two uint64 words per entry
+_NO_MOVE = 15
+_VALUE_OFFSET = 1 << 31
+
+# Widest board whose moves fit the 4-bit move field next to _NO_MOVE
+MAX_COLS = 14
+
+# Tables created or attached in this process, by name
+_attached = {}
+
+
+def key_salt(*parts):
+    """
+    Mix integers (a board shape, evaluation weights) into a 62-bit key salt.
+
+    Searches whose results differ for the same position, such as engines
+    with different weights, salt their keys differently so they never read
+    each other's entries from a shared table.
+    """
+    salt = 0
+    for part in parts:
+        salt = ((salt ^ (part & 0xFFFFFFFFFFFFFFFF)) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    return salt >> 2
+
+
+def _entries_within_budget(size_mb, shrink=False):
+    """
+    Number of entries of a `size_mb` table.
+
+    The governor cannot shrink a table, so one that fills what it shrinks
+    down to would have it empty every other structure on each check. Such
+    a table raises ValueError, or with `shrink` is cut to half of what the
+    governor shrinks down to (a private table is a scratch table for one
+    search, whose caller did not choose its size).
+    """
+    size = max(1, int(size_mb * (1 << 20)) // _ENTRY_BYTES)
+    limit = governor().budget * SHRINK_TO
+    if size * _ENTRY_BYTES >= limit:
+        if shrink:
+            return max(1, int(limit / 2) // _ENTRY_BYTES)
+        raise ValueError(f"a {size_mb:g} MB table does not fit the memory budget of "
+                         f"{governor().budget / (1 << 20):g} MB")
+    return size
+
+
+def table_key(board_key, kind, salt=0):
+    """Fold a Board.key(), key kind and optional key_salt into the 64-bit key stored in the table."""
+    key = ((board_key ^ salt) << 2) | kind
+    if key >> 64:
+        # Wider than 64 bits: fold the high words in (the full key is only
+        # needed to tell entries apart, so a good 64-bit mix is enough)
+        folded = 0
+        while key:
+            folded ^= key & 0xFFFFFFFFFFFFFFFF
+            key >>= 64
+            folded = (folded * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        key = folded
+    return key
+
+
+def check_board(board):
+    """Raise ValueError for a board too wide for the tables' move field (more than MAX_COLS columns)."""
+    if board.cols > MAX_COLS:
+        raise ValueError(f"tables hold moves of boards up to {MAX_COLS} columns wide, not {board.cols}")
+
+
+def pack_result(value, depth, flag, move):
+    """Pack a minimax result into a 64-bit data word (value, depth, flag, move)."""
+    if move is not None and not 0 <= move < _NO_MOVE:
+        raise ValueError(f"move {move} does not fit the table's move field")
+    value = int(max(-_VALUE_OFFSET, min(_VALUE_OFFSET - 1, value)))
+    return ((value + _VALUE_OFFSET)
+            | (min(depth, 0xFF) << 32)
+            | (flag << 40)
+            | ((_NO_MOVE if move is None else move) << 42)
+            | (1 << 63))  # never zero, so empty slots stay recognisable
+
+
+def unpack_result(data):
+    """Unpack a minimax data word into (value, depth, flag, move); move is None when unknown."""
+    value = (data & 0xFFFFFFFF) - _VALUE_OFFSET
+    depth = (data >> 32) & 0xFF
+    flag = (data >> 40) & 0x3
+    move = (data >> 42) & 0xF
+    return value, depth, flag, None if move == _NO_MOVE else move
+
+
+def pack_stats(visits, wins):
+    """Pack MCTS statistics into a 64-bit data word."""
+    visits = min(int(visits), 0x7FFFFFFF)
+    return (visits << 32) | min(int(wins * 2), 0xFFFFFFFF) | (1 << 63)
+
+
+def unpack_stats(data):
+    """Unpack an MCTS data word into (visits, wins)."""
+    return (data >> 32) & 0x7FFFFFFF, (data & 0xFFFFFFFF) / 2
+
+
+def resolve(table):
+    """Return `table` itself, or the table attached by name when given a string."""
+    if isinstance(table, str):
+        return TranspositionTable.attach(table)
+    return table
+
+
+class TranspositionTable:
+    """
+    Transposition and evaluation table in shared memory.
+
+    Entries are two 64-bit words: `data` and `key ^ data`. Writers store
+    the data word first, readers accept an entry only if the two words XOR
+    back to the probed key, so a write torn by another process is simply
+    a miss. No locks are taken. Any process can attach to the table by its
+    shared-memory name. A private() table lives in ordinary process memory
+    instead, for a search no other process shares.
+
+    Minimax entries pack (value, depth, flag, move); MCTS entries pack
+    (visits, 2 * wins).
+    """
+
+    def __init__(self, shm, owner, buffer=None):
+        """Wrap an existing SharedMemory block (or a private buffer, with shm None); use create(), attach() or private()."""
+        self.shm = shm
+        self.owner = owner
+        buffer = shm.buf if shm is not None else buffer
+        magic, self.size = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"shared memory '{shm.name}' is not a transposition table")
+        self.entries = np.ndarray((self.size, 2), dtype=np.uint64, buffer=buffer, offset=_HEADER.size)
+        self.probes = 0
+        self.hits = 0
+
+    @classmethod
+    def create(cls, size_mb=16, name=None):
+        """
+        Create a new, empty table.
+
+        Args:
+            size_mb: Table size in megabytes
+            name: Shared-memory name (default: generated)
+
+        Returns:
+            table: The new TranspositionTable; the creating process unlinks
+            it in close()
+
+        Raises:
+            ValueError: if the table would take SHRINK_TO of the process's
+            memory budget or more
+        """
+        from multiprocessing import shared_memory
+
+        size = _entries_within_budget(size_mb)
+        shm = shared_memory.SharedMemory(name=name, create=True, size=_HEADER.size + size * _ENTRY_BYTES)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, size)
+        table = cls(shm, owner=True)
+        table.clear()
+        _attached[shm.name] = table
+        governor().register(f"tt:{shm.name}", table, PRIORITY_TABLE)
+        return table
+
+    @classmethod
+    def private(cls, size_mb=4):
+        """
+        Create a new, empty table in this process's own memory.
+
+        It needs no shared-memory block, so it is cheap to create and is
+        freed with the last reference to it; close() is optional.
+
+        Args:
+            size_mb: Table size in megabytes; smaller when that does not fit
+                the process's memory budget
+
+        Returns:
+            table: The new TranspositionTable (its name is None)
+        """
+        size = _entries_within_budget(size_mb, shrink=True)
+        buffer = bytearray(_HEADER.size + size * _ENTRY_BYTES)
+        _HEADER.pack_into(buffer, 0, _MAGIC, size)
+        table = cls(None, owner=True, buffer=buffer)
+        governor().register(f"tt:private:{id(table)}", table, PRIORITY_TABLE)
+        return table
+
+    @classmethod
+    def attach(cls, name):
+        """
+        Attach to a table created by another process (or by this one).
+
+        Returns:
+            table: The table, cached per process so repeated attaches are free
+        """
+        table = _attached.get(name)
+        if table is None:
+            import multiprocessing
+            from multiprocessing import shared_memory, resource_tracker
+
+            shm = shared_memory.SharedMemory(name=name)
+            # Only the creator may unlink the block. Pool workers share the
+            # creator's resource tracker; any other process has its own,
+            # which must not remove the block when that process exits
+            if multiprocessing.parent_process() is None:
+                resource_tracker.unregister(shm._name, "shared_memory")
+            table = cls(shm, owner=False)
+            _attached[name] = table
+            governor().register(f"tt:{name}", table, PRIORITY_TABLE)
+        return table
+
+    @property
+    def name(self):
+        """Shared-memory name other processes attach with (None for a private table)."""
+        return self.shm.name if self.shm is not None else None
+
+    @property
+    def size_bytes(self):
+        """Bytes of shared memory used by the entries."""
+        return self.size * _ENTRY_BYTES
+
+    def memory_usage(self):
+        """Bytes counted against the memory governor's budget: the whole table."""
+        return self.size_bytes
+
+    def shrink(self, target):
+        """Tables keep the size they were created with; nothing is freed."""
+        return 0
+
+    def clear(self):
+        """Remove every entry."""
+        self.entries.fill(0)
+
+    def close(self):
+        """Detach; the creating process also unlinks the shared memory."""
+        del self.entries
+        if self.shm is None:
+            governor().unregister(f"tt:private:{id(self)}")
+            return
+        _attached.pop(self.shm.name, None)
+        governor().unregister(f"tt:{self.shm.name}")
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def _read(self, key):
+        """Return the data word stored for `key`, or None."""
+        self.probes += 1
+        index = key % self.size
+        check = int(self.entries[index, 0])
+        data = int(self.entries[index, 1])
+        if data == 0 or check ^ data != key:
+            return None
+        self.hits += 1
+        return data
+
+    def _write(self, key, data):
+        """Store a data word for `key` (data first, then the check word)."""
+        index = key % self.size
+        self.entries[index, 1] = data
+        self.entries[index, 0] = key ^ data
+
+    def probe(self, key):
+        """
+        Look up a minimax entry.
+
+        Returns:
+            (value, depth, flag, move) or None; move is None when unknown
+        """
+        data = self._read(key)
+        if data is None:
+            return None
+        return unpack_result(data)
+
+    def store(self, key, value, depth, flag, move):
+        """
+        Store a minimax result, keeping deeper results for the same position.
+
+        Args:
+            key: 64-bit key from table_key
+            value: Score from the searching player's point of view
+            depth: Remaining depth the score was searched to
+            flag: EXACT, LOWER or UPPER
+            move: Best column, or None
+        """
+        index = key % self.size
+        check = int(self.entries[index, 0])
+        old = int(self.entries[index, 1])
+        if old and check ^ old == key and ((old >> 32) & 0xFF) > depth:
+            return
+        self._write(key, pack_result(value, depth, flag, move))
+
+    def probe_stats(self, key):
+        """
+        Look up MCTS statistics.
+
+        Returns:
+            (visits, wins) or None
+        """
+        data = self._read(key)
+        if data is None:
+            return None
+        return unpack_stats(data)
+
+    def store_stats(self, key, visits, wins):
+        """Store MCTS statistics, keeping whichever record has more visits."""
+        current = self.probe_stats(key)
+        self.probes -= 1
+        if current is not None:
+            self.hits -= 1
+            if current[0] >= visits:
+                return
+        self._write(key, pack_stats(visits, wins))
+
+    def snapshot(self, min_depth):
+        """
+        Copy out the exact minimax results searched at least `min_depth` deep.
+
+        The key kind tells minimax entries from MCTS ones; folded keys of
+        boards wider than 64 bits lose it, so their MCTS entries may slip
+        through.
+
+        Returns:
+            (keys, data): uint64 arrays of the entries
+        """
+        entries = np.array(self.entries)
+        data = entries[:, 1]
+        keys = entries[:, 0] ^ data
+        depth = (data >> np.uint64(32)) & np.uint64(0xFF)
+        flag = (data >> np.uint64(40)) & np.uint64(0x3)
+        keep = (data != 0) & ((keys & np.uint64(3)) != KIND_MCTS) & (flag == EXACT) & (depth >= min_depth)
+        return keys[keep], data[keep]
+
+    def hit_rate(self):
+        """Share of probes from this process that found an entry."""
+        return self.hits / self.probes if self.probes else 0.0
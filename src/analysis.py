@@ -0,0 +1,326 @@
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import sys
+import threading
+import time
+
+from src.models.board import Board
+from src.ai.minimax import multipv_minimax, SearchAborted
+from src.ai.mcts import mcts_multipv
+from src.ai.engines import parse_engine_spec, SearchLimit
+from src.ai.evaluation import weights_for
+from src.ai.ttable import TranspositionTable
+from src.ai.stats import SearchStats
+from src.dataset import DatasetWriter, SCORE_KINDS
+
+# Positions queued or running per worker; bounds memory on huge inputs
+TASKS_PER_WORKER = 4
+
+# Score of a proven win in minimax
+WIN_SCORE = 1000000
+
+# Score lost against the best move (evaluation units) that flags a move in
+# a game review; a move that throws away a proven win or walks into a
+# proven loss is a blunder
+INACCURACY_MARGIN = 4
+MISTAKE_MARGIN = 10
+
+# Private table reused by the minimax analyses of this process, created on first use
+_table = None
+
+
+def _private_table():
+    """Return this process's private analysis table."""
+    global _table
+    if _table is None:
+        _table = TranspositionTable.private(4)
+    return _table
+
+
+def _replay(moves, rows=6, cols=7, connect=4):
+    """Board after a list of 0-based columns, player 1 first (Board.from_moves reads single digits only)."""
+    board = Board(rows, cols, connect)
+    for ply, col in enumerate(moves):
+        if not board.drop_piece(col, 1 + ply % 2):
+            raise ValueError(f"Illegal move {col + 1} at ply {ply + 1}")
+    return board
+
+
+def analyse_position(moves, config, rows=6, cols=7, connect=4):
+    """
+    Score every legal move of one position.
+
+    Minimax runs a multi-PV search, so every column gets an exact score
+    rather than a cut-off bound; a max_time or nodes budget ends it after
+    the last depth completed within it. MCTS reports each root child's win
+    rate for the player to move.
+
+    Args:
+        moves: Position as a 1-based move string, or as a list of 0-based
+            columns (boards of 10 columns or more need the list)
+        config: Engine configuration; minimax uses the table named by
+            config['tt'], else a private table kept for the process
+        rows, cols, connect: Board shape
+
+    Returns:
+        result: Dict with the best move and per-column scores (1-based
+        columns), depth, nodes and time, or with an 'error'
+    """
+    try:
+        if isinstance(moves, str):
+            board = Board.from_moves(moves, rows, cols, connect)
+        else:
+            board = _replay(moves, rows, cols, connect)
+    except ValueError as e:
+        return {"moves": moves, "error": str(e)}
+    player = board.next_player()
+    valid_moves = board.get_valid_moves()
+    if not valid_moves or (moves and board.is_winner(3 - player)):
+        return {"moves": moves, "error": "game is already over"}
+
+    stats = SearchStats(config["engine"])
+    start = time.perf_counter()
+    if config["engine"] == "minimax":
+        limit = SearchLimit(config.get("max_time"), config.get("nodes"), stats)
+        try:
+            lines = multipv_minimax(board, config.get("depth", board.rows * board.cols), stop_event=limit,
+                                    player=player, stats=stats, tt=config.get("tt") or _private_table(),
+                                    weights=weights_for(config.get("weights")))
+        except SearchAborted:
+            return {"moves": moves, "error": "budget ran out before the first depth"}
+        scores = {col: score for col, score, _ in sorted(lines)}
+        depth = stats.depth
+        nodes = stats.nodes
+    else:
+        lines = mcts_multipv(board, config["iterations"], config.get("max_time"), player=player, stats=stats,
+                             tt=config.get("tt"))
+        scores = {col: round(win_rate, 4) for col, _, win_rate in sorted(lines)}
+        depth = None
+        nodes = stats.iterations
+    elapsed = time.perf_counter() - start
+
+    best = max(scores, key=scores.get) if scores else None
+    return {
+        "moves": moves,
+        "best": best + 1 if best is not None else None,
+        "scores": {str(col + 1): score for col, score in scores.items()},
+        "depth": depth,
+        "nodes": nodes,
+        "time": round(elapsed, 4),
+    }
+
+
+def _analyse_task(task):
+    """Worker entry point: analyse one numbered position."""
+    index, moves, config = task
+    result = analyse_position(moves, config)
+    result["index"] = index
+    return result
+
+
+def read_positions(lines):
+    """
+    Yield (index, move string) for every position line.
+
+    Blank lines and lines starting with '#' are skipped; `index` is the
+    0-based line number, so results can be matched to the input.
+    """
+    for index, line in enumerate(lines):
+        moves = line.strip()
+        if moves and not moves.startswith("#"):
+            yield index, moves
+
+
+def run_analysis(positions, config, out, workers=None, export_dir=None):
+    """
+    Analyse positions in a process pool, writing results as they finish.
+
+    At most TASKS_PER_WORKER positions per worker are read ahead, so memory
+    stays flat however long the input is.
+
+    Args:
+        positions: Iterable of (index, move string)
+        config: Engine configuration
+        out: Text stream receiving one JSON line per position, in completion order
+        workers: Worker processes (default: CPU count)
+        export_dir: Optional training-data directory every analysed
+            position is exported to, with its best move and score (see src.dataset)
+
+    Returns:
+        count: Number of positions analysed
+    """
+    count = 0
+    exporter = DatasetWriter(export_dir, source="analysis") if export_dir else None
+    try:
+        with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+            limit = executor._max_workers * TASKS_PER_WORKER
+            pending = set()
+            for index, moves in positions:
+                if len(pending) >= limit:
+                    done, pending = concurrent.futures.wait(pending,
+                                                            return_when=concurrent.futures.FIRST_COMPLETED)
+                    count += _write_results(done, out, config, exporter)
+                pending.add(executor.submit(_analyse_task, (index, moves, config)))
+            done, _ = concurrent.futures.wait(pending)
+            count += _write_results(done, out, config, exporter)
+    finally:
+        if exporter is not None:
+            exporter.close()
+    return count
+
+
+def _write_results(futures, out, config, exporter=None):
+    """Write the results of finished futures (and export them); return how many were written."""
+    for future in futures:
+        result = future.result()
+        out.write(json.dumps(result) + "\n")
+        if exporter is not None and result.get("best") is not None:
+            board = Board.from_moves(result["moves"])
+            exporter.add(board, board.next_player(), result["scores"][str(result["best"])],
+                         SCORE_KINDS[config["engine"]], result["best"] - 1)
+    out.flush()
+    return len(futures)
+
+
+def classify_move(best_score, played_score):
+    """
+    Flag a played move by how much worse it scored than the best move.
+
+    Args:
+        best_score, played_score: Minimax scores from the mover's point of view
+
+    Returns:
+        flag: 'blunder', 'mistake', 'inaccuracy' or None
+    """
+    if best_score >= WIN_SCORE > played_score or best_score > -WIN_SCORE >= played_score:
+        return "blunder"
+    loss = best_score - played_score
+    if loss >= MISTAKE_MARGIN:
+        return "mistake"
+    if loss >= INACCURACY_MARGIN:
+        return "inaccuracy"
+    return None
+
+
+def _review_task(task):
+    """Worker entry point: analyse the position before one move of a reviewed game."""
+    ply, moves, played, depth, shape = task
+    result = analyse_position(moves, {"engine": "minimax", "depth": depth}, *shape)
+    if "error" in result:
+        return ply, None
+    scores = {int(col) - 1: score for col, score in result["scores"].items()}
+    best = result["best"] - 1
+    return ply, {
+        "best": best,
+        "score": scores[best],
+        "played": played,
+        "played_score": scores.get(played),
+        "flag": classify_move(scores[best], scores[played]) if played in scores else None,
+    }
+
+
+class GameReview:
+    """
+    Background analysis of every ply of a finished game.
+
+    Every position before a move is sent to a process pool as soon as the
+    review starts; finished analyses land in a per-ply cache, so a viewer
+    stepping through the game only ever reads the cache and never waits on
+    a search.
+    """
+
+    def __init__(self, depth, workers=None):
+        """
+        Initialize the review.
+
+        Args:
+            depth: Multi-PV minimax depth of every position
+            workers: Worker processes (default: CPU count)
+        """
+        self.depth = depth
+        self.workers = workers
+        self.moves = []
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def start(self, moves, rows=6, cols=7, connect=4):
+        """
+        Analyse the position before each of `moves`, replacing any running review.
+
+        Args:
+            moves: 0-based columns of the game, first player first
+            rows, cols, connect: Board shape
+        """
+        self.stop()
+        self.moves = list(moves)
+        # Spawned workers start clean, without the game's window and threads
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn"))
+        for ply, played in enumerate(self.moves):
+            task = (ply, self.moves[:ply], played, self.depth, (rows, cols, connect))
+            self._executor.submit(_review_task, task).add_done_callback(self._store)
+
+    def _store(self, future):
+        """Done callback: keep a finished analysis."""
+        if future.cancelled() or future.exception() is not None:
+            return
+        ply, entry = future.result()
+        if entry is not None:
+            with self._lock:
+                self._cache[ply] = entry
+
+    def stop(self):
+        """Cancel outstanding analyses and forget the cache."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        with self._lock:
+            self._cache = {}
+        self.moves = []
+
+    def entry(self, ply):
+        """
+        Analysis of the position before move `ply`, without blocking.
+
+        Returns:
+            entry: Dict with the best move and its score, the played move
+            and its score (mover's point of view) and its flag, or None
+            while it is still being analysed
+        """
+        with self._lock:
+            return self._cache.get(ply)
+
+    def progress(self):
+        """Return (analysed plies, total plies)."""
+        with self._lock:
+            return len(self._cache), len(self.moves)
+
+
+def main(argv=None):
+    """Command-line entry point for batch analysis."""
+    parser = argparse.ArgumentParser(description="Analyse positions (1-based move strings, one per line) "
+                                                 "and stream JSON-lines results.")
+    parser.add_argument("input", nargs="?", default="-", help="positions file ('-' for stdin, the default)")
+    parser.add_argument("--engine", default="minimax:medium",
+                        help="engine spec, e.g. minimax:depth=6 or mcts:iterations=5000 (default: minimax:medium)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--out", default="-", help="JSON-lines output file ('-' for stdout, the default)")
+    parser.add_argument("--export", default=None, metavar="DIR",
+                        help="training-data directory to export the analysed positions to (see src.dataset)")
+    args = parser.parse_args(argv)
+
+    config = parse_engine_spec(args.engine)
+    source = sys.stdin if args.input == "-" else open(args.input)
+    out = sys.stdout if args.out == "-" else open(args.out, "w")
+    try:
+        start = time.perf_counter()
+        count = run_analysis(read_positions(source), config, out, args.workers, args.export)
+        print(f"{count} positions in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
@@ -0,0 +1,291 @@
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+from src.models.board import Board
+from src.ai.engines import parse_engine_spec, format_engine, select_move
+from src.ai.stats import SearchStats
+from src.records import GameRecord, RecordWriter
+from src.ai.ttable import TranspositionTable, MAX_COLS
+from src.ai.memory import DEFAULT_BUDGET_MB, SHRINK_TO
+from src.ai.poscache import save_caches
+from src.dataset import DatasetWriter
+
+
+def random_opening(rng, plies, rows=6, cols=7, connect=4):
+    """
+    Generate a random opening that does not end the game.
+
+    Args:
+        rng: random.Random instance
+        plies: Number of moves in the opening
+        rows, cols, connect: Board shape
+
+    Returns:
+        moves: List of columns, first player first
+    """
+    while True:
+        board = Board(rows, cols, connect)
+        moves = []
+        player = 1
+        for _ in range(plies):
+            col = rng.choice(board.get_valid_moves())
+            board.drop_piece(col, player)
+            if board.is_winner(player) or board.is_full():
+                break
+            moves.append(col)
+            player = 3 - player
+        if len(moves) == plies:
+            return moves
+
+
+def play_game(first, second, opening=(), seed=None, rows=6, cols=7, connect=4):
+    """
+    Play one game between two engine configurations.
+
+    Args:
+        first: Engine configuration moving as player 1
+        second: Engine configuration moving as player 2
+        opening: Columns played before the engines take over
+        seed: Seed for the engines' random number generator
+        rows, cols, connect: Board shape
+
+    Returns:
+        (winner, moves, think_time, move_times, move_scores): 0 for a draw
+        or the winning player, the full move list, total thinking seconds
+        per player, and the seconds and search score of every move (opening
+        moves take no time and have no score)
+    """
+    random.seed(seed)
+    board = Board(rows, cols, connect)
+    configs = {1: first, 2: second}
+    think_time = {1: 0.0, 2: 0.0}
+    moves = []
+    move_times = []
+    move_scores = []
+    player = 1
+
+    for col in opening:
+        board.drop_piece(col, player)
+        moves.append(col)
+        move_times.append(0.0)
+        move_scores.append(None)
+        player = 3 - player
+
+    while True:
+        stats = SearchStats(configs[player]["engine"])
+        start = time.perf_counter()
+        col = select_move(board, player, configs[player], save_history=False, stats=stats)
+        elapsed = time.perf_counter() - start
+        think_time[player] += elapsed
+        if col is None or not board.drop_piece(col, player):
+            # An engine that cannot produce a legal move forfeits
+            return 3 - player, moves, think_time, move_times, move_scores
+        moves.append(col)
+        move_times.append(elapsed)
+        move_scores.append(stats.score)
+        if board.is_winner(player):
+            return player, moves, think_time, move_times, move_scores
+        if board.is_full():
+            return 0, moves, think_time, move_times, move_scores
+        player = 3 - player
+
+
+def _play_task(task):
+    """Worker entry point: play one scheduled game and build its record."""
+    index, engine_a, engine_b, a_first, opening, seed, shape = task
+    first, second = (engine_a, engine_b) if a_first else (engine_b, engine_a)
+    winner, moves, think_time, move_times, move_scores = play_game(first, second, opening, seed, *shape)
+    save_caches()  # a worker may be shut down before its next periodic save
+
+    a_player = 1 if a_first else 2
+    if winner == 0:
+        score = 0.5
+    else:
+        score = 1.0 if winner == a_player else 0.0
+
+    return {
+        "game": index,
+        "a_first": a_first,
+        "opening": list(opening),
+        "moves": moves,
+        "winner": winner,
+        "score_a": score,
+        "time_a": round(think_time[a_player], 4),
+        "time_b": round(think_time[3 - a_player], 4),
+        "move_times": move_times,
+        "move_scores": move_scores,
+    }
+
+
+def schedule(engine_a, engine_b, games, opening_plies, seed, shape=(6, 7, 4)):
+    """
+    Yield game tasks in pairs: each opening is played once with each colour.
+
+    Args:
+        engine_a, engine_b: Engine configurations
+        games: Total number of games
+        opening_plies: Random moves played before the engines take over
+        seed: Base seed for openings and engines
+        shape: Board shape as (rows, cols, connect)
+    """
+    rng = random.Random(seed)
+    opening = ()
+    for index in range(games):
+        if index % 2 == 0:
+            opening = tuple(random_opening(rng, opening_plies, *shape)) if opening_plies else ()
+        yield (index, engine_a, engine_b, index % 2 == 0, opening, seed * 1000003 + index, shape)
+
+
+def elo_from_score(score):
+    """Convert an expected score in (0, 1) into an Elo difference."""
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def summarize(records):
+    """
+    Summarize arena results from engine A's point of view.
+
+    Args:
+        records: Iterable of game records from _play_task
+
+    Returns:
+        summary: Dict with wins, draws, losses, score, Elo and its 95% interval
+    """
+    scores = [record["score_a"] for record in records]
+    n = len(scores)
+    wins = scores.count(1.0)
+    draws = scores.count(0.5)
+    losses = scores.count(0.0)
+    if n == 0:
+        return {"games": 0, "wins": 0, "draws": 0, "losses": 0}
+
+    mean = sum(scores) / n
+    variance = sum((s - mean) ** 2 for s in scores) / n
+    margin = 1.96 * math.sqrt(variance / n)
+    return {
+        "games": n,
+        "wins": wins,
+        "draws": draws,
+        "losses": losses,
+        "score": mean,
+        "elo": elo_from_score(mean),
+        "elo_low": elo_from_score(mean - margin),
+        "elo_high": elo_from_score(mean + margin),
+    }
+
+
+def run_arena(engine_a, engine_b, games, workers=None, opening_plies=2, seed=0, out=None, tt_mb=0,
+              record_path=None, export_dir=None, rows=6, cols=7, connect=4):
+    """
+    Play `games` games between two engines across a process pool.
+
+    Records are written to `out` as JSON lines in completion order and,
+    with `record_path`, to a binary game-record file.
+
+    Args:
+        engine_a, engine_b: Engine configurations
+        games: Number of games
+        workers: Number of worker processes (default: CPU count)
+        opening_plies: Random moves played before the engines take over
+        seed: Base seed for openings and engines
+        out: Optional text stream for the JSON-lines results
+        tt_mb: Size of a transposition table shared by all workers, in MB
+            (0 for none)
+        record_path: Optional game-record file the games are appended to
+        export_dir: Optional training-data directory every position of
+            every game is exported to (see src.dataset)
+        rows, cols, connect: Board shape of every game
+
+    Returns:
+        records: List of game records
+    """
+    table = None
+    if tt_mb:
+        table = TranspositionTable.create(tt_mb)
+        engine_a = dict(engine_a, tt=table.name)
+        engine_b = dict(engine_b, tt=table.name)
+
+    writer = RecordWriter(record_path) if record_path else None
+    exporter = DatasetWriter(export_dir, rows, cols, connect, source="arena") if export_dir else None
+    records = []
+    tasks = schedule(engine_a, engine_b, games, opening_plies, seed, (rows, cols, connect))
+    try:
+        with multiprocessing.Pool(workers) as pool:
+            for record in pool.imap_unordered(_play_task, tasks):
+                move_times = record.pop("move_times")
+                move_scores = record.pop("move_scores")
+                engines = (engine_a, engine_b) if record["a_first"] else (engine_b, engine_a)
+                if writer is not None:
+                    writer.write(GameRecord(record["moves"], record["winner"], engines, move_times, move_scores,
+                                            rows, cols, connect))
+                if exporter is not None:
+                    exporter.add_game(record["moves"], record["winner"], move_scores, engines,
+                                      searched_from=len(record["opening"]))
+                records.append(record)
+                if out is not None:
+                    out.write(json.dumps(record) + "\n")
+                    out.flush()
+    finally:
+        if writer is not None:
+            writer.close()
+        if exporter is not None:
+            exporter.close()
+        if table is not None:
+            table.close()
+    return records
+
+
+def main(argv=None):
+    """Command-line entry point for the arena."""
+    parser = argparse.ArgumentParser(description="Play bulk AI-vs-AI matches without a window.")
+    parser.add_argument("engine_a", help="e.g. minimax:hard or mcts:iterations=2000,max_time=0.5")
+    parser.add_argument("engine_b", help="engine spec for the opponent")
+    parser.add_argument("--games", type=int, default=100, help="number of games (default: 100)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--opening-plies", type=int, default=2, help="random opening moves (default: 2)")
+    parser.add_argument("--seed", type=int, default=0, help="base random seed (default: 0)")
+    parser.add_argument("--out", default=None, help="JSON-lines results file ('-' for stdout)")
+    parser.add_argument("--tt-mb", type=float, default=0,
+                        help="transposition table shared by all workers, in MB (default: none)")
+    parser.add_argument("--record", default=None, help="binary game-record file to append the games to")
+    parser.add_argument("--export", default=None, metavar="DIR",
+                        help="training-data directory to export every position to (see src.dataset)")
+    parser.add_argument("--rows", type=int, default=6, help="board rows (default: 6)")
+    parser.add_argument("--cols", type=int, default=7, help="board columns (default: 7)")
+    parser.add_argument("--connect", type=int, default=4, help="pieces in a row to win (default: 4)")
+    args = parser.parse_args(argv)
+    if args.tt_mb >= DEFAULT_BUDGET_MB * SHRINK_TO:
+        parser.error(f"--tt-mb must stay under {SHRINK_TO:.0%} of the {DEFAULT_BUDGET_MB} MB memory budget")
+    if args.tt_mb and args.cols > MAX_COLS:
+        parser.error(f"--tt-mb needs boards of at most {MAX_COLS} columns")
+
+    engine_a = parse_engine_spec(args.engine_a)
+    engine_b = parse_engine_spec(args.engine_b)
+
+    out = None
+    if args.out == "-":
+        out = sys.stdout
+    elif args.out:
+        out = open(args.out, "w")
+    try:
+        records = run_arena(engine_a, engine_b, args.games, args.workers, args.opening_plies, args.seed, out,
+                            args.tt_mb, args.record, args.export, args.rows, args.cols, args.connect)
+    finally:
+        if out is not None and out is not sys.stdout:
+            out.close()
+
+    summary = summarize(records)
+    label_a, label_b = format_engine(engine_a), format_engine(engine_b)
+    print(f"{label_a} vs {label_b}: {summary['games']} games", file=sys.stderr)
+    if summary["games"]:
+        print(f"  W/D/L {summary['wins']}/{summary['draws']}/{summary['losses']}"
+              f"  score {summary['score']:.3f}", file=sys.stderr)
+        print(f"  Elo {summary['elo']:+.0f}  95% CI [{summary['elo_low']:+.0f}, {summary['elo_high']:+.0f}]",
+              file=sys.stderr)
+    return summary
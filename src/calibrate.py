@@ -0,0 +1,193 @@
+import argparse
+import json
+import sys
+import time
+
+from src.models.board import Board
+from src.ai.minimax import iterative_deepening_minimax
+from src.ai.mcts import mcts_search
+from src.ai.threats import ThreatMap, columns
+from src.ai.engines import registry, SearchLimit, ENGINES_FILE
+from src.ai.stats import SearchStats
+
+POSITIONS_FILE = 'benchmarks/positions.json'
+
+# A level's hard time cap, as a multiple of its target latency
+TIME_CAP = 2.0
+
+# Share of sample positions that must finish a depth within the target
+QUANTILE = 0.9
+
+
+def load_positions(path=POSITIONS_FILE, count=8):
+    """
+    Pick up to `count` open benchmark positions, spread over the file.
+
+    Finished games are left out, and so are positions with an immediate win
+    or at most one move that does not lose: minimax settles those at depth
+    1, so they would never time a deeper search.
+
+    Returns:
+        boards: List of (board, player to move)
+    """
+    with open(path, 'r') as f:
+        entries = json.load(f)
+    boards = []
+    for entry in entries:
+        board = Board.from_moves(entry["moves"])
+        player = board.next_player()
+        if not board.get_valid_moves() or board.is_winner(3 - player):
+            continue
+        threats = ThreatMap(board)
+        if threats.winning_column(player) is None and len(columns(threats.non_losing(player), board.geometry)) > 1:
+            boards.append((board, player))
+    step = max(1, len(boards) // count)
+    return boards[::step][:count]
+
+
+def quantile(values, fraction):
+    """Value below which `fraction` of `values` lie (nearest rank)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure_minimax(boards, max_depth, time_limit):
+    """
+    Time iterative deepening on every sample position.
+
+    Args:
+        boards: List of (board, player)
+        max_depth: Deepest depth to measure
+        time_limit: Seconds allowed per position
+
+    Returns:
+        (depth_times, nodes_per_sec): For each depth, the cumulative seconds
+        every position took to complete it (positions that did not get
+        there count as infinite), and the overall node rate
+    """
+    depth_times = {depth: [] for depth in range(1, max_depth + 1)}
+    nodes = 0
+    seconds = 0.0
+    for board, player in boards:
+        stats = SearchStats("minimax")
+        limit = SearchLimit(max_time=time_limit, stats=stats)
+        iterative_deepening_minimax(board, max_depth, limit, player=player, save_history=False, stats=stats,
+                                    return_partial=True)
+        elapsed = 0.0
+        for depth in range(1, max_depth + 1):
+            if depth <= len(stats.depth_times):
+                elapsed += stats.depth_times[depth - 1]
+                depth_times[depth].append(elapsed)
+            else:
+                depth_times[depth].append(float('inf'))
+        nodes += stats.nodes
+        seconds += stats.time
+    return depth_times, nodes / seconds if seconds else 0.0
+
+
+def measure_mcts(boards, seconds):
+    """
+    Measure MCTS iterations per second.
+
+    Args:
+        boards: List of (board, player)
+        seconds: Search time per position
+
+    Returns:
+        rate: Median iterations per second over the positions
+    """
+    rates = []
+    for board, player in boards:
+        stats = SearchStats("mcts")
+        mcts_search(board, iterations=float('inf'), max_time=seconds, player=player, stats=stats)
+        rates.append(stats.iterations / stats.time)
+    return quantile(rates, 0.5)
+
+
+def calibrate(targets, depth_times, nodes_per_sec, mcts_rate):
+    """
+    Turn measurements into a registry that meets each level's target latency.
+
+    Minimax gets the deepest depth that QUANTILE of the sample positions
+    complete within the target. A level that would end up no deeper than
+    the level below it gets one ply more, if that still fits under its hard
+    cap, so the levels stay ordered by strength. Every minimax level also
+    gets a max_time and nodes cap of TIME_CAP times its target. MCTS gets
+    as many iterations as the host runs in the target time.
+
+    Args:
+        targets: {difficulty: seconds}, easiest first
+        depth_times: From measure_minimax
+        nodes_per_sec: From measure_minimax
+        mcts_rate: From measure_mcts
+
+    Returns:
+        (registry, warnings): Calibrated registry and messages about levels
+        that could not be separated
+    """
+    minimax = {}
+    mcts = {}
+    warnings = []
+    previous_depth = 0
+    for difficulty, target in targets.items():
+        cap = target * TIME_CAP
+        depth = 1
+        for d, times in sorted(depth_times.items()):
+            if quantile(times, QUANTILE) <= target:
+                depth = d
+        if depth <= previous_depth:
+            bumped = previous_depth + 1
+            if bumped in depth_times and quantile(depth_times[bumped], QUANTILE) <= cap:
+                depth = bumped
+            else:
+                warnings.append(f"minimax:{difficulty} is no stronger than the level below on this host")
+        previous_depth = depth
+        minimax[difficulty] = {"depth": depth, "max_time": round(cap, 2), "nodes": int(nodes_per_sec * cap)}
+        mcts[difficulty] = {"iterations": int(mcts_rate * target), "max_time": round(cap, 2)}
+    return {"targets": dict(targets), "minimax": minimax, "mcts": mcts}, warnings
+
+
+def main(argv=None):
+    """Command-line entry point for engine calibration."""
+    parser = argparse.ArgumentParser(description="Measure this host and set each difficulty's budget "
+                                                 "to hit its target latency.")
+    parser.add_argument("--positions", type=int, default=8, help="sample positions (default: 8)")
+    parser.add_argument("--max-depth", type=int, default=9, help="deepest minimax depth to measure (default: 9)")
+    parser.add_argument("--mcts-time", type=float, default=1.0,
+                        help="seconds of MCTS per position when measuring (default: 1.0)")
+    parser.add_argument("--target", action="append", default=[], metavar="LEVEL=SECONDS",
+                        help="override a level's target latency, e.g. --target hard=3")
+    parser.add_argument("--write", nargs="?", const=ENGINES_FILE, default=None, metavar="PATH",
+                        help=f"save the registry (default path: {ENGINES_FILE})")
+    args = parser.parse_args(argv)
+
+    targets = dict(registry()["targets"])
+    for item in args.target:
+        level, _, seconds = item.partition("=")
+        targets[level] = float(seconds)
+    targets = dict(sorted(targets.items(), key=lambda item: item[1]))
+
+    boards = load_positions(count=args.positions)
+    print(f"Measuring minimax on {len(boards)} positions...", file=sys.stderr)
+    start = time.perf_counter()
+    depth_times, nodes_per_sec = measure_minimax(boards, args.max_depth, max(targets.values()) * TIME_CAP)
+    print("Measuring MCTS...", file=sys.stderr)
+    mcts_rate = measure_mcts(boards, args.mcts_time)
+    print(f"Measured in {time.perf_counter() - start:.0f}s: {nodes_per_sec:,.0f} minimax nodes/s, "
+          f"{mcts_rate:,.0f} MCTS iterations/s", file=sys.stderr)
+
+    calibrated, warnings = calibrate(targets, depth_times, nodes_per_sec, mcts_rate)
+    for difficulty, target in targets.items():
+        mm = calibrated["minimax"][difficulty]
+        mc = calibrated["mcts"][difficulty]
+        print(f"{difficulty:<8} target {target:5.2f}s  minimax depth {mm['depth']} (cap {mm['max_time']}s)  "
+              f"mcts {mc['iterations']} iterations")
+    for warning in warnings:
+        print(f"warning: {warning}", file=sys.stderr)
+
+    if args.write:
+        with open(args.write, 'w') as f:
+            json.dump(calibrated, f, indent=2)
+            f.write("\n")
+        print(f"Wrote {args.write}", file=sys.stderr)
+    return calibrated
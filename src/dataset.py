@@ -0,0 +1,263 @@
+import json
+import os
+
+import numpy as np
+
+from src.models.board import Board
+
+# Default directory exported training data is written to
+DATASET_DIR = 'data/dataset'
+
+# Samples per shard file; every shard is preallocated at this size
+SHARD_SIZE = 1 << 16
+
+MANIFEST = 'manifest.json'
+DATASET_VERSION = 1
+
+# What a sample's score means: none, a minimax evaluation from the side
+# to move's point of view, or an MCTS win rate for the side to move
+SCORE_NONE = 0
+SCORE_MINIMAX = 1
+SCORE_MCTS = 2
+SCORE_KINDS = {"minimax": SCORE_MINIMAX, "mcts": SCORE_MCTS}
+
+# Result of a sample whose game result is not known (e.g. analysis runs)
+NO_RESULT = 127
+
+
+def sample_dtype(rows=6, cols=7):
+    """
+    Record layout of one training sample on a rows x cols board.
+
+    Fields:
+        planes: (2, rows, cols) 0/1 planes, the side to move's pieces then
+            the opponent's, row 0 at the top as in Board
+        to_move: Side to move (1 or 2)
+        score: Search score (see score_kind), NaN when there is none
+        score_kind: SCORE_NONE, SCORE_MINIMAX or SCORE_MCTS
+        best_move: Column chosen by the search, -1 when none
+        result: Final result for the side to move (1 win, 0 draw, -1 loss,
+            NO_RESULT when unknown)
+    """
+    return np.dtype([
+        ("planes", "u1", (2, rows, cols)),
+        ("to_move", "u1"),
+        ("score", "<f4"),
+        ("score_kind", "u1"),
+        ("best_move", "i1"),
+        ("result", "i1"),
+    ])
+
+
+def _shard_name(index):
+    """File name of the shard with the given number."""
+    return f"shard-{index:05d}.npy"
+
+
+def _read_manifest(directory):
+    """Return the dataset manifest in `directory`, or None if there is none."""
+    path = os.path.join(directory, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class DatasetWriter:
+    """
+    Streams training samples into fixed-size .npy shards.
+
+    Each shard is a preallocated memmap of SHARD_SIZE samples; samples are
+    written straight into it, so nothing accumulates in Python lists. The
+    manifest lists every shard with the number of samples it holds and is
+    rewritten (atomically) whenever a shard fills up and on close, so a
+    crash loses at most the samples of the shard being filled. Opening an
+    existing dataset appends to it, continuing its last shard.
+    """
+
+    def __init__(self, directory=DATASET_DIR, rows=6, cols=7, connect=4, shard_size=SHARD_SIZE, source=None):
+        """
+        Open (or create) the dataset in `directory`.
+
+        Args:
+            directory: Dataset directory
+            rows, cols, connect: Board shape of every sample
+            shard_size: Samples per shard (ignored when appending to an
+                existing dataset, which keeps its own)
+            source: Label counted in the manifest's 'sources' (e.g. 'arena')
+        """
+        self.directory = directory
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        self.dtype = sample_dtype(rows, cols)
+        self.source = source
+        os.makedirs(directory, exist_ok=True)
+
+        manifest = _read_manifest(directory)
+        if manifest is None:
+            manifest = {
+                "version": DATASET_VERSION,
+                "rows": rows,
+                "cols": cols,
+                "connect": connect,
+                "shard_size": shard_size,
+                "dtype": self.dtype.descr,
+                "samples": 0,
+                "shards": [],
+                "sources": {},
+            }
+        elif (manifest["rows"], manifest["cols"], manifest.get("connect", 4)) != (rows, cols, connect):
+            raise ValueError(f"Dataset in {directory} holds {manifest['rows']}x{manifest['cols']} connect "
+                             f"{manifest.get('connect', 4)} boards, not {rows}x{cols} connect {connect}")
+        self.manifest = manifest
+        self.shard_size = manifest["shard_size"]
+        self.shard = None
+        self.count = 0
+
+        # Continue a partly filled last shard
+        shards = manifest["shards"]
+        if shards and shards[-1]["count"] < self.shard_size:
+            self.shard = np.lib.format.open_memmap(os.path.join(directory, shards[-1]["file"]), mode='r+')
+            self.count = shards[-1]["count"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _new_shard(self):
+        """Finish the current shard and preallocate the next one."""
+        if self.shard is not None:
+            self.shard.flush()
+            self._write_manifest()
+        name = _shard_name(len(self.manifest["shards"]))
+        self.shard = np.lib.format.open_memmap(os.path.join(self.directory, name), mode='w+',
+                                               dtype=self.dtype, shape=(self.shard_size,))
+        self.manifest["shards"].append({"file": name, "count": 0})
+        self.count = 0
+
+    def add(self, board, player, score=None, score_kind=SCORE_NONE, best_move=None, result=None):
+        """
+        Write one sample.
+
+        Args:
+            board: Position (not modified)
+            player: Side to move (1 or 2)
+            score: Search score of the position, or None
+            score_kind: SCORE_MINIMAX or SCORE_MCTS when there is a score
+            best_move: Column the search chose, or None
+            result: Final result for the side to move (1, 0, -1), or None when unknown
+        """
+        if self.shard is None or self.count == self.shard_size:
+            self._new_shard()
+        sample = self.shard[self.count]
+        sample["planes"][0] = board.board == player
+        sample["planes"][1] = board.board == 3 - player
+        sample["to_move"] = player
+        sample["score"] = np.nan if score is None else score
+        sample["score_kind"] = SCORE_NONE if score is None else score_kind
+        sample["best_move"] = -1 if best_move is None else best_move
+        sample["result"] = NO_RESULT if result is None else result
+        self.count += 1
+        self.manifest["shards"][-1]["count"] = self.count
+        self.manifest["samples"] += 1
+        if self.source is not None:
+            sources = self.manifest["sources"]
+            sources[self.source] = sources.get(self.source, 0) + 1
+
+    def add_game(self, moves, winner, scores=None, engines=(None, None), searched_from=0):
+        """
+        Write a sample for every position of a finished game, before each move.
+
+        Args:
+            moves: 0-based columns in move order, player 1 first
+            winner: 1 or 2, 0 for a draw, None when unknown
+            scores: Search score of each move from its mover's search (None
+                where there is none)
+            engines: Engine configuration of player 1 and player 2 (None for
+                a human); gives the meaning of each score
+            searched_from: Index of the first move chosen by a search (the
+                moves before it, e.g. a random opening, get no best move)
+        """
+        board = Board(self.rows, self.cols, self.connect)
+        player = 1
+        for ply, col in enumerate(moves):
+            result = None
+            if winner is not None:
+                result = 0 if winner == 0 else (1 if winner == player else -1)
+            engine = engines[player - 1]
+            score = scores[ply] if scores is not None and ply >= searched_from else None
+            kind = SCORE_KINDS.get(engine["engine"], SCORE_NONE) if engine else SCORE_NONE
+            best_move = col if ply >= searched_from and engine else None
+            self.add(board, player, score, kind, best_move, result)
+            board.drop_piece(col, player)
+            player = 3 - player
+
+    def _write_manifest(self):
+        """Replace the manifest file atomically."""
+        path = os.path.join(self.directory, MANIFEST)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+            f.write("\n")
+        os.replace(path + ".tmp", path)
+
+    def close(self):
+        """Flush the current shard and write the manifest."""
+        if self.shard is not None:
+            self.shard.flush()
+            self.shard = None
+        self._write_manifest()
+
+
+class DatasetReader:
+    """
+    Reads an exported dataset through memory maps, without copying.
+
+    Shards are opened read-only with np.load(mmap_mode='r'); the arrays it
+    hands out are views into those maps, so only the pages a consumer
+    touches are read from disk.
+    """
+
+    def __init__(self, directory=DATASET_DIR):
+        """Open the dataset in `directory`."""
+        manifest = _read_manifest(directory)
+        if manifest is None:
+            raise FileNotFoundError(f"No dataset manifest in {directory}")
+        if manifest["version"] != DATASET_VERSION:
+            raise ValueError(f"Unsupported dataset version {manifest['version']} in {directory}")
+        self.directory = directory
+        self.manifest = manifest
+        self.rows = manifest["rows"]
+        self.cols = manifest["cols"]
+        self.connect = manifest.get("connect", 4)  # manifests written before connect was recorded
+
+    def __len__(self):
+        return self.manifest["samples"]
+
+    def shards(self):
+        """Yield every shard as a read-only memmap of its filled samples."""
+        for shard in self.manifest["shards"]:
+            if shard["count"]:
+                data = np.load(os.path.join(self.directory, shard["file"]), mmap_mode='r')
+                yield data[:shard["count"]]
+
+    def batches(self, batch_size=1024):
+        """
+        Yield consecutive batches of samples as zero-copy views.
+
+        Batches do not span shards (that would need a copy), so the last
+        batch of each shard may be smaller than `batch_size`.
+
+        Args:
+            batch_size: Samples per batch
+
+        Returns:
+            batches: Iterator of structured arrays with the sample_dtype
+            fields (e.g. batch["planes"], batch["result"])
+        """
+        for data in self.shards():
+            for start in range(0, len(data), batch_size):
+                yield data[start:start + batch_size]
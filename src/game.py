@@ -3,8 +3,13 @@ import sys
 import time
 import copy
 from src.models.board import Board
-from src.ai.minimax import iterative_deepening_minimax
-from src.ai.mcts import mcts_search
+from src.ai.engines import engine_config, registry, search_move
+from src.ai.ponder import Ponderer, Analyst
+from src.ai.stats import SearchStats, StatsLogger
+from src.ai.timeman import TimeManager
+from src.ai.poscache import save_caches
+from src.analysis import GameReview
+from src.records import GameRecord, RecordWriter, RECORD_PATH, RESULT_DRAW, RESULT_FIRST, RESULT_SECOND
 from src.gui import GUI
 
 class Game:
@@ -13,9 +18,10 @@ class Game:
     # Constants
     HUMAN_PLAYER = 1
     AI_PLAYER = 2
-    AI_THINKING_TIME = 2  # Delay in seconds
+    AI_THINKING_TIME = 0.05  # Pause (seconds) so the human's move is drawn before the AI searches
+    HINT_DEPTH = 6  # Deepest multi-PV search behind the column hints ('H')
     
-    def __init__(self, ai_type="minimax", first_ai=None, second_ai=None, first_player=1, difficulty="medium", first_ai_difficulty="medium", second_ai_difficulty="medium"):
+    def __init__(self, ai_type="minimax", first_ai=None, second_ai=None, first_player=1, difficulty="medium", first_ai_difficulty="medium", second_ai_difficulty="medium", ponder=True, stats_log=None, profile=False, record_path=RECORD_PATH, rows=6, cols=7, connect=4, position_cache=True):
         """
         Initialize the game.
         
@@ -25,15 +31,23 @@ class Game:
             second_ai: Type of second AI for battle mode ('minimax' or 'mcts')
             first_player: Player who goes first (1 for human, 2 for AI)
             difficulty: Difficulty level ('easy', 'medium', 'hard')
+            ponder: Search on the opponent's time (True) or stay idle (False)
+            stats_log: Optional path; SearchStats of every AI move are appended as JSON lines
+            profile: Run every AI move under the sampling profiler
+            record_path: Game-record file finished games are appended to (None to keep no record)
+            rows, cols: Board size
+            connect: Pieces in a row needed to win
+            position_cache: Answer positions searched in earlier games from
+                the persistent position cache, and add this game's searches to it
         """
-        self.board = Board()
+        self.board = Board(rows, cols, connect)
         self.ai_type = ai_type
         self.current_player = first_player
         self.winner = None
         self.ai_thinking = False
         self.ai_start_time = 0
         self.difficulty = difficulty
-        self.selected_col = 3  # keyboard-controlled column cursor, starts centre
+        self.selected_col = self.board.cols // 2  # keyboard-controlled column cursor, starts centre
 
         
         # For AI vs AI battle
@@ -45,6 +59,45 @@ class Game:
         self.first_ai_difficulty = first_ai_difficulty
         self.second_ai_difficulty = second_ai_difficulty
         
+        # Pondering: one background searcher per AI-controlled player
+        self.position_cache = position_cache
+        self.ponder = ponder
+        self.ponderers = {}
+        self.last_col = None
+        if ponder:
+            for player in (1, 2):
+                if self.battle_mode or player == self.AI_PLAYER:
+                    self.ponderers[player] = Ponderer(self._engine_for(player), player)
+        
+        # Thinking-time bank of every AI player for the current game
+        self.time_managers = {}
+        self.new_time_managers()
+        
+        # Search statistics of the last AI move, shown in the debug overlay ('D')
+        self.last_stats = None
+        self.show_stats = False
+        self.profile = profile
+        self.stats_logger = StatsLogger(stats_log) if stats_log else None
+        
+        # Per-column scores shown above the board on the human's turn ('H')
+        self.show_hints = False
+        self.analyst = Analyst(self.HINT_DEPTH)
+        
+        # Moves of the current game with their thinking time and search score,
+        # written to the game-record file when the game ends
+        self.record_writer = RecordWriter(record_path) if record_path else None
+        self.record_start = None
+        self.move_log = []
+        self.turn_start = time.perf_counter()
+        self.pending_search = None  # (seconds, score) of the AI move about to be made
+        
+        # Review of the finished game: every ply is analysed in the background
+        # and the arrow keys step through the positions ('review_ply' is the
+        # number of moves shown, None for the final position)
+        self.review = GameReview(self.HINT_DEPTH)
+        self.review_boards = []
+        self.review_ply = None
+        
         # Set up the GUI
         self.gui = GUI(self)
         
@@ -61,13 +114,148 @@ class Game:
         if self.current_player == self.AI_PLAYER and not self.battle_mode:
             self.ai_thinking = True
             self.ai_start_time = time.time()
+        elif not self.battle_mode and self.AI_PLAYER in self.ponderers:
+            self.ponderers[self.AI_PLAYER].start(self.board)
+    
+    def _ai_for(self, player):
+        """Return (ai_type, difficulty) of the AI playing as `player`."""
+        if self.battle_mode:
+            if player == 1:
+                return self.first_ai, self.first_ai_difficulty
+            return self.second_ai, self.second_ai_difficulty
+        return self.ai_type, self.difficulty
+    
+    def _engine_for(self, player):
+        """Return the engine configuration of the AI playing as `player`."""
+        config = engine_config(*self._ai_for(player))
+        if self.position_cache:
+            config["cache"] = "auto"
+        return config
+    
+    def new_time_managers(self):
+        """Give every AI player a fresh time bank, sized from its difficulty's target seconds per move."""
+        targets = registry()["targets"]
+        for player in (1, 2):
+            if self.battle_mode or player == self.AI_PLAYER:
+                difficulty = self._ai_for(player)[1]
+                self.time_managers[player] = TimeManager.for_target(targets[difficulty], self.board)
+    
+    def stop_pondering(self):
+        """Stop all background searches and drop their results."""
+        for ponderer in self.ponderers.values():
+            ponderer.stop()
+        self.analyst.stop()
+    
+    def update_hints(self):
+        """Keep the hint analysis running on the human's turn, and only then."""
+        wanted = (self.show_hints and not self.battle_mode and self.winner is None
+                  and self.current_player == self.HUMAN_PLAYER)
+        if not wanted:
+            if self.analyst.board_key is not None:
+                self.analyst.stop()
+        elif self.analyst.board_key != self.board.key():
+            self.analyst.start(self.board, self.current_player)
+    
+    def hints(self):
+        """Latest (depth, {column: score}) for the hint overlay, or None."""
+        if not self.show_hints:
+            return None
+        return self.analyst.scores()
+    
+    def start_review(self):
+        """Keep the position before every move and start analysing them in the background."""
+        moves = [col for col, _, _ in self.move_log]
+        board = Board(self.board.rows, self.board.cols, self.board.connect)
+        player = self.record_start
+        self.review_boards = []
+        for col in moves:
+            self.review_boards.append(copy.deepcopy(board))
+            board.drop_piece(col, player)
+            player = 3 - player
+        self.review_boards.append(self.board)
+        self.review_ply = None
+        self.review.start(moves, self.board.rows, self.board.cols, self.board.connect)
+    
+    def step_review(self, ply):
+        """Show the position after `ply` moves (clamped; the last one shows the final position)."""
+        if not self.review_boards:
+            return
+        last = len(self.review_boards) - 1
+        ply = max(0, min(last, ply))
+        self.review_ply = None if ply == last else ply
+    
+    def view_board(self):
+        """The board to draw: the reviewed position, or the game's board."""
+        if self.review_ply is not None:
+            return self.review_boards[self.review_ply]
+        return self.board
+    
+    def review_info(self):
+        """
+        What the review shows for the current position.
+
+        Returns:
+            (ply, total, entry, progress): Moves shown, moves in the game,
+            the cached analysis of the next move (None while pending or at
+            the final position) and (analysed, total) plies; None when no
+            review is running
+        """
+        if not self.review_boards:
+            return None
+        total = len(self.review_boards) - 1
+        ply = total if self.review_ply is None else self.review_ply
+        entry = self.review.entry(ply) if ply < total else None
+        return ply, total, entry, self.review.progress()
+    
+    def shutdown(self):
+        """Stop background work, save the position cache and close the logs when leaving the game."""
+        self.stop_pondering()
+        self.review.stop()
+        if self.position_cache:
+            save_caches()
+        if self.stats_logger is not None:
+            self.stats_logger.close()
+            self.stats_logger = None
+        if self.record_writer is not None:
+            self.record_writer.close()
+            self.record_writer = None
+    
+    def record_game(self):
+        """Append the finished game to the game-record file."""
+        if self.record_writer is None or not self.move_log:
+            return
+        first = self.record_start
+        engines = []
+        for player in (first, 3 - first):
+            if self.battle_mode or player == self.AI_PLAYER:
+                engines.append(engine_config(*self._ai_for(player)))
+            else:
+                engines.append(None)
+        if self.winner == 0:
+            result = RESULT_DRAW
+        else:
+            result = RESULT_FIRST if self.winner == first else RESULT_SECOND
+        moves, times, scores = zip(*self.move_log)
+        self.record_writer.write(GameRecord(moves, result, engines, times, scores,
+                                            self.board.rows, self.board.cols, self.board.connect))
     
     def reset(self):
         """Reset the game to the initial state."""
-        self.board = Board()
+        self.stop_pondering()
+        self.board = Board(self.board.rows, self.board.cols, self.board.connect)
         self.current_player = self.HUMAN_PLAYER
         self.winner = None
         self.ai_thinking = False
+        self.last_col = None
+        self.record_start = None
+        self.move_log = []
+        self.turn_start = time.perf_counter()
+        self.review.stop()
+        self.review_boards = []
+        self.review_ply = None
+        self.new_time_managers()
+        if not self.battle_mode and self.AI_PLAYER in self.ponderers:
+            self.ponderers[self.AI_PLAYER].start(self.board)
     
     def make_move(self, col):
         """
@@ -85,14 +273,33 @@ class Game:
         success = self.board.drop_piece(col, self.current_player)
         
         if success:
+            self.last_col = col
+            mover = self.current_player
+            if self.record_start is None:
+                self.record_start = mover
+            # AI moves record their search time, human moves the time taken to click
+            now = time.perf_counter()
+            seconds, score = self.pending_search or (now - self.turn_start, None)
+            self.move_log.append((col, seconds, score))
+            self.turn_start = now
+            self.pending_search = None
             # Check for win
             if self.board.is_winner(self.current_player):
                 self.winner = self.current_player
+                self.stop_pondering()
+                self.record_game()
+                self.start_review()
             # Check for draw
             elif self.board.is_full():
                 self.winner = 0  # 0 indicates draw
+                self.stop_pondering()
+                self.record_game()
+                self.start_review()
             else:
                 self.switch_player()
+                # The AI that just moved thinks on its opponent's time
+                if mover in self.ponderers:
+                    self.ponderers[mover].start(self.board)
         
         return success
     
@@ -102,44 +309,40 @@ class Game:
             return False
         
         # Determine which AI and difficulty to use
-        current_ai = self.ai_type
-        current_difficulty = self.difficulty
+        config = self._engine_for(self.current_player)
         
-        if self.battle_mode:
-            if self.current_player == 1:
-                current_ai = self.first_ai
-                current_difficulty = self.first_ai_difficulty
-            else:
-                current_ai = self.second_ai
-                current_difficulty = self.second_ai_difficulty
-        
-        # Get the move from the appropriate AI with appropriate difficulty
-        col = None
-        if current_ai == "minimax":
-            # Set depth based on difficulty
-            if current_difficulty == "easy":
-                depth = 2
-            elif current_difficulty == "medium":
-                depth = 3
-            elif current_difficulty == "hard":
-                depth = 5
-            else:  # "expert"
-                depth = 7
-            
-            _, col = iterative_deepening_minimax(self.board, depth)
-        elif current_ai == "mcts":
-            # Set MCTS parameters based on difficulty
-            if current_difficulty == "easy":
-                iterations = 1000
-                max_time = 0.5
-            elif current_difficulty == "medium":
-                iterations = 5000
-                max_time = 2.0
-            else:  # "hard"
-                iterations = 10000
-                max_time = 5.0
-            
-            col = mcts_search(self.board, iterations=iterations, max_time=max_time)
+        # Collect whatever was pondered for the opponent's last move
+        pondered = None
+        ponderer = self.ponderers.get(self.current_player)
+        if ponderer is not None and self.last_col is not None:
+            pondered = ponderer.take(self.board, self.last_col)
+        
+        # In battle mode the other AI only ponders while we are idle, never
+        # against our own search
+        other = self.ponderers.get(3 - self.current_player)
+        if other is not None:
+            other.stop()
+        
+        # Get the move from the appropriate AI with appropriate difficulty; a
+        # move already found while pondering costs nothing from the time bank
+        if config["engine"] == "minimax" and pondered is not None:
+            col = pondered
+            stats = SearchStats("minimax")
+            stats.move = col
+        else:
+            root = pondered if config["engine"] == "mcts" else None
+            manager = self.time_managers[self.current_player]
+            clock = manager.start(self.board)
+            col, stats = search_move(self.board, self.current_player, config, root=root, profile=self.profile,
+                                     clock=clock)
+            manager.finish(clock.elapsed())
+        if ponderer is not None:
+            stats.record_cache("ponder", pondered is not None)
+        
+        self.last_stats = stats
+        self.pending_search = (stats.time, stats.score)
+        if self.stats_logger is not None:
+            self.stats_logger.log(stats, player=self.current_player, ply=int((self.board.board != 0).sum()))
         
         if col is not None:
             return self.make_move(col)
@@ -186,6 +389,7 @@ class Game:
             # Handle events
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
+                    self.shutdown()
                     return False
                 
                 if event.type == pygame.MOUSEBUTTONDOWN:
@@ -198,12 +402,25 @@ class Game:
                     if event.key == pygame.K_r:
                         if self.winner is not None:
                             # Game is over, return to menu
+                            self.shutdown()
                             return True  # This will return to the main menu
                         else:
                             # Mid-game reset, just restart
                             self.reset()
                     elif event.key == pygame.K_ESCAPE:  # Exit to main menu
+                        self.shutdown()
                         return True
+                    elif event.key == pygame.K_d:  # Toggle search statistics overlay
+                        self.show_stats = not self.show_stats
+                    elif event.key == pygame.K_h:  # Toggle per-column hints
+                        self.show_hints = not self.show_hints
+                    elif self.winner is not None and event.key in (pygame.K_LEFT, pygame.K_RIGHT,
+                                                                   pygame.K_HOME, pygame.K_END):
+                        # Review: step through the finished game
+                        shown = len(self.review_boards) - 1 if self.review_ply is None else self.review_ply
+                        step = {pygame.K_LEFT: shown - 1, pygame.K_RIGHT: shown + 1,
+                                pygame.K_HOME: 0, pygame.K_END: len(self.review_boards)}
+                        self.step_review(step[event.key])
                     elif not self.battle_mode and self.current_player == self.HUMAN_PLAYER and self.winner is None:
                         if event.key == pygame.K_LEFT:
                             self.selected_col = max(0, self.selected_col - 1)
@@ -229,10 +446,13 @@ class Game:
                             self.ai_thinking = False
                             self.ai_move()
             
-            # Draw the game
-            self.gui.draw(self.screen)
+            self.update_hints()
+            
+            # Draw the game; frames where nothing changed are skipped
+            dirty = self.gui.draw(self.screen)
             
-            # Update the display
-            pygame.display.flip()
+            # Update only the parts of the display that changed
+            if dirty:
+                pygame.display.update(dirty)
         
         return False  # This means exit the application
\ No newline at end of file
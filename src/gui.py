@@ -1,193 +1,410 @@
+from collections import OrderedDict
+
+import numpy as np
 import pygame
 
+
+class SpriteAtlas:
+    """
+    One surface holding a square sprite per cell state (empty hole, player 1, player 2).
+
+    Boards blit cells straight from the atlas, so any number of boards at
+    the same scale share one set of sprites.
+    """
+
+    def __init__(self, size, colors, background):
+        """
+        Render the atlas.
+
+        Args:
+            size: Side of one square in pixels
+            colors: Disc color per cell state, indexed by state (0 is the hole)
+            background: Board color around the discs
+        """
+        self.size = size
+        self.surface = pygame.Surface((size * len(colors), size))
+        self.surface.fill(background)
+        radius = max(1, size // 2 - max(1, size // 20))
+        for state, color in enumerate(colors):
+            pygame.draw.circle(self.surface, color, (state * size + size // 2, size // 2), radius)
+        self.areas = [pygame.Rect(state * size, 0, size, size) for state in range(len(colors))]
+
+    def sprite(self, state):
+        """The sprite of a cell state, as a subsurface of the atlas."""
+        return self.surface.subsurface(self.areas[state])
+
+    def blit(self, target, state, pos):
+        """Draw the sprite of `state` onto `target` with its top-left corner at `pos`."""
+        target.blit(self.surface, pos, self.areas[state])
+
+
 class GUI:
     """GUI for the Connect Four game."""
-    
+
     # Colors
     BLUE = (0, 0, 255)
     BLACK = (0, 0, 0)
     RED = (255, 0, 0)
     YELLOW = (255, 255, 0)
     WHITE = (255, 255, 255)
-    
+    GREY = (200, 200, 200)
+
     # Dimensions
     SQUARE_SIZE = 100
-    
+
+    # Rendered text surfaces kept between frames
+    TEXT_CACHE_SIZE = 256
+
     def __init__(self, game):
         """Initialize the GUI."""
         self.game = game
-        
+
         # Calculate dimensions
         self.WIDTH = game.board.cols * self.SQUARE_SIZE
         self.HEIGHT = (game.board.rows + 1) * self.SQUARE_SIZE  # +1 for the top row
-        
+
         # Load fonts
         pygame.font.init()
         self.font = pygame.font.SysFont('Comic Sans MS', 30)
         self.large_font = pygame.font.SysFont('Comic Sans MS', 60)
-    
-    def draw_board(self, screen):
-        """Draw the game board."""
-        # Draw blue background
-        pygame.draw.rect(
-            screen,
-            self.BLUE,
-            (0, self.SQUARE_SIZE, self.WIDTH, self.HEIGHT - self.SQUARE_SIZE)
-        )
+        self.small_font = pygame.font.SysFont('Courier New', 16)
 
-        # Draw column hover highlight
+        # Pre-rendered surfaces: one square sprite per cell state (0 is the
+        # empty hole, i.e. the static board mask), the column highlight, and
+        # the board layer that sprites are blitted into as pieces drop
+        self.atlas = SpriteAtlas(self.SQUARE_SIZE, (self.BLACK, self.RED, self.YELLOW), self.BLUE)
+        self.cell_sprites = {state: self.atlas.sprite(state) for state in range(3)}
+        self.highlight = pygame.Surface((self.SQUARE_SIZE, self.HEIGHT - self.SQUARE_SIZE), pygame.SRCALPHA)
+        self.highlight.fill((255, 255, 255, 40))
+        for row in range(game.board.rows):
+            # The highlight tints the blue board only, not the discs
+            pygame.draw.circle(
+                self.highlight,
+                (0, 0, 0, 0),
+                (self.SQUARE_SIZE // 2, row * self.SQUARE_SIZE + self.SQUARE_SIZE // 2),
+                self.SQUARE_SIZE // 2 - 5
+            )
+        self.board_layer = pygame.Surface((self.WIDTH, self.HEIGHT - self.SQUARE_SIZE))
+        for row in range(game.board.rows):
+            for col in range(game.board.cols):
+                self.board_layer.blit(self.cell_sprites[0], self._cell_pos(row, col))
+        self.board_rect = pygame.Rect(0, self.SQUARE_SIZE, self.WIDTH, self.HEIGHT - self.SQUARE_SIZE)
+        self.top_rect = pygame.Rect(0, 0, self.WIDTH, self.SQUARE_SIZE)
+
+        # Rendered text, keyed by (font, text, color); least recently used
+        # entries go first, since timers and analysis lines change every frame
+        self.text_cache = OrderedDict()
+
+        # What is currently on screen, used to work out the dirty rects
+        self.shown_cells = np.zeros((game.board.rows, game.board.cols), dtype=int)
+        self.shown_screen = None
+        self.shown_top = None
+        self.shown_hover = None
+        self.shown_line = None
+        self.shown_overlay = None
+        self.overlay_surface = None
+        self.overlay_rect = None
+
+    def _cell_pos(self, row, col):
+        """Top-left corner of a cell on the board layer."""
+        return (col * self.SQUARE_SIZE, row * self.SQUARE_SIZE)
+
+    def _column_rect(self, col):
+        """Screen rect of a board column (below the top bar)."""
+        return pygame.Rect(col * self.SQUARE_SIZE, self.SQUARE_SIZE,
+                           self.SQUARE_SIZE, self.HEIGHT - self.SQUARE_SIZE)
+
+    def render_text(self, font, text, color):
+        """Render text once and reuse the surface on later frames."""
+        key = (id(font), text, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.text_cache[key] = surface
+            if len(self.text_cache) > self.TEXT_CACHE_SIZE:
+                self.text_cache.popitem(last=False)
+        else:
+            self.text_cache.move_to_end(key)
+        return surface
+
+    def update_board_layer(self):
+        """
+        Blit sprites for cells that changed since the last frame.
+
+        Returns:
+            columns: Set of columns whose cells changed
+        """
+        board = self.game.view_board()
+        cells = board.board
+        changed = np.argwhere(cells != self.shown_cells)
+        for row, col in changed:
+            self.board_layer.blit(self.cell_sprites[int(cells[row][col])], self._cell_pos(row, col))
+        self.shown_cells = cells.copy()
+        return {int(col) for _, col in changed}
+
+    def hover_column(self):
+        """Column under the mouse that gets the highlight, or None."""
         if self.game.winner is None and not self.game.battle_mode:
             mouse_x, _ = pygame.mouse.get_pos()
             hover_col = mouse_x // self.SQUARE_SIZE
             if 0 <= hover_col < self.game.board.cols:
-                highlight = pygame.Surface((self.SQUARE_SIZE, self.HEIGHT - self.SQUARE_SIZE), pygame.SRCALPHA)
-                highlight.fill((255, 255, 255, 40))
-                screen.blit(highlight, (hover_col * self.SQUARE_SIZE, self.SQUARE_SIZE))
-
-        # Draw empty circles for the grid
-        for row in range(self.game.board.rows):
-            for col in range(self.game.board.cols):
-                # Calculate the center position of each circle
-                x = col * self.SQUARE_SIZE + self.SQUARE_SIZE // 2
-                y = (row + 1) * self.SQUARE_SIZE + self.SQUARE_SIZE // 2
-                
-                # Default color is black (empty)
-                color = self.BLACK
-                
-                # Check if a piece exists at this position
-                piece = self.game.board.get_cell(row, col)
-                if piece == 1:  # Human player
-                    color = self.RED
-                elif piece == 2:  # AI player
-                    color = self.YELLOW
-                
-                # Draw the circle
-                pygame.draw.circle(
-                    screen, 
-                    color, 
-                    (x, y), 
-                    self.SQUARE_SIZE // 2 - 5
-                )
-    
+                return hover_col
+        return None
+
+    def draw_board(self, screen, rect=None):
+        """Draw the game board (or the part of it inside `rect`)."""
+        rect = self.board_rect if rect is None else rect
+        screen.set_clip(rect)
+
+        # Blue board with pieces, from the cached layer
+        screen.blit(self.board_layer, self.board_rect.topleft)
+
+        # Draw column hover highlight
+        if self.shown_hover is not None:
+            screen.blit(self.highlight, (self.shown_hover * self.SQUARE_SIZE, self.SQUARE_SIZE))
+
+        # Draw winning line and stats overlay on top
+        self.draw_winning_line(screen)
+        if self.overlay_surface is not None:
+            screen.blit(self.overlay_surface, self.overlay_rect)
+
+        screen.set_clip(None)
+
+    def preview_column(self):
+        """Column where the preview piece is drawn, or None."""
+        if self.game.current_player == self.game.HUMAN_PLAYER and self.game.winner is None:
+            col = self.game.selected_col  # keyboard cursor
+            if 0 <= col < self.game.board.cols and self.game.board.is_valid_move(col):
+                return col
+        return None
+
     def draw_piece_preview(self, screen):
         """Draw a preview of where the piece will be placed."""
-        if self.game.current_player == self.game.HUMAN_PLAYER and self.game.winner is None:
-            # Keyboard cursor takes priority; fall back to mouse position
-            mouse_x, _ = pygame.mouse.get_pos()
-            mouse_col = mouse_x // self.SQUARE_SIZE
-            col = self.game.selected_col if hasattr(self.game, 'selected_col') else mouse_col
+        col = self.preview_column()
 
-            # Draw the preview piece at the top
-            if 0 <= col < self.game.board.cols and self.game.board.is_valid_move(col):
-                x = col * self.SQUARE_SIZE + self.SQUARE_SIZE // 2
-                y = self.SQUARE_SIZE // 2
-
-                pygame.draw.circle(
-                    screen,
-                    self.RED,
-                    (x, y),
-                    self.SQUARE_SIZE // 2 - 5
-                )
-    
-    def draw_winner_message(self, screen):
-        """Draw the winner message above the board."""
-        if self.game.winner is not None:
-            # Background for the message - place it above the board
-            pygame.draw.rect(
+        # Draw the preview piece at the top
+        if col is not None:
+            x = col * self.SQUARE_SIZE + self.SQUARE_SIZE // 2
+            y = self.SQUARE_SIZE // 2
+
+            pygame.draw.circle(
                 screen,
-                (200, 200, 200),
-                (0, 0, self.WIDTH, self.SQUARE_SIZE),
-                border_radius=0
+                self.RED,
+                (x, y),
+                self.SQUARE_SIZE // 2 - 5
             )
-            
-            # Winner message
-            if self.game.winner == 0:
-                text = self.font.render("Game Over: Draw!", True, self.BLACK)
-            elif self.game.winner == 1:
-                if self.game.battle_mode:
-                    text = self.font.render(f"Game Over: {self.game.first_ai.capitalize()} Wins!", True, self.RED)
-                else:
-                    text = self.font.render("Game Over: You Win!", True, self.RED)
+
+    def hint_texts(self):
+        """(column, text, color) for every column score of the hint analysis."""
+        hints = self.game.hints()
+        if not hints:
+            return ()
+        _, scores = hints
+        best = max(scores.values())
+        texts = []
+        for col, score in sorted(scores.items()):
+            if score >= 1000000:
+                text = "WIN"
+            elif score <= -1000000:
+                text = "LOSS"
             else:
-                if self.game.battle_mode:
-                    text = self.font.render(f"Game Over: {self.game.second_ai.capitalize()} Wins!", True, self.YELLOW)
-                else:
-                    text = self.font.render(f"Game Over: {self.game.ai_type.capitalize()} Wins!", True, self.YELLOW)
-            
+                text = f"{int(score):+d}"
+            texts.append((col, text, self.WHITE if score == best else self.GREY))
+        return tuple(texts)
+
+    def draw_hints(self, screen):
+        """Draw each column's score along the bottom of the top bar."""
+        for col, text, color in self.hint_texts():
+            surface = self.render_text(self.small_font, text, color)
+            rect = surface.get_rect(midbottom=(col * self.SQUARE_SIZE + self.SQUARE_SIZE // 2,
+                                               self.SQUARE_SIZE - 2))
+            screen.blit(surface, rect)
+
+    def winner_text(self):
+        """(text, color) of the game-over message, or None."""
+        if self.game.winner is None:
+            return None
+        if self.game.winner == 0:
+            return "Game Over: Draw!", self.BLACK
+        if self.game.winner == 1:
+            if self.game.battle_mode:
+                return f"Game Over: {self.game.first_ai.capitalize()} Wins!", self.RED
+            return "Game Over: You Win!", self.RED
+        if self.game.battle_mode:
+            return f"Game Over: {self.game.second_ai.capitalize()} Wins!", self.YELLOW
+        return f"Game Over: {self.game.ai_type.capitalize()} Wins!", self.YELLOW
+
+    def draw_winner_message(self, screen):
+        """Draw the winner message above the board."""
+        message = self.winner_text()
+        if message is not None:
+            # Background for the message - place it above the board
+            pygame.draw.rect(screen, self.GREY, self.top_rect, border_radius=0)
+
             # Center the text horizontally, position it higher in the top bar
+            text = self.render_text(self.font, *message)
             text_rect = text.get_rect(
                 center=(self.WIDTH // 2, self.SQUARE_SIZE // 3)
             )
             screen.blit(text, text_rect)
-            
-            # Restart instruction - center below the winner message
-            restart_text = self.font.render("Press 'R' to Restart", True, self.BLACK)
+
+            # Review line, or the restart instruction, centred below the winner message
+            restart_text = self.render_text(self.font, *(self.review_text() or ("Press 'R' to Restart", self.BLACK)))
             restart_rect = restart_text.get_rect(
                 center=(self.WIDTH // 2, self.SQUARE_SIZE * 2 // 3)
             )
             screen.blit(restart_text, restart_rect)
-        
+
+    def review_text(self):
+        """(text, color) describing the reviewed position of a finished game, or None."""
+        info = self.game.review_info()
+        if info is None:
+            return None
+        ply, total, entry, (analysed, _) = info
+        if ply == total:
+            return "'R' Restart, Left/Right Review", self.BLACK
+        if entry is None:
+            return f"Move {ply + 1}/{total}: analysing {analysed}/{total}", self.BLACK
+        text = f"Move {ply + 1}/{total}: {entry['played'] + 1}"
+        if entry["best"] != entry["played"]:
+            text += f", best {entry['best'] + 1}"
+        if entry["flag"]:
+            text += f" ({entry['flag']})"
+        return text, self.RED if entry["flag"] in ("blunder", "mistake") else self.BLACK
+
+    def turn_text(self):
+        """(text, color) of the turn indicator, or None once the game is over."""
+        if self.game.winner is not None:
+            return None
+        if self.game.battle_mode:
+            # AI vs AI mode
+            current_ai = self.game.first_ai if self.game.current_player == 1 else self.game.second_ai
+            return (f"{current_ai.capitalize()} AI is thinking...",
+                    self.RED if self.game.current_player == 1 else self.YELLOW)
+        if self.game.current_player == self.game.HUMAN_PLAYER:
+            return "Your Turn", self.RED
+        ai_type = self.game.ai_type.capitalize()
+        if self.game.ai_thinking:
+            return f"{ai_type} AI is thinking...", self.YELLOW
+        return f"{ai_type} AI's Turn", self.YELLOW
+
     def draw_turn_indicator(self, screen):
         """Draw an indicator of whose turn it is."""
-        if self.game.winner is None:
-            if self.game.battle_mode:
-                # AI vs AI mode
-                current_ai = self.game.first_ai if self.game.current_player == 1 else self.game.second_ai
-                text = self.font.render(f"{current_ai.capitalize()} AI is thinking...", True, 
-                                        self.RED if self.game.current_player == 1 else self.YELLOW)
-            elif self.game.current_player == self.game.HUMAN_PLAYER:
-                text = self.font.render("Your Turn", True, self.RED)
-            else:
-                ai_type = self.game.ai_type.capitalize()
-                if self.game.ai_thinking:
-                    text = self.font.render(f"{ai_type} AI is thinking...", True, self.YELLOW)
-                else:
-                    text = self.font.render(f"{ai_type} AI's Turn", True, self.YELLOW)
-            
-            screen.blit(text, (10, 10))
-    
-    def draw_winning_line(self, screen):
-        """Draw a line connecting the winning pieces."""
+        message = self.turn_text()
+        if message is not None:
+            screen.blit(self.render_text(self.font, *message), (10, 10))
+
+    def winning_line(self):
+        """Screen endpoints of the line through the winning pieces, or None."""
+        if self.game.review_ply is not None:
+            return None  # Reviewing an earlier position
         if self.game.winner is not None and self.game.winner > 0:  # Don't draw for draws
             # Get the winning pieces
             winning_pieces = self.game.board.winning_pieces
-            
-            if winning_pieces and len(winning_pieces) >= 4:
-                # Sort pieces to ensure consistent line direction
-                winning_pieces.sort()
-                
+
+            if winning_pieces and len(winning_pieces) >= self.game.board.connect:
+                # Sort pieces so the line runs between the two ends of the run
+                pieces = sorted(winning_pieces)
+                pieces = [pieces[0], pieces[-1]]
+
                 # Convert board coordinates to screen coordinates
                 screen_coords = []
-                for row, col in winning_pieces[:4]:  # Just use the first 4 winning pieces
+                for row, col in pieces:
                     x = col * self.SQUARE_SIZE + self.SQUARE_SIZE // 2
                     y = (row + 1) * self.SQUARE_SIZE + self.SQUARE_SIZE // 2
                     screen_coords.append((x, y))
-                
-                # Draw a thick black line connecting the centers of the pieces
-                if len(screen_coords) >= 2:
-                    pygame.draw.line(
-                        screen,
-                        self.BLACK,
-                        screen_coords[0],
-                        screen_coords[3],
-                        width=5
-                    )
-    def draw(self, screen):
-        """Draw the complete game UI."""
-        # Fill background
-        screen.fill(self.BLACK)
-        
-        # Draw the board
-        self.draw_board(screen)
-        
-        # Draw piece preview
+                return screen_coords[0], screen_coords[1]
+        return None
+
+    def draw_winning_line(self, screen):
+        """Draw a line connecting the winning pieces."""
+        if self.shown_line is not None:
+            # Draw a thick black line connecting the centers of the pieces
+            pygame.draw.line(
+                screen,
+                self.BLACK,
+                self.shown_line[0],
+                self.shown_line[1],
+                width=5
+            )
+
+    def update_stats_overlay(self):
+        """Rebuild the cached stats panel when the stats or its visibility change."""
+        stats = self.game.last_stats
+        if not self.game.show_stats or stats is None:
+            self.overlay_surface = None
+            self.overlay_rect = None
+            return
+
+        lines = stats.summary_lines()
+        if stats.profile:
+            lines += [f"{share:4.0%} {name}" for name, share in stats.profile[:3]]
+
+        line_height = self.small_font.get_linesize()
+        width = max(self.small_font.size(line)[0] for line in lines) + 10
+        height = line_height * len(lines) + 10
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 180))
+        for i, line in enumerate(lines):
+            panel.blit(self.small_font.render(line, True, self.WHITE), (5, 5 + i * line_height))
+        self.overlay_surface = panel
+        self.overlay_rect = panel.get_rect(bottomleft=(0, self.HEIGHT))
+
+    def draw_top_bar(self, screen):
+        """Draw the area above the board: preview piece, hints, turn indicator or winner message."""
+        screen.fill(self.BLACK, self.top_rect)
         self.draw_piece_preview(screen)
-        
-        # Draw winning line (add this line)
-        self.draw_winning_line(screen)
-        
-        # Draw turn indicator
+        self.draw_hints(screen)
         self.draw_turn_indicator(screen)
-        
-        # Draw winner message if game is over
-        self.draw_winner_message(screen)
\ No newline at end of file
+        self.draw_winner_message(screen)
+
+    def draw(self, screen):
+        """
+        Draw whatever changed since the last frame.
+
+        Returns:
+            dirty: List of screen rects that were redrawn (empty when the
+                frame can be skipped); pass it to pygame.display.update
+        """
+        dirty = []
+        full = screen is not self.shown_screen
+        self.shown_screen = screen
+
+        # Top bar: preview, hints, turn indicator and winner message
+        top = (self.preview_column(), self.hint_texts(), self.turn_text(), self.winner_text(), self.review_text())
+        if full or top != self.shown_top:
+            self.shown_top = top
+            self.draw_top_bar(screen)
+            dirty.append(self.top_rect)
+
+        # Board: changed cells, hover highlight, winning line and stats overlay
+        columns = self.update_board_layer()
+
+        hover = self.hover_column()
+        if hover != self.shown_hover:
+            columns.update(col for col in (hover, self.shown_hover) if col is not None)
+            self.shown_hover = hover
+
+        board_rects = [self._column_rect(col) for col in sorted(columns)]
+
+        line = self.winning_line()
+        if line != self.shown_line:
+            self.shown_line = line
+            full = True
+
+        stats = self.game.last_stats
+        overlay = (self.game.show_stats, id(stats))
+        if overlay != self.shown_overlay:
+            self.shown_overlay = overlay
+            if self.overlay_rect is not None:
+                board_rects.append(self.overlay_rect)
+            self.update_stats_overlay()
+            if self.overlay_rect is not None:
+                board_rects.append(self.overlay_rect)
+
+        if full:
+            board_rects = [self.board_rect]
+        for rect in board_rects:
+            self.draw_board(screen, rect)
+
+        return dirty + board_rects
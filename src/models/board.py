@@ -1,14 +1,145 @@
 import numpy as np
 
+# (row, col) steps of the four line directions: horizontal, vertical and
+# the two diagonals
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+# Geometry per (rows, cols, connect), built once
+_geometries = {}
+
+
+class Geometry:
+    """
+    Tables shared by every board of one size and line length.
+
+    Bitboards hold one bit per cell, column-major, with a spare bit on top
+    of each column so lines cannot wrap between columns. Python integers
+    grow as needed, so boards over 64 bits (e.g. 10x8) simply use wider
+    keys; the transposition table folds those back to 64 bits.
+    """
+
+    def __init__(self, rows, cols, connect):
+        """Build the tables for a rows x cols board where `connect` in a row wins."""
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        self.height = rows + 1
+        self.key_bits = cols * self.height
+        self.wide = self.key_bits > 64
+
+        # Bit distance between neighbours along each direction
+        self.shifts = (self.height, 1, self.height + 1, self.height - 1)
+
+        # Bottom cell of every column, every cell, and the cells on odd rows
+        # counted from the bottom (1st, 3rd, ...)
+        self.bottom = sum(1 << (col * self.height) for col in range(cols))
+        self.full = self.bottom * ((1 << rows) - 1)
+        self.odd_rows = self.bottom * sum(1 << row for row in range(0, rows, 2))
+
+        # Every window of `connect` cells on a line, as flat cell indices
+        windows = []
+        for dr, dc in DIRECTIONS:
+            for r in range(rows):
+                for c in range(cols):
+                    end_r, end_c = r + dr * (connect - 1), c + dc * (connect - 1)
+                    if 0 <= end_r < rows and 0 <= end_c < cols:
+                        windows.append([(r + dr * i) * cols + c + dc * i for i in range(connect)])
+        self.windows = np.array(windows, dtype=np.intp).reshape(-1, connect)
+
+        # Window contents encode as base-3 numbers: sum(cell * 3**i)
+        self.powers = 3 ** np.arange(connect)
+
+    def has_line(self, bits):
+        """True if the bitboard `bits` contains `connect` set bits in a row."""
+        for shift in self.shifts:
+            line = bits
+            for i in range(1, self.connect):
+                line &= bits >> (i * shift)
+                if not line:
+                    break
+            if line:
+                return True
+        return False
+
+
+def get_geometry(rows=6, cols=7, connect=4):
+    """Return the cached Geometry for a board shape."""
+    key = (rows, cols, connect)
+    geometry = _geometries.get(key)
+    if geometry is None:
+        if connect < 2 or connect > max(rows, cols):
+            raise ValueError(f"Cannot connect {connect} on a {rows}x{cols} board")
+        geometry = Geometry(rows, cols, connect)
+        _geometries[key] = geometry
+    return geometry
+
+
 class Board:
     """Connect Four game board representation."""
     
-    def __init__(self, rows=6, cols=7):
-        """Initialize an empty board."""
+    def __init__(self, rows=6, cols=7, connect=4):
+        """Initialize an empty board where `connect` pieces in a row win."""
         self.rows = rows
         self.cols = cols
+        self.connect = connect
+        self.geometry = get_geometry(rows, cols, connect)
         self.board = np.zeros((rows, cols), dtype=int)
         self.last_move = None
+        
+        # Bitboards kept alongside the array for hashing and win checks:
+        # one bit per cell, column-major with one spare bit on top of each column
+        self.mask = 0       # occupied cells
+        self.p1_bits = 0    # cells held by player 1
+    
+    def __deepcopy__(self, memo):
+        """Copy the position; the geometry tables are shared, not copied."""
+        board = self.__class__.__new__(self.__class__)
+        board.__dict__.update(self.__dict__)
+        board.board = self.board.copy()
+        if 'winning_pieces' in self.__dict__:
+            board.winning_pieces = list(self.winning_pieces)
+        return board
+    
+    @classmethod
+    def from_moves(cls, moves, rows=6, cols=7, connect=4):
+        """
+        Build a board by replaying a move sequence, player 1 first.
+        
+        Args:
+            moves: String of 1-based column digits (e.g. "4453"), the usual
+                Connect Four position notation
+            rows, cols: Board size
+            connect: Pieces in a row needed to win
+            
+        Returns:
+            board: The resulting board
+        """
+        board = cls(rows, cols, connect)
+        player = 1
+        for i, char in enumerate(moves):
+            col = int(char) - 1
+            if not board.drop_piece(col, player):
+                raise ValueError(f"Illegal move {char} at ply {i + 1} in '{moves}'")
+            if i + 1 < len(moves) and (board.is_winner(player) or board.is_full()):
+                raise ValueError(f"Game already over at ply {i + 1} in '{moves}'")
+            player = 3 - player
+        return board
+    
+    def key(self):
+        """
+        Unique integer key of the position.
+        
+        mask + p1_bits stays within each column's bits (thanks to the spare
+        bit on top) and differs for every (mask, p1_bits) pair, so no two
+        positions share a key.
+        """
+        return self.mask + self.p1_bits
+    
+    def next_player(self):
+        """Return the player to move, assuming player 1 moved first."""
+        ones = int((self.board == 1).sum())
+        twos = int((self.board == 2).sum())
+        return 1 if ones == twos else 2
     
     def get_cell(self, row, col):
         """Get the value at a specific cell."""
@@ -35,6 +166,10 @@ class Board:
             if self.board[row][col] == 0:
                 self.board[row][col] = player
                 self.last_move = (row, col)
+                bit = 1 << (col * self.geometry.height + self.rows - 1 - row)
+                self.mask |= bit
+                if player == 1:
+                    self.p1_bits |= bit
                 return True
         
         return False
@@ -64,84 +199,24 @@ class Board:
         """
         # Store winning coordinates
         self.winning_pieces = []
+        if self.board[row][col] != player:
+            return False
         
-        # Check horizontal
-        count = 0
-        start_col = max(0, col - 3)
-        end_col = min(self.cols - 1, col + 3)
-        
-        for c in range(start_col, end_col + 1):
-            if self.board[row][c] == player:
-                count += 1
-                self.winning_pieces.append((row, c))
-                if count >= 4:
-                    return True
-            else:
-                count = 0
-                self.winning_pieces = []
-        
-        # Check vertical
-        count = 0
-        self.winning_pieces = []
-        start_row = max(0, row - 3)
-        end_row = min(self.rows - 1, row + 3)
-        
-        for r in range(start_row, end_row + 1):
-            if self.board[r][col] == player:
-                count += 1
-                self.winning_pieces.append((r, col))
-                if count >= 4:
-                    return True
-            else:
-                count = 0
-                self.winning_pieces = []
-        
-        # Check diagonal /
-        count = 0
-        self.winning_pieces = []
-        # Find the top-left starting point of the diagonal
-        r, c = row, col
-        while r < self.rows - 1 and c > 0 and count < 3:
-            r += 1
-            c -= 1
-        
-        # Check the diagonal
-        while r >= 0 and c < self.cols:
-            if self.board[r][c] == player:
-                count += 1
-                self.winning_pieces.append((r, c))
-                if count >= 4:
-                    return True
-            else:
-                count = 0
-                self.winning_pieces = []
-            r -= 1
-            c += 1
-        
-        # Check diagonal \
-        count = 0
-        self.winning_pieces = []
-        # Find the top-right starting point of the diagonal
-        r, c = row, col
-        while r < self.rows - 1 and c < self.cols - 1 and count < 3:
-            r += 1
-            c += 1
-        
-        # Check the diagonal
-        while r >= 0 and c >= 0:
-            if self.board[r][c] == player:
-                count += 1
-                self.winning_pieces.append((r, c))
-                if count >= 4:
-                    return True
-            else:
-                count = 0
-                self.winning_pieces = []
-            r -= 1
-            c -= 1
+        # Walk both ways along each direction from the last move
+        for dr, dc in DIRECTIONS:
+            run = [(row, col)]
+            for sign in (1, -1):
+                r, c = row + sign * dr, col + sign * dc
+                while 0 <= r < self.rows and 0 <= c < self.cols and self.board[r][c] == player:
+                    run.append((r, c))
+                    r += sign * dr
+                    c += sign * dc
+            if len(run) >= self.connect:
+                self.winning_pieces = sorted(run)
+                return True
         
-        self.winning_pieces = []
         return False
+    
     def is_winner(self, player):
         """
         Check if the player has won the game.
@@ -155,6 +230,12 @@ class Board:
         if self.last_move is None:
             return False
         
+        # Bitboard test first; the slower scan only runs to find the pieces
+        bits = self.p1_bits if player == 1 else self.mask ^ self.p1_bits
+        if not self.geometry.has_line(bits):
+            self.winning_pieces = []
+            return False
+        
         row, col = self.last_move
         return self.check_win(row, col, player)
     
@@ -0,0 +1,291 @@
+import argparse
+import copy
+import os
+import sys
+import threading
+import time
+
+from src.models.board import Board
+from src.ai import minimax as minimax_module
+from src.ai.engines import engine_config, parse_engine_spec, select_move, BUDGET_KEYS
+from src.ai.stats import SearchStats
+
+ENGINE_NAME = "Connect4"
+
+# MCTS reports progress after every batch of this many iterations
+MCTS_INFO_INTERVAL = 500
+
+
+def parse_go(tokens, defaults):
+    """
+    Parse the arguments of a `go` command.
+
+    Args:
+        tokens: Words after `go`, e.g. ['depth', '6', 'time', '2.5']
+        defaults: Engine configuration supplying the budget when no limit is given
+
+    Returns:
+        limits: Dict with depth, max_time, nodes and iterations (None when unset)
+    """
+    limits = {"depth": None, "max_time": None, "nodes": None, "iterations": None}
+    keys = {"depth": ("depth", int), "time": ("max_time", float),
+            "nodes": ("nodes", int), "iterations": ("iterations", int)}
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == "infinite":
+            i += 1
+            continue
+        if tokens[i] not in keys or i + 1 >= len(tokens):
+            raise ValueError(f"bad go argument '{tokens[i]}'")
+        key, cast = keys[tokens[i]]
+        limits[key] = cast(tokens[i + 1])
+        i += 2
+
+    if "infinite" not in tokens and all(value is None for value in limits.values()):
+        limits["depth"] = defaults.get("depth")
+        limits["iterations"] = defaults.get("iterations")
+        limits["max_time"] = defaults.get("max_time")
+        limits["nodes"] = defaults.get("nodes")
+    return limits
+
+
+def format_moves(moves):
+    """Columns (0-based) as protocol move digits (1-based)."""
+    return " ".join(str(col + 1) for col in moves)
+
+
+class EngineSession:
+    """
+    One engine speaking the text protocol.
+
+    Commands (one per line):
+        c4i                        -> id lines, then c4iok
+        isready                    -> readyok
+        setoption engine <spec>    -> minimax or mcts, optionally with
+                                      engine-spec options such as
+                                      minimax:tt=<name>,weights=<file>,cache=auto
+        setoption difficulty <lvl> -> default budget when go has no limits
+        newgame                    -> clear per-game state
+        position startpos [moves <digits>]
+        position <digits>          -> 1-based columns, player 1 first
+        go [depth N] [time S] [nodes N] [iterations N] [infinite]
+        stop                       -> finish the running search now
+        quit
+
+    While searching the engine prints
+        info depth D score S nodes N time MS pv C C ...      (minimax)
+        info iterations N nodes T score W time MS pv C ...   (mcts, W = win rate)
+    and finally `bestmove C`.
+    """
+
+    def __init__(self, out=None):
+        """Initialize the session writing to `out` (default: stdout)."""
+        self.out = out or sys.stdout
+        self.out_lock = threading.Lock()
+        self.engine = "minimax"
+        self.options = {}
+        self.difficulty = "medium"
+        self.board = Board()
+        self.player = 1
+        self.search_thread = None
+        self.limit = None
+
+    def send(self, line):
+        """Write one protocol line."""
+        with self.out_lock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def handle(self, line):
+        """
+        Execute one command line.
+
+        Returns:
+            running: False once `quit` was received
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+
+        try:
+            if command == "c4i":
+                self.send(f"id name {ENGINE_NAME}")
+                self.send("option engine minimax mcts")
+                self.send("option difficulty easy medium hard expert")
+                self.send("c4iok")
+            elif command == "isready":
+                self.wait()
+                self.send("readyok")
+            elif command == "setoption":
+                self.set_option(args)
+            elif command == "newgame":
+                self.wait()
+                minimax_module.reset_history_scores()
+                self.set_position(["startpos"])
+            elif command == "position":
+                self.wait()
+                self.set_position(args)
+            elif command == "go":
+                self.wait()
+                self.go(args)
+            elif command == "stop":
+                self.stop()
+            elif command == "quit":
+                self.stop()
+                return False
+            else:
+                self.send(f"error unknown command '{command}'")
+        except ValueError as e:
+            self.send(f"error {e}")
+        return True
+
+    def set_option(self, args):
+        """Handle `setoption <name> <value>`."""
+        if len(args) != 2:
+            raise ValueError("usage: setoption <name> <value>")
+        name, value = args
+        if name == "engine":
+            self.set_engine(value)
+        elif name == "difficulty":
+            self.difficulty = value
+        else:
+            raise ValueError(f"unknown option '{name}'")
+
+    def set_engine(self, spec):
+        """
+        Choose the engine from a spec such as 'mcts' or 'minimax:weights=w.json,cache=auto'.
+
+        The spec's options (tt, weights, tb, cache, selective search) apply
+        to every search; its budget keys are ignored, since `go` and the
+        difficulty set the budget.
+        """
+        config = parse_engine_spec(spec)  # raises ValueError for unknown engines and keys
+        self.engine = config["engine"]
+        self.options = {key: value for key, value in config.items() if key != "engine" and key not in BUDGET_KEYS}
+
+    def search_config(self, limits):
+        """Engine configuration of one `go`: the session's engine and options with the go limits as budget."""
+        config = dict(self.options, engine=self.engine)
+        config.update((key, value) for key, value in limits.items() if value is not None)
+        if self.engine == "mcts":
+            # MCTS counts iterations rather than nodes, and has no depth
+            nodes = config.pop("nodes", None)
+            if nodes is not None:
+                config.setdefault("iterations", nodes)
+            if config.pop("depth", None) is not None and "iterations" not in config and "max_time" not in config:
+                config["iterations"] = engine_config("mcts", self.difficulty)["iterations"]
+                self.send(f"info string mcts has no depth; searching {config['iterations']} iterations")
+            config.setdefault("iterations", float('inf'))  # until stopped or out of time
+        return config
+
+    def set_position(self, args):
+        """Handle `position startpos [moves ...]` or `position <digits>`."""
+        moves = ""
+        if args and args[0] == "startpos":
+            args = args[1:]
+        if args and args[0] == "moves":
+            args = args[1:]
+        moves = "".join(args)
+        self.board = Board.from_moves(moves)
+        self.player = self.board.next_player()
+
+    def go(self, args):
+        """Start a search in the background with the given limits."""
+        if not self.board.get_valid_moves() or self.board.is_winner(3 - self.player):
+            self.send("bestmove none")
+            return
+        limits = parse_go(args, engine_config(self.engine, self.difficulty))
+        config = self.search_config(limits)
+        self.limit = threading.Event()
+        self.search_thread = threading.Thread(target=self._search, args=(copy.deepcopy(self.board), config),
+                                              name="search", daemon=True)
+        self.search_thread.start()
+
+    def stop(self):
+        """Stop the running search; it still reports its best move."""
+        if self.limit is not None:
+            self.limit.set()
+        self.wait()
+
+    def wait(self):
+        """Block until the running search (if any) has printed its bestmove."""
+        if self.search_thread is not None:
+            self.search_thread.join()
+            self.search_thread = None
+
+    def _send_bestmove(self, col):
+        """Report the search result; `none` when the search failed."""
+        self.send(f"bestmove {col + 1}" if col is not None else "bestmove none")
+
+    def _search(self, board, config):
+        """Run select_move with an info line per completed depth (minimax) or iteration batch (MCTS)."""
+        col = None
+        stats = SearchStats(config["engine"])
+        start = time.perf_counter()
+        try:
+            if config["engine"] == "minimax":
+                callback = lambda depth, score, _: self._minimax_info(depth, score, stats, start)
+            else:
+                reported = [0]
+                callback = lambda root, _: self._mcts_batch(root, stats, start, reported)
+            col = select_move(board, self.player, config, save_history=False, stats=stats, stop_event=self.limit,
+                              callback=callback)
+        except Exception as e:
+            # The client waits for a bestmove, so a failed search still sends one
+            col = None
+            self.send(f"info string search failed: {e!r}")
+        finally:
+            self._send_bestmove(col)
+
+    def _minimax_info(self, depth, score, stats, start):
+        """Print a completed depth; a proven result ends the search, since deeper search cannot change it."""
+        elapsed = int((time.perf_counter() - start) * 1000)
+        self.send(f"info depth {depth} score {score} nodes {stats.nodes} time {elapsed} pv {format_moves(stats.pv)}")
+        return abs(score) >= 1000000
+
+    def _mcts_batch(self, root, stats, start, reported):
+        """MCTS callback: print progress once every MCTS_INFO_INTERVAL iterations."""
+        if root.visits - reported[0] >= MCTS_INFO_INTERVAL:
+            reported[0] = root.visits
+            self._mcts_info(root, stats, start)
+        return False
+
+    def _mcts_info(self, root, stats, start):
+        """Print the principal variation by visit count."""
+        pv = []
+        node = root
+        while node.children:
+            move, node = max(node.children.items(), key=lambda item: item[1].visits)
+            pv.append(move)
+        score = 0.0
+        if root.children:
+            best = root.children[pv[0]]
+            score = 1 - best.wins / best.visits
+        elapsed = int((time.perf_counter() - start) * 1000)
+        self.send(f"info iterations {root.visits} nodes {stats.iterations} score {score:.3f} "
+                  f"time {elapsed} pv {format_moves(pv)}")
+
+
+def main(argv=None):
+    """Run an engine session on stdin/stdout."""
+    parser = argparse.ArgumentParser(description="Connect Four engine speaking a text protocol on stdin/stdout.")
+    parser.add_argument("--engine", default="minimax",
+                        help="initial engine spec, e.g. mcts or minimax:weights=w.json,cache=auto")
+    parser.add_argument("--difficulty", default="medium", help="initial difficulty")
+    parser.add_argument("--cpu", type=int, nargs="+", help="pin the process to these CPU cores")
+    args = parser.parse_args(argv)
+
+    if args.cpu and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, set(args.cpu))
+
+    session = EngineSession()
+    try:
+        session.set_engine(args.engine)
+    except ValueError as e:
+        parser.error(str(e))
+    session.difficulty = args.difficulty
+    for line in sys.stdin:
+        if not session.handle(line):
+            break
+    session.wait()
@@ -0,0 +1,318 @@
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+# Default record file written by Game
+RECORD_PATH = 'data/games.c4r'
+
+# Results, from the point of view of move order
+RESULT_DRAW = 0
+RESULT_FIRST = 1     # the player who moved first won
+RESULT_SECOND = 2    # the player who moved second won
+RESULT_UNKNOWN = 255
+
+_DATA_MAGIC = b"C4RECv2\0"
+_INDEX_MAGIC = b"C4IDXv2\0"
+
+# Files written before records had a connect length; read as connect 4 and
+# rewritten in the current format before anything is appended to them
+_DATA_MAGIC_V1 = b"C4RECv1\0"
+_INDEX_MAGIC_V1 = b"C4IDXv1\0"
+
+# Per record: total length, rows, cols, connect, result, move count, engine label lengths
+_RECORD_HEADER = struct.Struct("<IBBBBHHH")
+_RECORD_HEADER_V1 = struct.Struct("<IBBBHHH")
+
+# One index entry per record, so records can be filtered without reading them
+INDEX_DTYPE = np.dtype([
+    ("offset", "<u8"),   # byte offset of the record in the data file
+    ("moves", "<u2"),
+    ("result", "u1"),
+    ("rows", "u1"),
+    ("cols", "u1"),
+    ("connect", "u1"),   # 0 in version 1 indexes
+    ("pad", "u1", (2,)),
+])
+
+
+def pack_moves(moves):
+    """
+    Pack columns (0-15) two per byte, first move in the low nibble.
+
+    Args:
+        moves: Sequence of 0-based columns
+
+    Returns:
+        data: bytes of length ceil(len(moves) / 2)
+    """
+    columns = np.asarray(moves, dtype=np.uint8)
+    if len(columns) % 2:
+        columns = np.append(columns, np.uint8(0))
+    return (columns[0::2] | (columns[1::2] << 4)).astype(np.uint8).tobytes()
+
+
+def unpack_moves(data, count):
+    """Inverse of pack_moves: return the first `count` columns as a list."""
+    packed = np.frombuffer(data, dtype=np.uint8)
+    columns = np.empty(len(packed) * 2, dtype=np.uint8)
+    columns[0::2] = packed & 0x0F
+    columns[1::2] = packed >> 4
+    return columns[:count].tolist()
+
+
+def _index_path(path):
+    """Path of the offset index belonging to a record file."""
+    return path + ".idx"
+
+
+class GameRecord:
+    """One recorded game."""
+
+    def __init__(self, moves, result=RESULT_UNKNOWN, engines=(None, None), times=None, scores=None,
+                 rows=6, cols=7, connect=4):
+        """
+        Initialize the record.
+
+        Args:
+            moves: 0-based columns in move order
+            result: RESULT_DRAW, RESULT_FIRST, RESULT_SECOND or RESULT_UNKNOWN
+            engines: Engine configuration of the first and second player
+                (None for a human)
+            times: Seconds spent on each move (default: zeros)
+            scores: Search score of each move, NaN where there is none
+            rows, cols, connect: Board shape the game was played on
+        """
+        self.moves = list(moves)
+        self.result = result
+        self.engines = tuple(engines)
+        n = len(self.moves)
+        self.times = np.zeros(n, dtype=np.float32) if times is None else np.asarray(times, dtype=np.float32)
+        self.scores = (np.full(n, np.nan, dtype=np.float32) if scores is None
+                       else np.asarray([np.nan if s is None else s for s in scores], dtype=np.float32))
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+
+    def move_string(self):
+        """Moves as 1-based column digits, as used by Board.from_moves."""
+        return "".join(str(col + 1) for col in self.moves)
+
+    def to_dict(self):
+        """Return the record as a JSON-serialisable dict."""
+        return {
+            "moves": self.move_string(),
+            "result": self.result,
+            "engines": list(self.engines),
+            "times": [round(float(t), 4) for t in self.times],
+            "scores": [None if np.isnan(s) else float(s) for s in self.scores],
+            "rows": self.rows,
+            "cols": self.cols,
+            "connect": self.connect,
+        }
+
+    def pack(self):
+        """Serialise the record (header, engine labels, nibble moves, times, scores)."""
+        labels = [b"" if engine is None else json.dumps(engine, sort_keys=True).encode() for engine in self.engines]
+        n = len(self.moves)
+        body = (labels[0] + labels[1] + pack_moves(self.moves)
+                + self.times.astype("<f4").tobytes() + self.scores.astype("<f4").tobytes())
+        header = _RECORD_HEADER.pack(_RECORD_HEADER.size + len(body), self.rows, self.cols, self.connect,
+                                     self.result, n, len(labels[0]), len(labels[1]))
+        return header + body
+
+    @classmethod
+    def unpack(cls, buffer, offset=0, version=2):
+        """Read the record stored at `offset` in `buffer`, written in file format `version`."""
+        if version == 1:
+            _, rows, cols, result, n, len_a, len_b = _RECORD_HEADER_V1.unpack_from(buffer, offset)
+            connect = 4
+            pos = offset + _RECORD_HEADER_V1.size
+        else:
+            _, rows, cols, connect, result, n, len_a, len_b = _RECORD_HEADER.unpack_from(buffer, offset)
+            pos = offset + _RECORD_HEADER.size
+        engines = []
+        for length in (len_a, len_b):
+            engines.append(json.loads(bytes(buffer[pos:pos + length])) if length else None)
+            pos += length
+        moves = unpack_moves(buffer[pos:pos + (n + 1) // 2], n)
+        pos += (n + 1) // 2
+        times = np.frombuffer(buffer, dtype="<f4", count=n, offset=pos).copy()
+        scores = np.frombuffer(buffer, dtype="<f4", count=n, offset=pos + 4 * n).copy()
+        return cls(moves, result, engines, times, scores, rows, cols, connect)
+
+
+def _upgrade(path):
+    """Rewrite a version 1 record file and its index in the current format."""
+    with RecordReader(path) as reader, RecordWriter(path + ".tmp") as writer:
+        for record in reader:
+            writer.write(record)
+    os.replace(path + ".tmp", path)
+    os.replace(_index_path(path + ".tmp"), _index_path(path))
+
+
+class RecordWriter:
+    """
+    Append-only writer for a game-record file and its offset index.
+
+    Records are collected in memory and written in blocks of about
+    `buffer_size` bytes. The data block is always written before the index
+    entries that point into it, so a crash never leaves the index pointing
+    past the data.
+    """
+
+    def __init__(self, path=RECORD_PATH, buffer_size=1 << 20):
+        """
+        Open (or create) the record file at `path` and its index at `path`.idx.
+
+        A file in the version 1 format is rewritten in the current one first.
+
+        Args:
+            path: Data file path
+            buffer_size: Bytes buffered before a write to disk
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                version_1 = f.read(len(_DATA_MAGIC_V1)) == _DATA_MAGIC_V1
+            if version_1:
+                _upgrade(path)
+        self.path = path
+        self.buffer_size = buffer_size
+        self.data = open(path, "ab")
+        self.index = open(_index_path(path), "ab")
+        if self.data.tell() == 0:
+            self.data.write(_DATA_MAGIC)
+        if self.index.tell() == 0:
+            self.index.write(_INDEX_MAGIC)
+        self.offset = self.data.tell()
+        self.pending = bytearray()
+        self.pending_index = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, record):
+        """Append a GameRecord."""
+        data = record.pack()
+        self.pending_index.append((self.offset + len(self.pending), len(record.moves), record.result,
+                                   record.rows, record.cols, record.connect, (0, 0)))
+        self.pending += data
+        if len(self.pending) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered records to disk."""
+        if not self.pending_index:
+            return
+        self.data.write(self.pending)
+        self.data.flush()
+        self.index.write(np.array(self.pending_index, dtype=INDEX_DTYPE).tobytes())
+        self.index.flush()
+        self.offset += len(self.pending)
+        self.pending = bytearray()
+        self.pending_index = []
+
+    def close(self):
+        """Flush and close both files."""
+        if self.data.closed:
+            return
+        self.flush()
+        self.data.close()
+        self.index.close()
+
+
+class RecordReader:
+    """
+    Random access to a game-record file through its memory-mapped index.
+
+    Records are decoded only when accessed; filtering on result, length and
+    board shape reads the index alone. Version 1 files are read as connect 4.
+    """
+
+    def __init__(self, path=RECORD_PATH):
+        """Map the record file at `path` and its index."""
+        self.path = path
+        with open(path, "rb") as f:
+            magic = f.read(len(_DATA_MAGIC))
+            if magic not in (_DATA_MAGIC, _DATA_MAGIC_V1):
+                raise ValueError(f"{path} is not a game-record file")
+            self.version = 1 if magic == _DATA_MAGIC_V1 else 2
+            self.size = os.fstat(f.fileno()).st_size
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        index_path = _index_path(path)
+        with open(index_path, "rb") as f:
+            if f.read(len(_INDEX_MAGIC)) != (_INDEX_MAGIC_V1 if self.version == 1 else _INDEX_MAGIC):
+                raise ValueError(f"{index_path} is not a game-record index")
+        count = (os.path.getsize(index_path) - len(_INDEX_MAGIC)) // INDEX_DTYPE.itemsize
+        if count:
+            self.index = np.memmap(index_path, dtype=INDEX_DTYPE, mode="r", offset=len(_INDEX_MAGIC),
+                                   shape=(count,))
+            # Offsets only grow; drop any entry pointing past the data
+            # (slicing keeps the index memory-mapped)
+            self.index = self.index[:int(np.searchsorted(self.index["offset"], self.size))]
+            if self.version == 1:
+                self.index = np.array(self.index)
+                self.index["connect"] = 4
+        else:
+            self.index = np.zeros(0, dtype=INDEX_DTYPE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Unmap the files."""
+        self.index = None
+        self.data.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        """Return record number `i` as a GameRecord."""
+        return GameRecord.unpack(self.data, int(self.index["offset"][i]), self.version)
+
+    def __iter__(self):
+        for offset in self.index["offset"]:
+            yield GameRecord.unpack(self.data, int(offset), self.version)
+
+    def select(self, result=None, min_moves=None, max_moves=None, rows=None, cols=None, connect=None):
+        """
+        Find records by their index entries.
+
+        Returns:
+            indices: NumPy array of record numbers matching every given filter
+        """
+        mask = np.ones(len(self.index), dtype=bool)
+        if result is not None:
+            mask &= self.index["result"] == result
+        if min_moves is not None:
+            mask &= self.index["moves"] >= min_moves
+        if max_moves is not None:
+            mask &= self.index["moves"] <= max_moves
+        if rows is not None:
+            mask &= self.index["rows"] == rows
+        if cols is not None:
+            mask &= self.index["cols"] == cols
+        if connect is not None:
+            mask &= self.index["connect"] == connect
+        return np.flatnonzero(mask)
+
+    def records(self, indices=None):
+        """Yield the records at `indices` (default: all) in order."""
+        if indices is None:
+            yield from self
+            return
+        for i in indices:
+            yield self[i]
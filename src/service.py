@@ -0,0 +1,324 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import multiprocessing.util
+import time
+
+from src.models.board import Board
+from src.ai.engines import parse_engine_spec, select_move, SearchLimit, BUDGET_KEYS
+from src.ai.stats import SearchStats
+from src.ai.ttable import TranspositionTable
+from src.ai.memory import governor, set_budget, DictCache, DEFAULT_BUDGET_MB, SHRINK_TO
+from src.ai.poscache import open_cache, save_caches
+
+# Results kept per worker process, keyed by (moves, engine config)
+WORKER_CACHE_SIZE = 10000
+
+# Latencies kept for the percentile report
+LATENCY_WINDOW = 1000
+
+# Seconds reserved for transport when turning a deadline into a search budget
+DEADLINE_MARGIN = 0.05
+
+# Estimated bytes of one worker-cache entry (key, result and its statistics)
+CACHE_ENTRY_BYTES = 2048
+
+_worker_cache = None
+_worker_cache_memory = None
+
+
+def _init_worker(memory_mb=None):
+    """
+    Process-pool initializer: give each worker its own warm result cache and
+    memory budget, and save the position caches it opens when it exits.
+    """
+    global _worker_cache, _worker_cache_memory
+    _worker_cache = collections.OrderedDict()
+    _worker_cache_memory = governor().register("worker_cache", DictCache(_worker_cache, CACHE_ENTRY_BYTES))
+    if memory_mb:
+        set_budget(memory_mb)
+    # Pool workers skip atexit handlers but run multiprocessing finalizers
+    multiprocessing.util.Finalize(None, save_caches, exitpriority=10)
+
+
+def _worker_move(moves, config, budget):
+    """
+    Search one position inside a worker process.
+
+    Args:
+        moves: Position as a 1-based move string
+        config: Engine configuration
+        budget: Seconds the search may take before returning its best move so far
+
+    Returns:
+        result: Dict with the move (1-based), whether it came from the
+        worker cache, and the search statistics
+    """
+    key = (moves, json.dumps(config, sort_keys=True))
+    cached = _worker_cache.get(key)
+    if cached is not None:
+        _worker_cache.move_to_end(key)
+        return dict(cached, cached=True)
+
+    board = Board.from_moves(moves)
+    stats = SearchStats(config["engine"])
+    limit = SearchLimit(max_time=budget)
+    col = select_move(board, board.next_player(), config, save_history=False, stats=stats, stop_event=limit)
+    result = {"move": col + 1 if col is not None else None, "cached": False, "stats": stats.to_dict()}
+
+    # A search cut short by the deadline is weaker than the budget asked for
+    if not limit.is_set():
+        _worker_cache[key] = result
+        if len(_worker_cache) > WORKER_CACHE_SIZE:
+            _worker_cache.popitem(last=False)
+    return result
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+class MoveService:
+    """
+    Serves AI moves for many concurrent games from a shared process pool.
+
+    Requests wait for a free worker in an asyncio queue. When more than
+    `max_pending` requests are queued or running, new ones are rejected
+    straight away (HTTP 503) instead of piling up; a request whose deadline
+    passes while queued or searching gets HTTP 504.
+    """
+
+    def __init__(self, workers=None, max_pending=None, default_deadline=10.0, tt_mb=0, memory_mb=None,
+                 cache_path=None):
+        """
+        Initialize the service.
+
+        Args:
+            workers: Worker processes (default: CPU count)
+            max_pending: Queued plus running requests allowed (default: 4 per worker)
+            default_deadline: Seconds allowed per request when it names none
+            tt_mb: Size of a transposition table shared by all workers, in MB
+                (0 for none); it counts against memory_mb and must stay under
+                SHRINK_TO of it
+            memory_mb: Memory budget of each worker process, in MB (default:
+                the governor's DEFAULT_BUDGET_MB)
+            cache_path: Persistent position cache file every engine uses
+                ('auto' for the default one, None for none); the shared
+                table's deep results are added to it on close
+        """
+        if memory_mb:
+            # The table is created here under the budget the workers will have
+            set_budget(memory_mb)
+        self.cache_path = cache_path
+        self.table = TranspositionTable.create(tt_mb) if tt_mb else None
+        self.executor = concurrent.futures.ProcessPoolExecutor(workers, initializer=_init_worker,
+                                                               initargs=(memory_mb,))
+        self.workers = self.executor._max_workers
+        self.max_pending = max_pending or self.workers * 4
+        self.default_deadline = default_deadline
+        self.slots = asyncio.Semaphore(self.workers)
+        self.queued = 0
+        self.running = 0
+        self.counters = collections.Counter()
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def close(self):
+        """Shut the worker pool down."""
+        self.executor.shutdown(cancel_futures=True)
+        if self.cache_path is not None:
+            cache = open_cache(self.cache_path, Board())
+            if self.table is not None:
+                cache.absorb(self.table)
+            cache.save()
+        if self.table is not None:
+            self.table.close()
+
+    async def request_move(self, request):
+        """
+        Handle one move request.
+
+        Args:
+            request: Dict with 'moves' (1-based move string), 'engine' (spec
+                such as 'minimax:hard'), optional 'budget' overrides
+                ({'depth': 6}) and optional 'deadline' in seconds
+
+        Returns:
+            (status, body): HTTP status code and JSON-serialisable body
+        """
+        start = time.perf_counter()
+        try:
+            moves = str(request.get("moves", ""))
+            config = parse_engine_spec(request.get("engine", "minimax"))
+            for name, value in request.get("budget", {}).items():
+                if name not in BUDGET_KEYS:
+                    raise ValueError(f"unknown budget key '{name}'")
+                config[name] = BUDGET_KEYS[name](value)
+            # Clients cannot pick a table or cache file; the service's own ones are used
+            config.pop("tt", None)
+            config.pop("cache", None)
+            if self.table is not None:
+                config["tt"] = self.table.name
+            if self.cache_path is not None:
+                config["cache"] = self.cache_path
+            board = Board.from_moves(moves)
+            deadline = float(request.get("deadline", self.default_deadline))
+        except (ValueError, TypeError, AttributeError) as e:
+            self.counters["bad_request"] += 1
+            return 400, {"error": str(e)}
+        if not board.get_valid_moves() or (moves and board.is_winner(3 - board.next_player())):
+            self.counters["bad_request"] += 1
+            return 400, {"error": "game is already over"}
+
+        if self.queued + self.running >= self.max_pending:
+            self.counters["rejected"] += 1
+            return 503, {"error": "service busy", "queue_depth": self.queued}
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout=deadline)
+        except asyncio.TimeoutError:
+            self.counters["timed_out"] += 1
+            return 504, {"error": "deadline passed while queued"}
+        finally:
+            self.queued -= 1
+
+        queue_time = time.perf_counter() - start
+        budget = deadline - queue_time - DEADLINE_MARGIN
+        if budget <= 0:
+            self.slots.release()
+            self.counters["timed_out"] += 1
+            return 504, {"error": "deadline passed while queued"}
+
+        self.running += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, _worker_move, moves, config, budget)
+        # The slot is held until the worker returns, even when the request
+        # gives up on it, so a late worker is never handed a second search
+        future.add_done_callback(self._release_slot)
+        try:
+            # The worker stops itself at the budget; the extra second
+            # only covers a worker that is slow to return
+            result = await asyncio.wait_for(asyncio.shield(future), timeout=budget + 1.0)
+        except asyncio.TimeoutError:
+            self.counters["timed_out"] += 1
+            return 504, {"error": "deadline passed while searching"}
+
+        latency = time.perf_counter() - start
+        self.latencies.append(latency)
+        self.counters["completed"] += 1
+        self.counters["cache_hits"] += result["cached"]
+        result["queue_ms"] = round(queue_time * 1000, 2)
+        result["latency_ms"] = round(latency * 1000, 2)
+        return 200, result
+
+    def _release_slot(self, future):
+        """Free a worker slot once the search on it has returned."""
+        self.running -= 1
+        self.slots.release()
+        if not future.cancelled():
+            future.exception()  # retrieved here so a search nobody awaited is not logged as lost
+
+    def status(self):
+        """Queue depth, counters and latency percentiles in milliseconds."""
+        latencies = list(self.latencies)
+        return {
+            "workers": self.workers,
+            "queue_depth": self.queued,
+            "in_flight": self.running,
+            "max_pending": self.max_pending,
+            "counters": dict(self.counters),
+            "latency_ms": {
+                name: round(percentile(latencies, fraction) * 1000, 2) if latencies else None
+                for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+            },
+        }
+
+    async def handle_connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection (keep-alive supported)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                if method == "POST" and path == "/move":
+                    try:
+                        request = json.loads(body or b"{}")
+                    except json.JSONDecodeError as e:
+                        status, response = 400, {"error": f"invalid JSON: {e}"}
+                    else:
+                        status, response = await self.request_move(request)
+                elif method == "GET" and path == "/stats":
+                    status, response = 200, self.status()
+                else:
+                    status, response = 404, {"error": f"no route for {method} {path}"}
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                payload = json.dumps(response).encode()
+                reason = {200: "OK", 400: "Bad Request", 404: "Not Found",
+                          503: "Service Unavailable", 504: "Gateway Timeout"}[status]
+                writer.write(f"HTTP/1.1 {status} {reason}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(payload)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host, port, workers=None, max_pending=None, default_deadline=10.0, tt_mb=0, memory_mb=None,
+                cache_path=None):
+    """Run the move service until cancelled."""
+    service = MoveService(workers, max_pending, default_deadline, tt_mb, memory_mb, cache_path)
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Move service on http://{host}:{port} with {service.workers} workers", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    """Command-line entry point for the move service."""
+    parser = argparse.ArgumentParser(description="Serve AI moves over HTTP from a pool of engine workers.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port to bind (default: 8765)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="queued plus running requests before rejecting (default: 4 per worker)")
+    parser.add_argument("--deadline", type=float, default=10.0, help="default per-request deadline in seconds")
+    parser.add_argument("--tt-mb", type=float, default=0,
+                        help="transposition table shared by all workers, in MB (default: none)")
+    parser.add_argument("--memory-mb", type=float, default=None,
+                        help="memory budget of each worker for search trees and caches, in MB (default: 512)")
+    parser.add_argument("--cache", default=None, metavar="FILE",
+                        help="persistent position cache shared by the workers ('auto' for the default file)")
+    args = parser.parse_args(argv)
+    if args.tt_mb >= (args.memory_mb or DEFAULT_BUDGET_MB) * SHRINK_TO:
+        parser.error(f"--tt-mb must stay under {SHRINK_TO:.0%} of --memory-mb")
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_pending, args.deadline, args.tt_mb,
+                          args.memory_mb, args.cache))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,128 @@
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+from src.models.board import Board
+from src.ai.engines import parse_engine_spec, format_engine, select_move
+from src.ai.tablebase import build_tablebase, open_tablebase, tablebase_path
+
+
+def parse_shape(text):
+    """Parse a board shape such as '5x5' into (rows, cols)."""
+    rows, _, cols = text.lower().partition("x")
+    try:
+        return int(rows), int(cols)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Board shape must look like 5x5, not '{text}'")
+
+
+def random_positions(tablebase, count, rng, min_plies=2):
+    """
+    Draw ongoing positions by random play on the tablebase's board shape.
+
+    Args:
+        tablebase: Tablebase the positions must be covered by
+        count: Number of positions
+        rng: random.Random instance
+        min_plies: Fewest random moves before a position is taken
+
+    Returns:
+        positions: List of (board, player to move)
+    """
+    rows, cols, connect = tablebase.shape
+    positions = []
+    while len(positions) < count:
+        board = Board(rows, cols, connect)
+        player = 1
+        plies = rng.randint(min_plies, rows * cols - 1)
+        for _ in range(plies):
+            col = rng.choice(board.get_valid_moves())
+            board.drop_piece(col, player)
+            if board.is_winner(player) or board.is_full():
+                break
+            player = 3 - player
+        else:
+            positions.append((board, player))
+    return positions
+
+
+def check_engine(tablebase, config, positions):
+    """
+    Check an engine's moves against the tablebase.
+
+    A move is correct when it keeps the best result the position allows;
+    winning more slowly than possible still counts as correct.
+
+    Args:
+        tablebase: Tablebase of the positions' board shape
+        config: Engine configuration
+        positions: List of (board, player to move)
+
+    Returns:
+        report: Dict with the positions checked, the correct moves, the
+        errors by kind ('win_to_draw', 'win_to_loss', 'draw_to_loss') and
+        the mean seconds per move
+    """
+    errors = {"win_to_draw": 0, "win_to_loss": 0, "draw_to_loss": 0}
+    correct = 0
+    elapsed = 0.0
+    kinds = {1: "win", 0: "draw", -1: "loss"}
+    for board, player in positions:
+        values = tablebase.move_values(board, player)
+        start = time.perf_counter()
+        col = select_move(board, player, config, save_history=False)
+        elapsed += time.perf_counter() - start
+        best = max(int(np.sign(value)) for value in values.values())
+        played = int(np.sign(values[col])) if col in values else -1
+        if played == best:
+            correct += 1
+        else:
+            errors[f"{kinds[best]}_to_{kinds[played]}"] += 1
+    return {
+        "positions": len(positions),
+        "correct": correct,
+        "errors": errors,
+        "seconds_per_move": elapsed / len(positions) if positions else 0.0,
+    }
+
+
+def main(argv=None):
+    """Command-line entry point for the tablebase generator and checker."""
+    parser = argparse.ArgumentParser(description="Solve a small board exhaustively into a tablebase, or check "
+                                                 "engines against one.")
+    parser.add_argument("shape", type=parse_shape, help="board shape as ROWSxCOLS, e.g. 5x5")
+    parser.add_argument("--connect", type=int, default=4, help="pieces in a row to win (default: 4)")
+    parser.add_argument("--dir", default=None, help="tablebase directory (default: data/tablebase/<shape>)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--check", nargs="+", default=None, metavar="ENGINE",
+                        help="check these engines against an existing tablebase instead of building one")
+    parser.add_argument("--positions", type=int, default=200, help="positions per check (default: 200)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the checked positions (default: 0)")
+    args = parser.parse_args(argv)
+
+    rows, cols = args.shape
+    directory = args.dir or tablebase_path(rows, cols, args.connect)
+    if args.check is None:
+        manifest = build_tablebase(rows, cols, args.connect, directory, args.workers,
+                                   log=lambda line: print(line, file=sys.stderr))
+        value = manifest["root_value"]
+        outcome = "draw" if value == 0 else f"{'first' if value > 0 else 'second'} player wins in {abs(value)} plies"
+        print(f"{rows}x{cols} connect {args.connect}: {manifest['positions']:,} positions in "
+              f"{manifest['seconds']:.1f} s, {outcome}", file=sys.stderr)
+        return manifest
+
+    tablebase = open_tablebase(directory)
+    if tablebase is None:
+        parser.error(f"no tablebase in {directory}; build it first")
+    positions = random_positions(tablebase, args.positions, random.Random(args.seed))
+    reports = {}
+    for spec in args.check:
+        config = parse_engine_spec(spec)
+        report = reports[format_engine(config)] = check_engine(tablebase, config, positions)
+        errors = ", ".join(f"{kind} {count}" for kind, count in report["errors"].items() if count) or "none"
+        print(f"{format_engine(config)}: {report['correct']}/{report['positions']} correct"
+              f"  errors: {errors}  {report['seconds_per_move'] * 1000:.1f} ms/move", file=sys.stderr)
+    return reports
@@ -0,0 +1,322 @@
+import argparse
+import math
+import multiprocessing
+import queue
+import random
+import sys
+import time
+
+import pygame
+
+from src.models.board import Board
+from src.ai.engines import parse_engine_spec, format_engine, select_move
+from src.arena import random_opening
+from src.gui import GUI, SpriteAtlas
+
+# Seconds a finished game stays on its board before the next one starts
+HOLD_TIME = 1.0
+
+# Longest time per frame spent applying queued game updates, in seconds
+DRAIN_BUDGET = 0.008
+
+# Pixels between boards, and height of the score line above them
+GAP = 4
+STATUS_HEIGHT = 24
+
+# Messages from the workers: a new game on a board (with its opening), one
+# move, and the end of a game
+NEW = 0
+MOVE = 1
+END = 2
+
+
+class _LiveGame:
+    """A game a spectator worker is playing on one board."""
+
+    def __init__(self, slot, engine_a, engine_b, a_first, opening):
+        """Start a game on board `slot` with the opening already played."""
+        self.slot = slot
+        self.configs = {1: engine_a, 2: engine_b} if a_first else {1: engine_b, 2: engine_a}
+        self.a_first = a_first
+        self.board = Board()
+        self.player = 1
+        for col in opening:
+            self.board.drop_piece(col, self.player)
+            self.player = 3 - self.player
+        self.winner = None
+        self.ended = None
+
+
+def _spectate_worker(slots, engine_a, engine_b, opening_plies, seed, updates, stop):
+    """
+    Worker process: play a game on each of `slots`, one move per game in turn.
+
+    Interleaving the games keeps every board moving however few workers
+    there are. Updates are put on `updates`, a multiprocessing.Queue whose
+    feeder thread does the sending, so the worker never waits on the viewer.
+    """
+    rng = random.Random(seed)
+    random.seed(seed)
+    games = {}
+    a_first = {slot: slot % 2 == 0 for slot in slots}
+    while not stop.is_set():
+        for slot in slots:
+            game = games.get(slot)
+            if game is None or (game.ended is not None and time.monotonic() - game.ended >= HOLD_TIME):
+                opening = random_opening(rng, opening_plies) if opening_plies else []
+                game = games[slot] = _LiveGame(slot, engine_a, engine_b, a_first[slot], opening)
+                a_first[slot] = not a_first[slot]
+                updates.put((NEW, slot, opening, game.a_first))
+                continue
+            if game.ended is not None:
+                continue
+            col = select_move(game.board, game.player, game.configs[game.player], save_history=False)
+            if col is None or not game.board.drop_piece(col, game.player):
+                game.winner = 3 - game.player  # an engine without a legal move forfeits
+            else:
+                updates.put((MOVE, slot, col, game.player))
+                if game.board.is_winner(game.player):
+                    game.winner = game.player
+                elif game.board.is_full():
+                    game.winner = 0
+                else:
+                    game.player = 3 - game.player
+            if game.winner is not None:
+                game.ended = time.monotonic()
+                updates.put((END, slot, game.winner, game.a_first))
+        if not slots:
+            stop.wait(0.1)
+
+
+class SpectatorView:
+    """
+    Tiles many boards in one window and keeps them up to date from a queue.
+
+    Every cell is blitted from one SpriteAtlas at the tile scale, and only
+    the cells that changed since the last frame are drawn and passed to
+    pygame.display.update, so the cost of a frame follows the number of
+    moves that arrived rather than the number of boards.
+    """
+
+    def __init__(self, boards, scale=12, rows=6, cols=7, columns=None):
+        """
+        Initialize the view.
+
+        Args:
+            boards: Number of boards
+            scale: Side of one cell in pixels
+            rows, cols: Board size
+            columns: Boards per row of the window (default: a near-square grid)
+        """
+        self.boards = boards
+        self.scale = scale
+        self.rows = rows
+        self.cols = cols
+        self.columns = columns or math.ceil(math.sqrt(boards))
+        self.tile_width = cols * scale
+        self.tile_height = rows * scale
+        grid_rows = math.ceil(boards / self.columns)
+        self.width = self.columns * (self.tile_width + GAP) + GAP
+        self.height = STATUS_HEIGHT + grid_rows * (self.tile_height + GAP) + GAP
+
+        pygame.font.init()
+        self.font = pygame.font.SysFont('Courier New', 16)
+        self.atlas = SpriteAtlas(scale, (GUI.BLACK, GUI.RED, GUI.YELLOW), GUI.BLUE)
+        self.empty_tile = pygame.Surface((self.tile_width, self.tile_height))
+        for row in range(rows):
+            for col in range(cols):
+                self.atlas.blit(self.empty_tile, 0, (col * scale, row * scale))
+
+        self.heights = [[0] * cols for _ in range(boards)]
+        self.a_first = [True] * boards
+        self.results = {"wins": 0, "draws": 0, "losses": 0}
+        self.dirty = []
+        self.status_changed = True
+        self.screen = None
+
+    def tile_rect(self, slot):
+        """Screen rect of board `slot`."""
+        x = GAP + (slot % self.columns) * (self.tile_width + GAP)
+        y = STATUS_HEIGHT + GAP + (slot // self.columns) * (self.tile_height + GAP)
+        return pygame.Rect(x, y, self.tile_width, self.tile_height)
+
+    def open(self, screen=None):
+        """Create the window (or use `screen`) and draw every board empty."""
+        self.screen = screen or pygame.display.set_mode((self.width, self.height))
+        self.screen.fill(GUI.BLACK)
+        for slot in range(self.boards):
+            self.screen.blit(self.empty_tile, self.tile_rect(slot))
+        self.status_changed = True
+        self.dirty = [self.screen.get_rect()]
+
+    def _drop(self, slot, col, player):
+        """Draw one piece dropped into board `slot`."""
+        row = self.rows - 1 - self.heights[slot][col]
+        self.heights[slot][col] += 1
+        tile = self.tile_rect(slot)
+        pos = (tile.x + col * self.scale, tile.y + row * self.scale)
+        self.atlas.blit(self.screen, player, pos)
+        self.dirty.append(pygame.Rect(pos, (self.scale, self.scale)))
+
+    def _frame(self, slot, color):
+        """Draw the border around board `slot` (the gap around the tile)."""
+        rect = self.tile_rect(slot).inflate(GAP, GAP)
+        pygame.draw.rect(self.screen, color, rect, width=GAP // 2)
+        self.dirty.append(rect)
+
+    def apply(self, update):
+        """Draw one update from a worker."""
+        kind, slot = update[0], update[1]
+        if kind == NEW:
+            _, _, opening, a_first = update
+            self.heights[slot] = [0] * self.cols
+            self.a_first[slot] = a_first
+            self.screen.blit(self.empty_tile, self.tile_rect(slot))
+            self._frame(slot, GUI.BLACK)
+            player = 1
+            for col in opening:
+                self._drop(slot, col, player)
+                player = 3 - player
+        elif kind == MOVE:
+            _, _, col, player = update
+            self._drop(slot, col, player)
+        elif kind == END:
+            _, _, winner, a_first = update
+            if winner == 0:
+                self.results["draws"] += 1
+            elif (winner == 1) == a_first:
+                self.results["wins"] += 1
+            else:
+                self.results["losses"] += 1
+            self._frame(slot, GUI.GREY if winner == 0 else (GUI.RED if winner == 1 else GUI.YELLOW))
+            self.status_changed = True
+
+    def drain(self, updates, budget=DRAIN_BUDGET):
+        """
+        Apply queued updates for at most `budget` seconds; the rest wait for the next frame.
+
+        Returns:
+            count: Number of updates applied
+        """
+        deadline = time.perf_counter() + budget
+        count = 0
+        while time.perf_counter() < deadline:
+            try:
+                update = updates.get_nowait()
+            except queue.Empty:
+                break
+            self.apply(update)
+            count += 1
+        return count
+
+    def status_text(self):
+        """Score line: engine A's wins, draws and losses."""
+        r = self.results
+        return f"A vs B  W/D/L {r['wins']}/{r['draws']}/{r['losses']}  games {sum(r.values())}"
+
+    def present(self):
+        """
+        Redraw the score line if needed and push the changed rects to the display.
+
+        Returns:
+            dirty: The rects that were updated
+        """
+        if self.status_changed:
+            status = pygame.Rect(0, 0, self.width, STATUS_HEIGHT)
+            self.screen.fill(GUI.BLACK, status)
+            self.screen.blit(self.font.render(self.status_text(), True, GUI.WHITE), (GAP, 4))
+            self.dirty.append(status)
+            self.status_changed = False
+        dirty, self.dirty = self.dirty, []
+        if dirty:
+            pygame.display.update(dirty)
+        return dirty
+
+
+class Spectator:
+    """Runs bulk matches in worker processes and shows every game live in a SpectatorView."""
+
+    def __init__(self, engine_a, engine_b, boards=16, workers=None, opening_plies=2, seed=0, scale=12):
+        """
+        Initialize the spectator.
+
+        Args:
+            engine_a, engine_b: Engine configurations
+            boards: Games shown (and played) at once
+            workers: Worker processes (default: CPU count, at most one per board)
+            opening_plies: Random moves before the engines take over
+            seed: Base random seed
+            scale: Side of one cell in pixels
+        """
+        self.engine_a = engine_a
+        self.engine_b = engine_b
+        self.boards = boards
+        self.workers = min(workers or multiprocessing.cpu_count(), boards)
+        self.opening_plies = opening_plies
+        self.seed = seed
+        self.view = SpectatorView(boards, scale)
+        self.updates = multiprocessing.Queue()
+        self.stop_event = multiprocessing.Event()
+        self.processes = []
+
+    def start(self):
+        """Start the worker processes; board slots are dealt out round-robin."""
+        for worker in range(self.workers):
+            slots = list(range(worker, self.boards, self.workers))
+            process = multiprocessing.Process(
+                target=_spectate_worker,
+                args=(slots, self.engine_a, self.engine_b, self.opening_plies,
+                      self.seed * 1000003 + worker, self.updates, self.stop_event),
+                daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def stop(self):
+        """Stop the workers."""
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.updates.cancel_join_thread()
+
+    def run(self):
+        """Show the games until the window is closed or Escape is pressed."""
+        pygame.init()
+        caption = f"Spectator: {format_engine(self.engine_a)} vs {format_engine(self.engine_b)}"
+        pygame.display.set_caption(caption)
+        self.view.open()
+        self.start()
+        clock = pygame.time.Clock()
+        try:
+            while True:
+                clock.tick(60)
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                        return self.view.results
+                self.view.drain(self.updates)
+                self.view.present()
+        finally:
+            self.stop()
+            pygame.quit()
+
+
+def main(argv=None):
+    """Command-line entry point for the spectator view."""
+    parser = argparse.ArgumentParser(description="Watch many AI-vs-AI games at once, one board per game.")
+    parser.add_argument("engine_a", help="e.g. minimax:easy or mcts:iterations=500")
+    parser.add_argument("engine_b", help="engine spec for the opponent")
+    parser.add_argument("--boards", type=int, default=16, help="games shown at once (default: 16)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--scale", type=int, default=12, help="pixels per cell (default: 12)")
+    parser.add_argument("--opening-plies", type=int, default=2, help="random opening moves (default: 2)")
+    parser.add_argument("--seed", type=int, default=0, help="base random seed (default: 0)")
+    args = parser.parse_args(argv)
+
+    spectator = Spectator(parse_engine_spec(args.engine_a), parse_engine_spec(args.engine_b), args.boards,
+                          args.workers, args.opening_plies, args.seed, args.scale)
+    results = spectator.run()
+    print(f"{format_engine(spectator.engine_a)} vs {format_engine(spectator.engine_b)}: "
+          f"W/D/L {results['wins']}/{results['draws']}/{results['losses']}", file=sys.stderr)
+    return results
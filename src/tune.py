@@ -0,0 +1,289 @@
+import argparse
+import concurrent.futures
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from src.models.board import Board
+from src.ai.evaluation import WEIGHTS_FILE, FEATURES, load_weights, position_features
+from src.ai.minimax import iterative_deepening_minimax, SearchAborted
+from src.ai.engines import parse_engine_spec, format_engine
+from src.arena import random_opening, play_game, run_arena, summarize
+from src.dataset import DatasetWriter
+
+# Features the tuner fits; 'win' never occurs in a non-terminal position
+TUNED = ("center", "three", "two", "opp_three", "opp_two",
+         "threat_good", "threat_other", "opp_threat_good", "opp_threat_other")
+
+# Score of a proven win in minimax
+WIN_SCORE = 1000000
+
+
+def _self_play_task(task):
+    """
+    Worker entry point: play one self-play game and label its positions.
+
+    Every position after the random opening is described from both
+    players' points of view and labelled with that player's final result
+    (1 win, 0.5 draw, 0 loss). With `solve_depth`, a position whose search
+    to that depth proves a win or loss gets the proven result instead.
+
+    Returns:
+        (features, labels, game): Integer array of shape (n, len(FEATURES)),
+        float array of shape (n,), and the game as (moves, winner, move
+        scores, opening length)
+    """
+    seed, engine, max_opening, solve_depth = task
+    rng = random.Random(seed)
+    opening = random_opening(rng, rng.randint(2, max_opening))
+    winner, moves, _, _, move_scores = play_game(engine, engine, opening, seed)
+    game = (moves, winner, move_scores, len(opening))
+    result = {0: 0.5, 1: 1.0, 2: 0.0}[winner]
+
+    features = []
+    labels = []
+    board = Board()
+    player = 1
+    for ply, col in enumerate(moves[:-1]):
+        board.drop_piece(col, player)
+        player = 3 - player
+        if ply + 1 < len(opening):
+            continue
+        label = result
+        if solve_depth:
+            try:
+                value, _ = iterative_deepening_minimax(board, solve_depth, player=player, save_history=False)
+            except SearchAborted:
+                value = 0
+            if abs(value) >= WIN_SCORE:
+                # Proven result for the player to move, turned into player 1's
+                label = float((value > 0) == (player == 1))
+        features.append(position_features(board, 1))
+        labels.append(label)
+        features.append(position_features(board, 2))
+        labels.append(1.0 - label)
+    if not features:
+        return np.zeros((0, len(FEATURES)), dtype=np.int16), np.zeros(0, dtype=np.float32), game
+    return np.array(features, dtype=np.int16), np.array(labels, dtype=np.float32), game
+
+
+def generate_positions(games, engine, workers=None, max_opening=8, solve_depth=0, seed=0, export_dir=None):
+    """
+    Label positions from self-play games played across a process pool.
+
+    Args:
+        games: Number of self-play games
+        engine: Engine configuration playing both sides
+        workers: Worker processes (default: CPU count)
+        max_opening: Longest random opening; each game starts with 2 to this many random moves
+        solve_depth: Depth of the search that tries to prove each position (0 to label by game result)
+        seed: Base seed for openings and engines
+        export_dir: Optional training-data directory the self-play games
+            are exported to (see src.dataset)
+
+    Returns:
+        (features, labels): Integer feature matrix and float labels, one row per position and player
+    """
+    tasks = [(seed * 1000003 + index, engine, max_opening, solve_depth) for index in range(games)]
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        results = list(executor.map(_self_play_task, tasks, chunksize=4))
+    if export_dir:
+        with DatasetWriter(export_dir, source="self-play") as exporter:
+            for _, _, (moves, winner, move_scores, opening) in results:
+                exporter.add_game(moves, winner, move_scores, (engine, engine), searched_from=opening)
+    features = np.concatenate([features for features, _, _ in results])
+    labels = np.concatenate([labels for _, labels, _ in results])
+    return features, labels
+
+
+def weight_vector(weights):
+    """{feature: weight} as a float array in FEATURES order."""
+    return np.array([weights[feature] for feature in FEATURES], dtype=np.float64)
+
+
+def loss(features, labels, weights, k):
+    """
+    Mean squared error between the labels and the win probability
+    sigmoid(k * score) the evaluation predicts.
+
+    Args:
+        features: Feature matrix (n, len(FEATURES))
+        labels: Results in [0, 1]
+        weights: Weight vector
+        k: Scale turning evaluation units into log-odds
+
+    Returns:
+        loss: Mean squared error
+    """
+    predicted = 1.0 / (1.0 + np.exp(-k * (features @ weights)))
+    return float(np.mean((predicted - labels) ** 2))
+
+
+def fit_scale(features, labels, weights, low=1e-4, high=1.0, steps=60):
+    """
+    Find the k that best fits the labels for fixed weights (golden-section search on log k).
+
+    Returns:
+        k: Best scale found
+    """
+    ratio = (5 ** 0.5 - 1) / 2
+    a, b = np.log(low), np.log(high)
+    for _ in range(steps):
+        c = b - ratio * (b - a)
+        d = a + ratio * (b - a)
+        if loss(features, labels, weights, np.exp(c)) < loss(features, labels, weights, np.exp(d)):
+            b = d
+        else:
+            a = c
+    return float(np.exp((a + b) / 2))
+
+
+def fit_weights(features, labels, weights, k, epochs=1000, batch_size=4096, learning_rate=0.5, seed=0):
+    """
+    Fit the TUNED weights by minibatch gradient descent (Adam) on the loss.
+
+    Each batch's loss and gradient are computed with matrix operations over
+    the whole batch. Weights outside TUNED keep their value.
+
+    Args:
+        features, labels: Training data
+        weights: Starting weight vector
+        k: Fixed scale from fit_scale
+        epochs: Passes over the data
+        batch_size: Positions per gradient step
+        learning_rate: Adam step size, in evaluation units
+
+    Returns:
+        weights: Fitted weight vector
+    """
+    rng = np.random.default_rng(seed)
+    weights = weights.astype(np.float64).copy()
+    tuned = np.array([feature in TUNED for feature in FEATURES])
+    first = np.zeros_like(weights)
+    second = np.zeros_like(weights)
+    features = features.astype(np.float64)
+    step = 0
+    for _ in range(epochs):
+        order = rng.permutation(len(labels))
+        for start in range(0, len(order), batch_size):
+            batch = order[start:start + batch_size]
+            x = features[batch]
+            predicted = 1.0 / (1.0 + np.exp(-k * (x @ weights)))
+            error = 2.0 * (predicted - labels[batch]) * predicted * (1.0 - predicted) * k
+            gradient = (x.T @ error) / len(batch)
+            gradient[~tuned] = 0.0
+            step += 1
+            first = 0.9 * first + 0.1 * gradient
+            second = 0.999 * second + 0.001 * gradient ** 2
+            weights -= learning_rate * (first / (1 - 0.9 ** step)) / (np.sqrt(second / (1 - 0.999 ** step)) + 1e-8)
+    return weights
+
+
+def compare(old_path, new_path, games, move_time, workers=None, seed=0):
+    """
+    Play the new weights against the old at equal time per move.
+
+    Both sides are minimax with no depth limit and the same max_time per
+    move, so stronger weights show up as a better score rather than being
+    bought with extra search time.
+
+    Returns:
+        (summary, engine_new, engine_old): Arena summary from the new weights' point of view and both configurations
+    """
+    engine_new = {"engine": "minimax", "max_time": move_time, "weights": new_path}
+    engine_old = {"engine": "minimax", "max_time": move_time, "weights": old_path}
+    records = run_arena(engine_new, engine_old, games, workers, opening_plies=4, seed=seed)
+    return summarize(records), engine_new, engine_old
+
+
+def main(argv=None):
+    """Command-line entry point for the evaluation tuner."""
+    parser = argparse.ArgumentParser(description="Tune the evaluation weights on self-play positions and "
+                                                 "compare them against the current weights.")
+    parser.add_argument("--games", type=int, default=400, help="self-play games (default: 400)")
+    parser.add_argument("--engine", default="minimax:depth=2",
+                        help="engine playing the self-play games (default: minimax:depth=2)")
+    parser.add_argument("--max-opening", type=int, default=8, help="longest random opening (default: 8)")
+    parser.add_argument("--solve-depth", type=int, default=0,
+                        help="label positions a search this deep proves won or lost exactly (default: off)")
+    parser.add_argument("--epochs", type=int, default=1000, help="passes over the data (default: 1000)")
+    parser.add_argument("--scale", type=float, default=4.0,
+                        help="multiply the fitted weights by this before rounding to integers (default: 4)")
+    parser.add_argument("--arena-games", type=int, default=100, help="equal-time arena games (default: 100)")
+    parser.add_argument("--move-time", type=float, default=0.05,
+                        help="seconds per move in the arena (default: 0.05)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0, help="base random seed (default: 0)")
+    parser.add_argument("--weights", default=WEIGHTS_FILE, help=f"current weights file (default: {WEIGHTS_FILE})")
+    parser.add_argument("--out", default=None, help="where to write the new weights (default: --weights)")
+    parser.add_argument("--export", default=None, metavar="DIR",
+                        help="training-data directory to export the self-play games to (see src.dataset)")
+    args = parser.parse_args(argv)
+
+    engine = parse_engine_spec(args.engine)
+    engine["weights"] = args.weights
+    start = time.perf_counter()
+    features, labels = generate_positions(args.games, engine, args.workers, args.max_opening,
+                                          args.solve_depth, args.seed, args.export)
+    print(f"{len(labels)} labelled positions from {args.games} games of {format_engine(engine)} "
+          f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    # Hold out a tenth of the positions to check the fit generalises
+    order = np.random.default_rng(args.seed).permutation(len(labels))
+    split = len(order) // 10
+    test, train = order[:split], order[split:]
+
+    old = load_weights(args.weights)
+    previous = {}
+    if os.path.exists(args.weights):
+        with open(args.weights, 'r') as f:
+            previous = json.load(f)
+    old_vector = weight_vector(old)
+    k = fit_scale(features[train], labels[train], old_vector)
+    fitted = fit_weights(features[train], labels[train], old_vector, k, args.epochs, seed=args.seed)
+    new = {feature: int(round(weight * args.scale)) for feature, weight in zip(FEATURES, fitted)}
+    loss_before = loss(features[test], labels[test], old_vector, k)
+    loss_after = loss(features[test], labels[test], weight_vector(new), k / args.scale)
+    print(f"held-out loss {loss_before:.5f} -> {loss_after:.5f}", file=sys.stderr)
+    print("  " + "  ".join(f"{feature} {old[feature]} -> {new[feature]}" for feature in FEATURES), file=sys.stderr)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = os.path.join(tmp, "old.json")
+        new_path = os.path.join(tmp, "new.json")
+        for path, weights in ((old_path, old), (new_path, new)):
+            with open(path, 'w') as f:
+                json.dump({"weights": weights}, f)
+        print(f"Playing {args.arena_games} games at {args.move_time}s per move...", file=sys.stderr)
+        summary, _, _ = compare(old_path, new_path, args.arena_games, args.move_time, args.workers, args.seed)
+    print(f"new vs old: W/D/L {summary['wins']}/{summary['draws']}/{summary['losses']}  "
+          f"score {summary.get('score', 0):.3f}  Elo {summary.get('elo', 0):+.0f}  "
+          f"95% CI [{summary.get('elo_low', 0):+.0f}, {summary.get('elo_high', 0):+.0f}]", file=sys.stderr)
+
+    result = {
+        "version": previous.get("version", 0) + 1,
+        "weights": new,
+        "k": k / args.scale,
+        "tuning": {
+            "games": args.games,
+            "engine": format_engine(engine),
+            "positions": int(len(labels)),
+            "solve_depth": args.solve_depth,
+            "loss_before": loss_before,
+            "loss_after": loss_after,
+            "previous_version": previous.get("version"),
+            "previous_weights": old,
+        },
+        "arena": dict(summary, move_time=args.move_time),
+    }
+    out = args.out or args.weights
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2)
+        f.write("\n")
+    print(f"Wrote version {result['version']} to {out}", file=sys.stderr)
+    return result
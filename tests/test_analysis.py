@@ -0,0 +1,21 @@
+from src.analysis import analyse_position, _review_task
+
+CONFIG = {"engine": "minimax", "depth": 3}
+
+
+def test_move_lists_match_move_strings():
+    assert analyse_position([3, 3, 4], CONFIG)["scores"] == analyse_position("445", CONFIG)["scores"]
+
+
+def test_review_of_a_wide_board():
+    # Player 1 holds columns 10, 9 and 8 (0-based 9, 8, 7) on a 10-column
+    # board; the review finds the win at 0-based column 6
+    moves = [9, 9, 8, 8, 7, 7]
+    ply, entry = _review_task((len(moves), moves, 0, 3, (6, 10, 4)))
+    assert ply == len(moves)
+    assert entry["best"] == 6
+    assert entry["flag"] == "blunder"
+
+
+def test_illegal_move_lists_are_reported():
+    assert "error" in analyse_position([0] * 7, CONFIG)
@@ -0,0 +1,25 @@
+import math
+
+from src.ai.threats import ThreatMap, columns
+from src.calibrate import load_positions, measure_minimax, calibrate, quantile, QUANTILE
+
+
+def test_samples_have_no_forced_moves():
+    for board, player in load_positions(count=100):
+        threats = ThreatMap(board)
+        assert threats.winning_column(player) is None
+        assert len(columns(threats.non_losing(player), board.geometry)) > 1
+
+
+def test_calibrated_depths_increase():
+    boards = load_positions()
+    depth_times, nodes_per_sec = measure_minimax(boards, 4, 30.0)
+    assert all(math.isfinite(t) for times in depth_times.values() for t in times)
+
+    # One target per measured depth, each just enough for that depth
+    levels = ["easy", "medium", "hard", "expert"]
+    targets = {level: quantile(depth_times[depth], QUANTILE) for depth, level in enumerate(levels, 1)}
+    calibrated, warnings = calibrate(targets, depth_times, nodes_per_sec, 1000.0)
+    depths = [calibrated["minimax"][level]["depth"] for level in levels]
+    assert depths == sorted(set(depths)) and len(depths) == len(levels)
+    assert not warnings
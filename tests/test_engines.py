@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from src.models.board import Board
+from src.ai.engines import select_move, engine_config
+from src.ai.poscache import PositionCache, MIN_DEPTH
+from src.ai.stats import SearchStats
+from src.ai.timeman import TimeManager, MoveClock
+
+# Player 1 to move wins in column 2 or 6; the planted cache entry says column 0
+WINNING = "445566"
+PLANTED = 0
+
+
+@pytest.fixture
+def cache(tmp_path):
+    board = Board.from_moves(WINNING)
+    cache = PositionCache(str(tmp_path / "cache.bin"))
+    cache.record_result(board, 1, 0, MIN_DEPTH, PLANTED)
+    return cache
+
+
+def play(config, cache, clock=None):
+    config = dict(config, cache=cache)
+    return select_move(Board.from_moves(WINNING), 1, config, save_history=False, clock=clock)
+
+
+@pytest.mark.parametrize("depth", [MIN_DEPTH + 1, MIN_DEPTH + 3])
+def test_deeper_configs_ignore_shallower_results(cache, depth):
+    assert play({"engine": "minimax", "depth": depth, "max_time": 10.0}, cache) in (2, 6)
+
+
+@pytest.mark.parametrize("depth", [MIN_DEPTH - 2, MIN_DEPTH])
+def test_configs_use_results_at_least_as_deep(cache, depth):
+    assert play({"engine": "minimax", "depth": depth, "max_time": 10.0}, cache) == PLANTED
+
+
+def test_shallower_result_is_not_taken_by_stronger_levels(cache):
+    for level in ("hard", "expert"):
+        config = engine_config("minimax", level)
+        assert config["depth"] > MIN_DEPTH
+        clock = TimeManager(60.0).start(Board.from_moves(WINNING))
+        assert play(config, cache, clock) in (2, 6)
+
+
+def test_configs_without_depth_take_any_deep_result_when_limited(cache):
+    assert play({"engine": "minimax", "max_time": 10.0}, cache) == PLANTED
+    assert play({"engine": "minimax", "nodes": 100000}, cache) == PLANTED
+
+
+def _stopped():
+    stop = threading.Event()
+    stop.set()
+    return stop
+
+
+def test_stopped_search_falls_back_to_a_win():
+    col = select_move(Board.from_moves(WINNING), 1, {"engine": "minimax", "depth": 6}, save_history=False,
+                      stop_event=_stopped())
+    assert col in (2, 6)
+
+
+def test_stopped_search_falls_back_to_a_block():
+    # Player 2 must block player 1's three in column 3
+    board = Board.from_moves("41414")
+    col = select_move(board, 2, {"engine": "minimax", "depth": 6}, save_history=False, stop_event=_stopped())
+    assert col == 3
+
+
+def test_expired_clock_still_gives_a_legal_move():
+    board = Board.from_moves("4453")
+    clock = MoveClock(0.0, 0.0)
+    stats = SearchStats("minimax")
+    col = select_move(board, 1, engine_config("minimax", "expert"), save_history=False, stats=stats, clock=clock)
+    assert board.is_valid_move(col)
+    assert stats.move == col
@@ -0,0 +1,68 @@
+import json
+import threading
+
+import pytest
+
+from src.models.board import Board
+from src.ai.evaluation import (DEFAULT_WEIGHTS, weights_for, use_weights, set_weights, active_weights,
+                               evaluate_position, table_salt)
+from src.ai.engines import select_move
+from src.ai.minimax import iterative_deepening_minimax
+
+
+@pytest.fixture
+def weights_file(tmp_path):
+    path = tmp_path / "weights.json"
+    weights = dict(DEFAULT_WEIGHTS, center=40, three=1, two=9)
+    path.write_text(json.dumps({"version": 1, "weights": weights}))
+    return str(path)
+
+
+@pytest.fixture(autouse=True)
+def default_weights():
+    use_weights()
+    yield
+    use_weights()
+
+
+def test_explicit_weights_ignore_the_default(weights_file):
+    board = Board.from_moves("4453")
+    weights = weights_for(weights_file)
+    score = evaluate_position(board, 1, weights)
+    set_weights({"center": -100})
+    assert evaluate_position(board, 1, weights) == score
+    assert evaluate_position(board, 1) != score
+    assert table_salt(board, weights) != table_salt(board)
+
+
+def test_select_move_leaves_the_default_weights(weights_file):
+    before = active_weights()
+    select_move(Board.from_moves("44"), 1, {"engine": "minimax", "depth": 2, "weights": weights_file},
+                save_history=False)
+    assert active_weights() == before
+
+
+def test_concurrent_searches_keep_their_weights(weights_file):
+    board = Board.from_moves("4453")
+    custom = weights_for(weights_file)
+    expected = {
+        "default": iterative_deepening_minimax(board, 3, player=1, save_history=False),
+        "custom": iterative_deepening_minimax(board, 3, player=1, save_history=False, weights=custom),
+    }
+    assert expected["default"] != expected["custom"]
+
+    results = {"default": [], "custom": []}
+
+    def search(name, weights):
+        for _ in range(5):
+            results[name].append(iterative_deepening_minimax(board, 3, player=1, save_history=False,
+                                                             weights=weights))
+
+    threads = [threading.Thread(target=search, args=("default", None)),
+               threading.Thread(target=search, args=("custom", custom))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for name, found in results.items():
+        assert found == [expected[name]] * 5
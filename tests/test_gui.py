@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+pygame = pytest.importorskip("pygame")
+
+from src.game import Game
+
+
+@pytest.fixture
+def game():
+    pygame.init()
+    game = Game(ponder=False, record_path=None, position_cache=False)
+    yield game
+    pygame.quit()
+
+
+def test_text_cache_is_bounded(game):
+    gui = game.gui
+    for i in range(3 * gui.TEXT_CACHE_SIZE):
+        gui.render_text(gui.font, f"{i / 10:.1f}s", gui.BLACK)
+    assert len(gui.text_cache) == gui.TEXT_CACHE_SIZE
+
+
+def test_text_cache_keeps_recently_used_text(game):
+    gui = game.gui
+    static = gui.render_text(gui.font, "Press 'R' to Restart", gui.BLACK)
+    for i in range(3 * gui.TEXT_CACHE_SIZE):
+        gui.render_text(gui.font, str(i), gui.BLACK)
+        assert gui.render_text(gui.font, "Press 'R' to Restart", gui.BLACK) is static
+
+
+def test_frame_draws_from_game_attributes(game):
+    game.show_stats = True
+    game.gui.draw(game.screen)
+    assert game.gui.preview_column() in (None, game.selected_col)
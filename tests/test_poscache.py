@@ -0,0 +1,168 @@
+import random
+import threading
+
+from src.models.board import Board
+from src.ai.evaluation import FEATURES, table_salt, weights_for
+from src.ai.poscache import PositionCache, MIN_DEPTH, MIN_VISITS
+from src.ai.ttable import TranspositionTable, table_key, EXACT, LOWER, KIND_MINIMAX_P1
+
+
+def test_mcts_results_are_kept_per_side_to_move(tmp_path):
+    cache = PositionCache(str(tmp_path / "cache.bin"))
+    board = Board.from_moves("4455")
+    cache.record_mcts(board, 1, MIN_VISITS, 0.75, 2)
+    assert cache.mcts_result(board, 1, MIN_VISITS) == (2, 0.75)
+    assert cache.mcts_result(board, 2, MIN_VISITS) is None
+    cache.record_mcts(board, 2, MIN_VISITS, 0.25, 6)
+    assert cache.mcts_result(board, 2, MIN_VISITS) == (6, 0.25)
+    assert cache.mcts_result(board, 1, MIN_VISITS) == (2, 0.75)
+
+
+def test_minimax_results_are_kept_per_side_to_move(tmp_path):
+    cache = PositionCache(str(tmp_path / "cache.bin"))
+    board = Board.from_moves("4455")
+    cache.record_result(board, 1, 100, MIN_DEPTH, 2)
+    assert cache.result(board, 1, MIN_DEPTH) == (100, 2)
+    assert cache.result(board, 2, MIN_DEPTH) is None
+
+
+def test_results_need_the_requested_depth(tmp_path):
+    cache = PositionCache(str(tmp_path / "cache.bin"))
+    board = Board.from_moves("4455")
+    cache.record_result(board, 1, 100, MIN_DEPTH + 2, 2)
+    assert cache.result(board, 1, MIN_DEPTH) == (100, 2)
+    assert cache.result(board, 1, MIN_DEPTH + 2) == (100, 2)
+    assert cache.result(board, 1, MIN_DEPTH + 3) is None
+
+    # Shallow results are not recorded; a shallower one does not replace a deeper one
+    cache.record_result(board, 1, -5, MIN_DEPTH, 6)
+    assert cache.result(board, 1, MIN_DEPTH) == (100, 2)
+    other = Board.from_moves("4")
+    cache.record_result(other, 2, 7, MIN_DEPTH - 1, 3)
+    assert cache.result(other, 2, 0) is None
+
+
+def test_results_are_kept_per_weights(tmp_path):
+    cache = PositionCache(str(tmp_path / "cache.bin"))
+    board = Board.from_moves("4455")
+    weights = weights_for()
+    other = tuple(weight + 1 for weight in weights)
+    assert len(other) == len(FEATURES)
+    cache.record_result(board, 1, 100, MIN_DEPTH, 2, weights)
+    assert cache.result(board, 1, MIN_DEPTH, weights) == (100, 2)
+    assert cache.result(board, 1, MIN_DEPTH, other) is None
+
+
+def test_mcts_results_need_the_requested_visits(tmp_path):
+    cache = PositionCache(str(tmp_path / "cache.bin"))
+    board = Board.from_moves("4455")
+    cache.record_mcts(board, 1, MIN_VISITS - 1, 0.5, 3)
+    assert cache.mcts_result(board, 1, 0) is None
+    cache.record_mcts(board, 1, 2 * MIN_VISITS, 0.5, 3)
+    assert cache.mcts_result(board, 1, 2 * MIN_VISITS) == (3, 0.5)
+    assert cache.mcts_result(board, 1, 2 * MIN_VISITS + 1) is None
+
+
+def test_absorb_takes_deep_exact_results(tmp_path):
+    cache = PositionCache(str(tmp_path / "cache.bin"))
+    table = TranspositionTable.private(1)
+    deep, shallow, bound = Board.from_moves("1122"), Board.from_moves("112"), Board.from_moves("12")
+    for board, depth, flag in ((deep, MIN_DEPTH, EXACT), (shallow, MIN_DEPTH - 1, EXACT), (bound, MIN_DEPTH, LOWER)):
+        table.store(table_key(board.key(), KIND_MINIMAX_P1, table_salt(board)), 10, depth, flag, 2)
+    assert cache.absorb(table) == 1
+    assert cache.result(deep, 1, MIN_DEPTH) == (10, 2)
+    assert cache.result(shallow, 1, 0) is None
+    assert cache.result(bound, 1, 0) is None
+
+
+def _positions(count, seed=0):
+    """Distinct boards reached by random play."""
+    rng = random.Random(seed)
+    boards = {}
+    while len(boards) < count:
+        board = Board()
+        player = 1
+        for _ in range(rng.randint(1, 12)):
+            board.drop_piece(rng.choice(board.get_valid_moves()), player)
+            player = 3 - player
+        boards[board.key()] = board
+    return list(boards.values())
+
+
+def test_save_merges_with_the_file(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    boards = _positions(30)
+    first = PositionCache(path)
+    second = PositionCache(path)
+    for board in boards[:20]:
+        first.record_result(board, 1, 10, MIN_DEPTH, 1)
+    for board in boards[10:]:
+        second.record_result(board, 1, 20, MIN_DEPTH + 2, 2)
+    assert first.save() == 20
+    assert second.save() == 30
+    assert not first.pending and not second.pending
+
+    reopened = PositionCache(path)
+    assert len(reopened) == 30
+    for board in boards[:10]:
+        assert reopened.result(board, 1, MIN_DEPTH) == (10, 1)
+    # The deeper entry wins where both caches had one
+    for board in boards[10:]:
+        assert reopened.result(board, 1, MIN_DEPTH) == (20, 2)
+
+    # Saving again over the mapped file keeps everything
+    reopened.record_result(boards[0], 2, 5, MIN_DEPTH, 3)
+    assert reopened.save() == 31
+    assert PositionCache(path).result(boards[0], 2, MIN_DEPTH) == (5, 3)
+
+
+def test_save_keeps_the_most_valuable_entries(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    boards = _positions(12, seed=1)
+    cache = PositionCache(path, max_entries=8)
+    for i, board in enumerate(boards):
+        cache.record_result(board, 1, i, MIN_DEPTH + i, 0)
+    assert cache.save() == 8
+    reopened = PositionCache(path)
+    kept = [board for board in boards if reopened.result(board, 1, MIN_DEPTH) is not None]
+    assert kept == boards[4:]
+
+
+def test_other_shapes_and_versions_read_as_empty(tmp_path):
+    path = str(tmp_path / "cache.bin")
+    cache = PositionCache(path)
+    cache.record_result(Board.from_moves("44"), 1, 1, MIN_DEPTH, 3)
+    cache.save()
+    assert len(PositionCache(path, 5, 6, 3)) == 0
+    assert len(PositionCache(path)) == 1
+
+
+def test_threads_record_and_save_together(tmp_path):
+    cache = PositionCache(str(tmp_path / "cache.bin"))
+    boards = _positions(200, seed=2)
+    errors = []
+
+    def record(part):
+        try:
+            for board in part:
+                cache.record_result(board, 1, 1, MIN_DEPTH, 0)
+                cache.result(board, 1, MIN_DEPTH)
+        except Exception as e:
+            errors.append(e)
+
+    def save():
+        try:
+            for _ in range(20):
+                cache.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=record, args=(boards[i::2],)) for i in range(2)]
+    threads.append(threading.Thread(target=save))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    cache.save()
+    assert len(PositionCache(cache.path)) == 200
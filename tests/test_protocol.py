@@ -0,0 +1,73 @@
+import io
+import time
+
+import pytest
+
+from src.protocol import EngineSession, parse_go
+
+
+@pytest.fixture
+def session():
+    out = io.StringIO()
+    session = EngineSession(out)
+    yield session
+    session.handle("quit")
+
+
+def run(session, *commands):
+    """Send `commands`, wait for the search, and return the lines printed."""
+    for command in commands:
+        session.handle(command)
+    session.wait()
+    return session.out.getvalue().splitlines()
+
+
+def test_go_without_limits_uses_the_difficulty():
+    limits = parse_go([], {"depth": 3, "max_time": 2.0})
+    assert limits == {"depth": 3, "max_time": 2.0, "nodes": None, "iterations": None}
+    assert parse_go(["infinite"], {"depth": 3}) == {"depth": None, "max_time": None, "nodes": None,
+                                                    "iterations": None}
+
+
+def test_minimax_reports_each_depth(session):
+    lines = run(session, "position startpos moves 445566", "go depth 3")
+    assert lines[-1] in ("bestmove 3", "bestmove 7")
+    depths = [int(line.split()[2]) for line in lines if line.startswith("info depth")]
+    assert depths and depths == sorted(depths)
+
+
+def test_mcts_depth_is_bounded(session):
+    lines = run(session, "setoption engine mcts", "setoption difficulty easy", "position 4453", "go depth 6")
+    assert lines[0].startswith("info string")
+    assert lines[-1].startswith("bestmove ") and lines[-1] != "bestmove none"
+
+
+def test_mcts_nodes_bound_the_iterations(session):
+    lines = run(session, "setoption engine mcts", "position 4453", "go nodes 1200")
+    visits = [int(line.split()[2]) for line in lines if line.startswith("info iterations")]
+    assert visits and max(visits) <= 1200
+    assert lines[-1].startswith("bestmove ") and lines[-1] != "bestmove none"
+
+
+@pytest.mark.parametrize("engine", ["minimax", "mcts"])
+def test_stop_ends_an_infinite_search(session, engine):
+    session.handle(f"setoption engine {engine}")
+    session.handle("position 4453")
+    session.handle("go infinite")
+    time.sleep(0.2)
+    session.handle("stop")
+    lines = session.out.getvalue().splitlines()
+    assert lines[-1].startswith("bestmove ") and lines[-1] != "bestmove none"
+
+
+def test_engine_spec_options_reach_the_search(session, tmp_path):
+    cache = tmp_path / "cache.bin"
+    lines = run(session, f"setoption engine minimax:cache={cache}", "position 4453", "go depth 4")
+    assert session.options == {"cache": str(cache)}
+    assert lines[-1].startswith("bestmove ") and lines[-1] != "bestmove none"
+
+
+def test_bad_engine_spec_is_an_error(session):
+    lines = run(session, "setoption engine minimax:bogus=1")
+    assert lines[0].startswith("error")
+    assert session.engine == "minimax"
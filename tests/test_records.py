@@ -0,0 +1,160 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+from src.models.board import Board
+from src.records import (GameRecord, RecordReader, RecordWriter, INDEX_DTYPE, RESULT_DRAW, RESULT_FIRST,
+                         RESULT_SECOND, RESULT_UNKNOWN, pack_moves, unpack_moves, _RECORD_HEADER, _RECORD_HEADER_V1,
+                         _DATA_MAGIC_V1, _INDEX_MAGIC_V1, _index_path)
+
+SHAPES = [(6, 7, 4), (5, 6, 3), (6, 8, 5), (7, 15, 4)]
+ENGINES = [{"engine": "minimax", "depth": 4}, {"engine": "mcts", "iterations": 200}, None]
+
+
+def random_game(rng, rows, cols, connect):
+    """A GameRecord of random play to the end, with its real result."""
+    board = Board(rows, cols, connect)
+    moves = []
+    player = 1
+    result = RESULT_DRAW
+    while not board.is_full():
+        col = rng.choice(board.get_valid_moves())
+        board.drop_piece(col, player)
+        moves.append(col)
+        if board.is_winner(player):
+            result = RESULT_FIRST if player == 1 else RESULT_SECOND
+            break
+        player = 3 - player
+    times = [rng.random() for _ in moves]
+    scores = [None if rng.random() < 0.3 else rng.uniform(-1e6, 1e6) for _ in moves]
+    engines = (rng.choice(ENGINES), rng.choice(ENGINES))
+    return GameRecord(moves, result, engines, times, scores, rows, cols, connect)
+
+
+def assert_same(read, written):
+    assert read.moves == written.moves
+    assert read.result == written.result
+    assert (read.rows, read.cols, read.connect) == (written.rows, written.cols, written.connect)
+    assert read.engines == written.engines
+    np.testing.assert_array_equal(read.times, written.times)
+    np.testing.assert_array_equal(read.scores, written.scores)  # NaNs compare equal here
+
+
+@pytest.fixture
+def games():
+    rng = random.Random(7)
+    return [random_game(rng, *SHAPES[i % len(SHAPES)]) for i in range(60)]
+
+
+def test_moves_round_trip():
+    moves = [0, 15, 3, 6, 9, 14, 1]
+    assert unpack_moves(pack_moves(moves), len(moves)) == moves
+    assert unpack_moves(pack_moves(moves[:-1]), len(moves) - 1) == moves[:-1]
+
+
+def test_records_round_trip(tmp_path, games):
+    path = str(tmp_path / "games.c4r")
+    # A small buffer flushes several blocks; the second writer appends
+    with RecordWriter(path, buffer_size=256) as writer:
+        for record in games[:40]:
+            writer.write(record)
+    with RecordWriter(path) as writer:
+        for record in games[40:]:
+            writer.write(record)
+
+    with RecordReader(path) as reader:
+        assert len(reader) == len(games)
+        for i, written in enumerate(games):
+            assert_same(reader[i], written)
+        for read, written in zip(reader, games):
+            assert_same(read, written)
+
+        # Replaying the moves on the recorded shape gives the recorded result
+        for record in reader:
+            board = Board(record.rows, record.cols, record.connect)
+            player = 1
+            for col in record.moves:
+                assert board.drop_piece(col, player)
+                player = 3 - player
+            winner = 3 - player
+            if record.result == RESULT_DRAW:
+                assert board.is_full() and not board.is_winner(1) and not board.is_winner(2)
+            else:
+                assert board.is_winner(winner) and record.result == winner
+
+
+def test_select_reads_the_index(tmp_path, games):
+    path = str(tmp_path / "games.c4r")
+    with RecordWriter(path) as writer:
+        for record in games:
+            writer.write(record)
+
+    with RecordReader(path) as reader:
+        for rows, cols, connect in SHAPES:
+            expected = [i for i, g in enumerate(games) if (g.rows, g.cols, g.connect) == (rows, cols, connect)]
+            assert reader.select(rows=rows, cols=cols, connect=connect).tolist() == expected
+        assert reader.select(connect=5).tolist() == [i for i, g in enumerate(games) if g.connect == 5]
+        for result in (RESULT_DRAW, RESULT_FIRST, RESULT_SECOND):
+            expected = [i for i, g in enumerate(games) if g.result == result]
+            assert reader.select(result=result).tolist() == expected
+        expected = [i for i, g in enumerate(games) if 10 <= len(g.moves) <= 20]
+        assert reader.select(min_moves=10, max_moves=20).tolist() == expected
+        for i, record in zip(reader.select(result=RESULT_FIRST), reader.records(reader.select(result=RESULT_FIRST))):
+            assert_same(record, games[i])
+
+
+def test_index_past_the_data_is_ignored(tmp_path, games):
+    path = str(tmp_path / "games.c4r")
+    with RecordWriter(path) as writer:
+        for record in games[:5]:
+            writer.write(record)
+    # An index entry whose data never reached the disk
+    with open(_index_path(path), "ab") as f:
+        f.write(np.array([(1 << 40, 3, RESULT_UNKNOWN, 6, 7, 4, (0, 0))], dtype=INDEX_DTYPE).tobytes())
+    with RecordReader(path) as reader:
+        assert len(reader) == 5
+
+
+def _write_v1(path, records):
+    """Write `records` in the version 1 format (no connect length)."""
+    data = bytearray(_DATA_MAGIC_V1)
+    index = []
+    for record in records:
+        body = record.pack()[_RECORD_HEADER.size:]
+        header = _RECORD_HEADER_V1.pack(_RECORD_HEADER_V1.size + len(body), record.rows, record.cols,
+                                        record.result, len(record.moves), *_label_lengths(record))
+        index.append((len(data), len(record.moves), record.result, record.rows, record.cols, 0, (0, 0)))
+        data += header + body
+    with open(path, "wb") as f:
+        f.write(data)
+    with open(_index_path(path), "wb") as f:
+        f.write(_INDEX_MAGIC_V1 + np.array(index, dtype=INDEX_DTYPE).tobytes())
+
+
+def _label_lengths(record):
+    """Byte lengths of the record's engine labels."""
+    return [0 if engine is None else len(json.dumps(engine, sort_keys=True).encode()) for engine in record.engines]
+
+
+def test_version_1_files_read_and_upgrade(tmp_path):
+    rng = random.Random(3)
+    old = [random_game(rng, 6, 7, 4) for _ in range(10)]
+    path = str(tmp_path / "old.c4r")
+    _write_v1(path, old)
+
+    with RecordReader(path) as reader:
+        assert reader.version == 1
+        assert reader.select(connect=4).tolist() == list(range(10))
+        for read, written in zip(reader, old):
+            assert_same(read, written)
+
+    new = random_game(rng, 5, 6, 3)
+    with RecordWriter(path) as writer:
+        writer.write(new)
+    with RecordReader(path) as reader:
+        assert reader.version == 2
+        assert len(reader) == 11
+        for read, written in zip(reader, old + [new]):
+            assert_same(read, written)
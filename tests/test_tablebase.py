@@ -0,0 +1,149 @@
+import random
+
+import pytest
+
+from src.models.board import Board
+from src.ai.tablebase import Tablebase, build_tablebase
+
+# Small shapes solved both ways
+SHAPES = [(4, 4, 3), (3, 5, 3)]
+
+
+def _preference(value):
+    """Faster wins first, then draws, then slower losses (as the tablebase orders them)."""
+    return 256 - value if value > 0 else (-256 - value if value < 0 else 0)
+
+
+class Negamax:
+    """
+    Plain memoised negamax on column tuples, independent of Board and its bitboards.
+
+    A position is a tuple of columns, each a tuple of pieces from the
+    bottom up; values follow the tablebase's convention.
+    """
+
+    def __init__(self, rows, cols, connect):
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        self.memo = {}
+
+    def _piece(self, columns, row, col):
+        """Piece at (row counted from the bottom, col), 0 when empty or off the board."""
+        if 0 <= col < self.cols and 0 <= row < len(columns[col]):
+            return columns[col][row]
+        return 0
+
+    def wins(self, columns, col):
+        """True if the top piece of `col` completes a line."""
+        row = len(columns[col]) - 1
+        player = columns[col][row]
+        for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            count = 1
+            for sign in (1, -1):
+                r, c = row + sign * dr, col + sign * dc
+                while self._piece(columns, r, c) == player:
+                    count += 1
+                    r, c = r + sign * dr, c + sign * dc
+            if count >= self.connect:
+                return True
+        return False
+
+    def move_values(self, columns, player):
+        """{column: value for the mover} of every legal move."""
+        values = {}
+        for col in range(self.cols):
+            if len(columns[col]) == self.rows:
+                continue
+            child = columns[:col] + (columns[col] + (player,),) + columns[col + 1:]
+            if self.wins(child, col):
+                values[col] = 1
+            elif all(len(column) == self.rows for column in child):
+                values[col] = 0
+            else:
+                value = self.value(child, 3 - player)
+                values[col] = -(value + (value > 0) - (value < 0))
+        return values
+
+    def value(self, columns, player):
+        """Value of an ongoing position for `player`, the side to move."""
+        if columns not in self.memo:
+            self.memo[columns] = max(self.move_values(columns, player).values(), key=_preference)
+        return self.memo[columns]
+
+
+def to_columns(board):
+    """Board as a tuple of columns, bottom piece first."""
+    return tuple(tuple(int(board.board[row][col]) for row in range(board.rows - 1, -1, -1)
+                       if board.board[row][col]) for col in range(board.cols))
+
+
+def random_positions(rows, cols, connect, count, seed):
+    """Ongoing positions reached by random play, with the player to move."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board = Board(rows, cols, connect)
+        player = 1
+        for _ in range(rng.randint(0, rows * cols - 1)):
+            board.drop_piece(rng.choice(board.get_valid_moves()), player)
+            if board.is_winner(player) or board.is_full():
+                break
+            player = 3 - player
+        else:
+            positions.append((board, player))
+    return positions
+
+
+@pytest.fixture(scope="module", params=SHAPES, ids=lambda shape: "{}x{}c{}".format(*shape))
+def solved(request, tmp_path_factory):
+    rows, cols, connect = request.param
+    directory = str(tmp_path_factory.mktemp("tablebase"))
+    manifest = build_tablebase(rows, cols, connect, directory=directory, workers=1)
+    return manifest, Tablebase(directory), Negamax(rows, cols, connect)
+
+
+def test_root_value_matches_negamax(solved):
+    manifest, tablebase, negamax = solved
+    rows, cols, _ = tablebase.shape
+    assert manifest["root_value"] == negamax.value(((),) * cols, 1)
+    assert tablebase.probe(Board(*tablebase.shape)) == manifest["root_value"]
+
+
+def test_values_match_negamax(solved):
+    _, tablebase, negamax = solved
+    for board, player in random_positions(*tablebase.shape, 300, seed=1):
+        assert tablebase.probe(board) == negamax.value(to_columns(board), player)
+
+
+def test_best_move_is_optimal(solved):
+    _, tablebase, negamax = solved
+    for board, player in random_positions(*tablebase.shape, 300, seed=2):
+        expected = negamax.move_values(to_columns(board), player)
+        assert tablebase.move_values(board, player) == expected
+        col, value = tablebase.best_move(board, player)
+        assert value == expected[col] == max(expected.values(), key=_preference)
+
+
+def test_player_two_first_positions(solved):
+    _, tablebase, negamax = solved
+    rows, cols, connect = tablebase.shape
+    rng = random.Random(3)
+    checked = 0
+    while checked < 100:
+        # The same moves with player 2 moving first
+        board = Board(rows, cols, connect)
+        swapped = Board(rows, cols, connect)
+        player = 1
+        for _ in range(rng.randint(0, rows * cols - 1)):
+            col = rng.choice(board.get_valid_moves())
+            board.drop_piece(col, player)
+            swapped.drop_piece(col, 3 - player)
+            if board.is_winner(player) or board.is_full():
+                break
+            player = 3 - player
+        else:
+            assert tablebase.probe(swapped, 3 - player) == negamax.value(to_columns(board), player)
+            assert tablebase.move_values(swapped, 3 - player) == tablebase.move_values(board, player)
+            assert tablebase.best_move(swapped, 3 - player) == tablebase.best_move(board, player)
+            checked += 1
@@ -0,0 +1,84 @@
+import copy
+import random
+
+import pytest
+
+from src.models.board import Board
+from src.ai.threats import ThreatMap, columns
+
+# Board shapes covered: the unrolled connect-4 path and the generic one
+SHAPES = [(6, 7, 4), (5, 6, 3), (7, 8, 5), (4, 5, 4)]
+
+
+def random_positions(rows, cols, connect, count, seed):
+    """Ongoing positions reached by random play, with the player to move."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board = Board(rows, cols, connect)
+        player = 1
+        for _ in range(rng.randint(0, rows * cols - 1)):
+            col = rng.choice(board.get_valid_moves())
+            board.drop_piece(col, player)
+            if board.is_winner(player) or board.is_full():
+                break
+            player = 3 - player
+        else:
+            positions.append((board, player))
+    return positions
+
+
+def cell_bit(board, row, col):
+    """Bitboard bit of a cell (row 0 at the top, as in Board)."""
+    return 1 << (col * board.geometry.height + board.rows - 1 - row)
+
+
+def brute_winning_cells(board, player):
+    """Empty cells where a piece of `player` would complete a line, found with check_win."""
+    cells = 0
+    for row in range(board.rows):
+        for col in range(board.cols):
+            if board.board[row][col] == 0:
+                board.board[row][col] = player
+                if board.check_win(row, col, player):
+                    cells |= cell_bit(board, row, col)
+                board.board[row][col] = 0
+    return cells
+
+
+def brute_non_losing(board, player):
+    """Columns `player` can play without the opponent winning on the next move."""
+    safe = []
+    for col in board.get_valid_moves():
+        child = _after(board, col, player)
+        loses = False
+        for reply in child.get_valid_moves():
+            grandchild = _after(child, reply, 3 - player)
+            if grandchild.is_winner(3 - player):
+                loses = True
+                break
+        if not loses:
+            safe.append(col)
+    return safe
+
+
+def _after(board, col, player):
+    """Copy of `board` with `player`'s piece dropped in `col`."""
+    child = copy.deepcopy(board)
+    child.drop_piece(col, player)
+    return child
+
+
+@pytest.mark.parametrize("rows, cols, connect", SHAPES)
+def test_winning_cells_match_brute_force(rows, cols, connect):
+    for board, _ in random_positions(rows, cols, connect, 150, seed=rows * 100 + cols * 10 + connect):
+        threats = ThreatMap(board)
+        for player in (1, 2):
+            assert threats.threats[player] == brute_winning_cells(board, player)
+
+
+@pytest.mark.parametrize("rows, cols, connect", SHAPES)
+def test_non_losing_matches_brute_force(rows, cols, connect):
+    for board, player in random_positions(rows, cols, connect, 150, seed=rows * 100 + cols * 10 + connect + 1):
+        threats = ThreatMap(board)
+        assert columns(threats.non_losing(player), board.geometry) == brute_non_losing(board, player)
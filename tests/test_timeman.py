@@ -0,0 +1,84 @@
+import pytest
+
+from src.models.board import Board
+from src.ai.timeman import TimeManager, MoveClock, MAX_SHARE, INSTABILITY_FACTOR, WIN_SCORE
+
+
+def test_allocation_follows_the_bank_and_phase():
+    manager = TimeManager(60.0)
+    opening = manager.start(Board())
+    middlegame = manager.start(Board.from_moves("4453344352"))
+    assert opening.soft < middlegame.soft
+    for clock in (opening, middlegame):
+        assert clock.soft <= clock.hard <= 60.0 * MAX_SHARE
+        assert clock.hard <= clock.soft * INSTABILITY_FACTOR + 1e-9
+
+
+def test_no_move_takes_more_than_its_share():
+    manager = TimeManager(1.0)
+    board = Board.from_moves("121234345656")
+    clock = manager.start(board)
+    assert clock.hard <= MAX_SHARE * 1.0
+    # Late in the game with a small bank, the floor still applies
+    assert TimeManager(0.001, min_move=0.02).start(board).soft == pytest.approx(0.02)
+
+
+def test_a_game_stays_within_the_bank():
+    manager = TimeManager(10.0, increment=0.1)
+    board = Board()
+    player = 1
+    spent = 0.0
+    for col in [3, 3, 2, 4, 4, 2, 5, 1, 1, 5, 0, 6, 6, 0, 3, 3, 2, 4]:
+        if player == 1:
+            clock = manager.start(board)
+            assert clock.hard <= max(manager.min_move, manager.bank * MAX_SHARE) + 1e-9
+            spent += clock.soft
+            manager.finish(clock.soft)
+            assert manager.bank >= 0.0
+        board.drop_piece(col, player)
+        player = 3 - player
+    assert manager.moves == 9
+    assert spent <= 10.0 + 9 * 0.1
+
+
+def test_finish_charges_the_bank():
+    manager = TimeManager(5.0, increment=0.5)
+    manager.finish(2.0)
+    assert manager.bank == pytest.approx(3.5)
+    manager.finish(10.0)
+    assert manager.bank == pytest.approx(0.5)
+    assert manager.moves == 2
+
+
+def test_for_target_averages_the_target():
+    board = Board()
+    assert TimeManager.for_target(0.5, board).bank == pytest.approx(0.5 * 42 / 2)
+
+
+def test_clock_stops_on_proven_results():
+    clock = MoveClock(10.0, 20.0)
+    assert clock.minimax_callback(1, WIN_SCORE, 3)
+    assert clock.reason == "proven result"
+
+
+def test_clock_stops_before_a_depth_that_would_overrun():
+    clock = MoveClock(1.0, 2.0)
+    clock.start -= 0.5  # half a second spent on depth 1
+    assert clock.minimax_callback(1, 10, 3)
+    assert clock.reason == "soft limit"
+
+
+def test_unstable_best_move_stretches_the_soft_limit():
+    clock = MoveClock(1.0, 1.5)
+    assert not clock.minimax_callback(1, 10, 3)
+    clock.minimax_callback(2, 10, 4)
+    assert clock.soft == pytest.approx(1.5)
+
+
+def test_clock_fires_at_the_hard_limit_or_with_its_parent():
+    assert MoveClock(0.0, 0.0).is_set()
+    parent = MoveClock(10.0, 20.0)
+    clock = MoveClock(10.0, 20.0, parent)
+    assert not clock.is_set()
+    parent.set()
+    assert clock.is_set()
@@ -0,0 +1,150 @@
+import copy
+
+import pytest
+
+from src.models.board import Board
+from src.ai.memory import governor, set_budget, SHRINK_TO
+from src.ai.minimax import iterative_deepening_minimax, multipv_minimax
+from src.ai.mcts import MCTSNode, _seed_from_table, _store_tree
+from src.ai.poscache import PositionCache
+from src.ai.ttable import (TranspositionTable, table_key, pack_result, unpack_result, pack_stats, unpack_stats,
+                           check_board, MAX_COLS, EXACT, LOWER, UPPER, KIND_MINIMAX_P1, KIND_MCTS)
+
+
+@pytest.fixture
+def table():
+    table = TranspositionTable.private(1)
+    yield table
+    table.close()
+
+
+@pytest.mark.parametrize("value, depth, flag, move", [
+    (0, 0, EXACT, 0),
+    (1000000, 12, LOWER, 6),
+    (-1000000, 255, UPPER, 13),
+    (-1, 3, EXACT, None),
+    (-(1 << 31), 1, UPPER, MAX_COLS - 1),
+    ((1 << 31) - 1, 7, LOWER, 14),
+])
+def test_result_round_trip(value, depth, flag, move):
+    data = pack_result(value, depth, flag, move)
+    assert data >> 63 == 1 and data < 1 << 64
+    assert unpack_result(data) == (value, depth, flag, move)
+
+
+def test_result_clamps_depth_and_value():
+    assert unpack_result(pack_result(1 << 40, 300, EXACT, 2)) == ((1 << 31) - 1, 255, EXACT, 2)
+    assert unpack_result(pack_result(-(1 << 40), 0, EXACT, 2)) == (-(1 << 31), 0, EXACT, 2)
+
+
+@pytest.mark.parametrize("move", [15, 16, -1])
+def test_result_rejects_moves_outside_the_field(move):
+    with pytest.raises(ValueError):
+        pack_result(0, 1, EXACT, move)
+
+
+@pytest.mark.parametrize("visits, wins", [(0, 0), (1, 0.5), (1000, 612.5), (0x7FFFFFFF, 0x7FFFFFFF / 2)])
+def test_stats_round_trip(visits, wins):
+    data = pack_stats(visits, wins)
+    assert data >> 63 == 1
+    assert unpack_stats(data) == (visits, wins)
+
+
+def test_wide_boards_are_rejected(table):
+    check_board(Board(6, MAX_COLS, 4))
+    wide = Board(6, MAX_COLS + 1, 4)
+    with pytest.raises(ValueError):
+        check_board(wide)
+    with pytest.raises(ValueError):
+        iterative_deepening_minimax(wide, 1, player=1, save_history=False, tt=table)
+    assert not PositionCache("unused.bin", 6, MAX_COLS + 1, 4).covers(wide)
+
+
+def test_store_and_probe(table):
+    key = table_key(Board.from_moves("4453").key(), KIND_MINIMAX_P1)
+    assert table.probe(key) is None
+    table.store(key, 42, 5, EXACT, 3)
+    assert table.probe(key) == (42, 5, EXACT, 3)
+
+    # A shallower result does not replace a deeper one; a deeper one does
+    table.store(key, 7, 2, LOWER, 1)
+    assert table.probe(key) == (42, 5, EXACT, 3)
+    table.store(key, -9, 6, UPPER, None)
+    assert table.probe(key) == (-9, 6, UPPER, None)
+
+
+def test_stats_keep_the_most_visits(table):
+    key = table_key(Board.from_moves("44").key(), KIND_MCTS)
+    table.store_stats(key, 10, 4.5)
+    table.store_stats(key, 5, 5.0)
+    assert table.probe_stats(key) == (10, 4.5)
+    table.store_stats(key, 20, 11.0)
+    assert table.probe_stats(key) == (20, 11.0)
+
+
+def test_torn_write_reads_as_a_miss(table):
+    key = table_key(Board.from_moves("123").key(), KIND_MINIMAX_P1)
+    index = key % table.size
+    data = pack_result(100, 4, EXACT, 2)
+
+    # Data written but the check word still from another entry
+    table.entries[index, 1] = data
+    table.entries[index, 0] = (key + 1) ^ data
+    assert table.probe(key) is None
+
+    # Check word written but the data from another write
+    table.entries[index, 0] = key ^ data
+    table.entries[index, 1] = pack_result(-5, 9, LOWER, 0)
+    assert table.probe(key) is None
+
+    table.store(key, 100, 4, EXACT, 2)
+    assert table.probe(key) == (100, 4, EXACT, 2)
+
+
+def test_colliding_keys_do_not_match(table):
+    key = table_key(Board.from_moves("1").key(), KIND_MINIMAX_P1)
+    other = key + table.size  # same slot
+    table.store(key, 1, 3, EXACT, 0)
+    assert table.probe(other) is None
+    table.store(other, 2, 3, EXACT, 1)
+    assert table.probe(key) is None
+    assert table.probe(other) == (2, 3, EXACT, 1)
+
+
+def test_mcts_statistics_are_kept_per_side_to_move(table):
+    board = Board.from_moves("4455")
+    first = MCTSNode(copy.deepcopy(board), player=1)
+    first.visits, first.wins = 500, 300.0
+    _store_tree(first, table)
+
+    seeded = MCTSNode(copy.deepcopy(board), player=1)
+    _seed_from_table(seeded, table)
+    assert seeded.visits > 0
+    other = MCTSNode(copy.deepcopy(board), player=2)
+    _seed_from_table(other, table)
+    assert other.visits == 0
+
+
+@pytest.fixture
+def small_budget():
+    budget = governor().budget
+    set_budget(2)
+    yield governor().budget
+    governor().budget = budget
+
+
+def test_private_tables_shrink_to_fit_the_budget(small_budget):
+    table = TranspositionTable.private(4)
+    assert table.size_bytes < small_budget * SHRINK_TO
+    key = table_key(Board.from_moves("4453").key(), KIND_MINIMAX_P1)
+    table.store(key, 42, 5, EXACT, 3)
+    assert table.probe(key) == (42, 5, EXACT, 3)
+
+    # Searches that make their own private table still run
+    lines = multipv_minimax(Board.from_moves("4453"), 3, player=1)
+    assert lines
+
+
+def test_shared_tables_must_fit_the_budget(small_budget):
+    with pytest.raises(ValueError):
+        TranspositionTable.create(4)